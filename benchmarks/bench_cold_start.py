@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks import odre_stub, synthetic
+from benchmarks.bench_geo import synthetic_regions
+from scripts import artifacts, async_load, cache, load_data, metrics
+
+# Démarrage à froid de l'application : premier run du script dans un interpréteur neuf (AppTest),
+# à partir des artefacts précalculés ou du cache local déjà rempli. Délai avant la barre d'onglets
+# (first_render), avant le contenu de l'onglet ouvert (first_tab) et durée totale du premier run.
+APP = Path(__file__).resolve().parent.parent / "interface_app.py"
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=600)
+at.run()
+print(json.dumps({"streamlit_import": imported - start, "first_run": time.perf_counter() - imported,
+                  "exceptions": [str(e.value) for e in at.exception]}))
+"""
+
+
+def cold_run(env, geo_dir):
+    log = tempfile.NamedTemporaryFile(suffix=".jsonl", delete=False).name
+    env = {**os.environ, **env, "ODRE_METRICS_LOG": log, "ODRE_LIVE": "0", "ODRE_GEO_DIR": geo_dir}
+    out = subprocess.run([sys.executable, "-c", CHILD, str(APP)], env=env, cwd=APP.parent,
+                         capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    for line in Path(log).read_text().splitlines():
+        record = json.loads(line)
+        if record["stage"] in ("first_render", "first_tab"):
+            result[record["stage"]] = record["seconds"]
+    return result
+
+
+def report(label, results):
+    def median(key):
+        values = sorted(r[key] for r in results if key in r)
+        return f"{values[len(values) // 2]:.2f}s" if values else "-"
+    print(f"{label:<10} | import streamlit {median('streamlit_import')} | barre d'onglets {median('first_render')} "
+          f"| onglet ouvert {median('first_tab')} | premier run {median('first_run')}")
+    for result in results:
+        if result["exceptions"]:
+            print("  exceptions :", result["exceptions"])
+
+
+def run(rows, repeat):
+    metrics.logger.disabled = True
+    # Contours synthétiques : les choroplèthes ne téléchargent rien
+    geo_dir = tempfile.mkdtemp(prefix="odre-geo-")
+    Path(geo_dir, "regions.geojson").write_text(json.dumps(synthetic_regions(2000)))
+
+    frames = synthetic.build_frames(rows)
+    clean = {name: load_data.CLEANERS[name](frame) for name, frame in frames.items()}
+    artifact_dir = tempfile.mkdtemp(prefix="odre-artifacts-")
+    artifacts.build(clean, out_dir=artifact_dir, maps=False)
+    report("artefacts", [cold_run({"ODRE_ARTIFACT_DIR": artifact_dir}, geo_dir) for _ in range(repeat)])
+
+    # Cache local rempli depuis le serveur ODRE local (jeux par défaut) : le run à froid n'y fait
+    # aucune requête. Exports CSV des jeux servis par export (installations, bornes) dans un
+    # dossier temporaire, pas dans ./data/exports
+    server, load_data.BASE_URL = odre_stub.serve()
+    try:
+        cache.CACHE_DIR = Path(tempfile.mkdtemp(prefix="odre-cache-"))
+        load_data.EXPORT_DIR = tempfile.mkdtemp(prefix="odre-export-")
+        async_load.load_all_parallel(refresh=True)
+    finally:
+        server.shutdown()
+    empty_artifacts = tempfile.mkdtemp(prefix="odre-artifacts-")
+    env = {"ODRE_ARTIFACT_DIR": empty_artifacts, "ODRE_CACHE_DIR": str(cache.CACHE_DIR),
+           "ODRE_EXPORT_DIR": str(load_data.EXPORT_DIR)}
+    report("cache", [cold_run(env, geo_dir) for _ in range(repeat)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Délai avant le premier affichage de l'application, à froid")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
@@ -0,0 +1,35 @@
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks import odre_stub
+from scripts import ev_map, preprocess
+
+# Emprise d'un département environ (zoom 10) pour le mode grille avec filtrage de vue
+DETAIL_VIEW = ((48.6, 2.0), (49.1, 2.7))
+
+
+def run(rows, modes):
+    ev_data = preprocess.clean_ev_charging(pd.DataFrame.from_records(odre_stub.ev_charging_records(rows)))
+    cases = []
+    for mode in modes:
+        if mode == "grid":
+            cases += [("grid z6", dict(mode="grid", zoom=6)), ("grid z10 vue", dict(mode="grid", zoom=10, bounds=DETAIL_VIEW)),
+                      ("grid z14 vue", dict(mode="grid", zoom=14, bounds=((48.85, 2.3), (48.9, 2.4))))]
+        else:
+            cases.append((mode, dict(mode=mode, zoom=6)))
+
+    for label, kwargs in cases:
+        start = time.perf_counter()
+        html = ev_map.build_map(ev_data, **kwargs).get_root().render()
+        elapsed = time.perf_counter() - start
+        print(f"{label:<14} | {len(ev_data)} bornes | {elapsed:.2f}s | {len(html.encode('utf-8')) / 1024 ** 2:.2f} Mo")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construction de la carte IRVE selon le mode de rendu")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--modes", nargs="+", default=list(ev_map.RENDER_MODES), choices=ev_map.RENDER_MODES)
+    args = parser.parse_args()
+    run(args.rows, args.modes)
@@ -0,0 +1,30 @@
+import argparse
+import tempfile
+import time
+
+from benchmarks import odre_stub
+from scripts import load_data
+
+
+def run(rows):
+    sizes = {"bornes-irve": rows}
+    server, base_url = odre_stub.serve(datasets=odre_stub.build_datasets(sizes))
+    load_data.BASE_URL = base_url
+    load_data.EXPORT_DIR = tempfile.mkdtemp(prefix="odre-export-")
+    try:
+        start = time.perf_counter()
+        df = load_data.fetch_api_data("bornes-irve")
+        print(f"records  | {len(df)} lignes | {time.perf_counter() - start:.2f}s")
+        for fmt in load_data.EXPORT_FORMATS:
+            start = time.perf_counter()
+            df = load_data.fetch_export_data("bornes-irve", fmt=fmt)
+            print(f"{fmt:<8} | {len(df)} lignes | {time.perf_counter() - start:.2f}s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Comparaison /records vs /exports sur un serveur ODRE local")
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+    run(args.rows)
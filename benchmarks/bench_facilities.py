@@ -0,0 +1,65 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks import synthetic
+from scripts import aggregates, facilities, metrics, preprocess
+
+# Registre synthétique : requêtes de l'onglet "Parc installé" sur le registre compact, comparées
+# au même calcul par filtre et regroupement sur le frame nettoyé
+YEAR = 2015
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def report(label, scan, indexed):
+    print(f"{label:<28} | frame {scan * 1000:>9.2f} ms | registre {indexed * 1000:>8.3f} ms | x{scan / indexed:,.0f}")
+
+
+def run(rows, queries):
+    metrics.logger.disabled = True
+    clean = preprocess.clean_energy_facilities(synthetic.facilities_frame(rows))
+    print(f"{len(clean)} lignes du registre, frame nettoyé {clean.memory_usage(deep=True).sum() / 1e6:.1f} Mo")
+
+    registry, build = timed(lambda: facilities.build_registry(clean), 1)
+    print(f"{'construction':<28} | {build * 1000:.1f} ms, {registry.nbytes / 1e6:.1f} Mo")
+
+    region = clean["region"].iloc[0]
+    year = clean["date_mise_en_service"].dt.year
+
+    def scan_by_filiere():
+        selected = clean[(clean["region"] == region) & ((year <= YEAR) | year.isna())]
+        return selected.groupby("filiere", observed=True)["puissance_MW"].sum()
+
+    expected, scan = timed(scan_by_filiere, queries)
+    result, indexed = timed(lambda: registry.by_filiere(region, YEAR), queries)
+    np.testing.assert_allclose(result.loc[expected.index, "puissance_MW"], expected, rtol=1e-4)
+    report("puissance par filière", scan, indexed)
+
+    def scan_by_year():
+        selected = clean[clean["region"] == region]
+        added = selected.groupby([year.rename("year"), "filiere"], observed=True)["puissance_MW"].sum()
+        return added.unstack("filiere").fillna(0).cumsum()
+
+    _, scan = timed(scan_by_year, queries)
+    _, indexed = timed(lambda: registry.capacity_by_year(region), queries)
+    report("puissance par année", scan, indexed)
+
+    production = aggregates.production_cube(
+        preprocess.clean_monthly_production(synthetic.monthly_production_frame(rows)))
+    _, elapsed = timed(lambda: facilities.load_factors(registry, production, region), queries)
+    print(f"{'facteurs de charge':<28} | {elapsed * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Registre compact des installations face au frame nettoyé")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+    run(args.rows, args.queries)
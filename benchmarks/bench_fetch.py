@@ -0,0 +1,28 @@
+import argparse
+import time
+
+from benchmarks import odre_stub
+from scripts import load_data
+
+
+def run(latency, workers_list):
+    server, base_url = odre_stub.serve(latency=latency)
+    load_data.BASE_URL = base_url
+    try:
+        for workers in workers_list:
+            start = time.perf_counter()
+            rows = 0
+            for endpoint in odre_stub.DATASET_GENERATORS:
+                rows += len(load_data.fetch_api_data(endpoint, workers=workers))
+            elapsed = time.perf_counter() - start
+            print(f"workers={workers:>2} | {rows} lignes | {elapsed:.2f}s")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de fetch_api_data sur un serveur ODRE local")
+    parser.add_argument("--latency", type=float, default=0.02, help="latence simulée par requête (s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+    run(args.latency, args.workers)
@@ -0,0 +1,76 @@
+import argparse
+import json
+import math
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import folium
+
+from benchmarks import odre_stub
+from scripts import geo
+
+
+def synthetic_regions(vertices, seed=0):
+    # 12 polygones en étoile irrégulière autour de centres répartis sur la métropole
+    rng = random.Random(seed)
+    features = []
+    for i, name in enumerate(odre_stub.REGIONS):
+        lat0, lon0 = 43.0 + (i // 4) * 2.5, -1.0 + (i % 4) * 2.5
+        ring = []
+        for k in range(vertices):
+            angle = 2 * math.pi * k / vertices
+            radius = 1.0 + 0.15 * math.sin(7 * angle) + rng.uniform(-0.01, 0.01)
+            ring.append([round(lon0 + radius * math.cos(angle), 6), round(lat0 + radius * math.sin(angle), 6)])
+        ring.append(ring[0])
+        features.append({
+            "type": "Feature",
+            "properties": {"code": str(11 + i), "nom": name, "superficie": rng.random()},
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def choropleth_html(geojson_data, data, labels_layer):
+    fmap = folium.Map(location=[46.5, 2.5], zoom_start=5, tiles="cartodb positron")
+    choropleth = folium.Choropleth(
+        geo_data=geojson_data, data=data, columns=["region", "value"], key_on="feature.properties.nom",
+        fill_color="Reds", fill_opacity=0.7, line_opacity=0.2, highlight=True,
+    ).add_to(fmap)
+    if labels_layer:
+        folium.GeoJson(
+            geojson_data, name="labels",
+            style_function=lambda x: {"color": "transparent", "fillOpacity": 0},
+            tooltip=folium.GeoJsonTooltip(fields=["nom"], aliases=["Région :"]),
+        ).add_to(fmap)
+    else:
+        choropleth.geojson.add_child(folium.GeoJsonTooltip(fields=["nom"], aliases=["Région :"]))
+    return fmap.get_root().render()
+
+
+def run(vertices, zoom):
+    geo.GEO_DIR = Path(tempfile.mkdtemp(prefix="odre-geo-"))
+    full = synthetic_regions(vertices)
+    geo.regions_path().write_text(json.dumps(full), encoding="utf-8")
+    data = {name: i for i, name in enumerate(odre_stub.REGIONS)}
+
+    start = time.perf_counter()
+    html = choropleth_html(full, data, labels_layer=True)
+    print(f"avant    | {time.perf_counter() - start:.2f}s | {len(html.encode('utf-8')) / 1024 ** 2:.2f} Mo par carte")
+
+    start = time.perf_counter()
+    simplified = geo.regions_geojson(zoom)
+    print(f"simplif. | {time.perf_counter() - start:.2f}s (une fois par zoom)")
+
+    start = time.perf_counter()
+    html = choropleth_html(simplified, data, labels_layer=False)
+    print(f"après    | {time.perf_counter() - start:.2f}s | {len(html.encode('utf-8')) / 1024 ** 2:.2f} Mo par carte")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poids des cartes choroplèthes avant / après simplification")
+    parser.add_argument("--vertices", type=int, default=20_000, help="sommets par région")
+    parser.add_argument("--zoom", type=int, default=5)
+    args = parser.parse_args()
+    run(args.vertices, args.zoom)
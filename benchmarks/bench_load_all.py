@@ -0,0 +1,33 @@
+import argparse
+import tempfile
+import time
+
+from benchmarks import odre_stub
+from scripts import async_load, cache, load_data
+
+
+def run(latency, concurrency, rate):
+    server, base_url = odre_stub.serve(latency=latency)
+    load_data.BASE_URL = base_url
+    try:
+        cache.CACHE_DIR = tempfile.mkdtemp(prefix="odre-cache-")
+        start = time.perf_counter()
+        load_data.load_all_clean(refresh=True)
+        print(f"séquentiel (load_all_clean) | {time.perf_counter() - start:.2f}s")
+
+        cache.CACHE_DIR = tempfile.mkdtemp(prefix="odre-cache-")
+        _, timings = async_load.run_sync(async_load.load_all_async(refresh=True, concurrency=concurrency, rate=rate))
+        print(f"parallèle (load_all_async)  | {timings['total']['seconds']:.2f}s")
+        async_load.print_timings(timings)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="load_all séquentiel vs asynchrone sur un serveur ODRE local")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--concurrency", type=int, default=async_load.GLOBAL_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=async_load.HOST_RATE_LIMIT,
+                        help="requêtes/s/hôte (0 = illimité ; défaut : valeur de l'application, ODRE_HOST_RATE_LIMIT)")
+    args = parser.parse_args()
+    run(args.latency, args.concurrency, args.rate)
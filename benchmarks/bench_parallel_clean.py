@@ -0,0 +1,52 @@
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from benchmarks import synthetic
+from scripts import load_data, metrics, parallel_clean
+
+# Nettoyage des 4 jeux en série puis sur des pools de tailles croissantes ; le démarrage du pool
+# (import de pandas dans chaque processus) est mesuré à part, il n'a lieu qu'une fois par processus
+FRAMES = {
+    "monthly_production": synthetic.monthly_production_frame,
+    "facilities": synthetic.facilities_frame,
+    "ev_charging": lambda rows: synthetic.ev_charging_frame(rows, geo="str"),
+    "annual_consumption": synthetic.annual_consumption_frame,
+}
+
+
+def run(rows, workers_list):
+    # Les processus du pool relisent ODRE_METRICS à l'import : leurs lignes JSON sont coupées aussi
+    os.environ["ODRE_METRICS"] = "0"
+    metrics.logger.disabled = True
+    frames = {name: build(rows) for name, build in FRAMES.items()}
+    print(f"{rows} lignes brutes par jeu, {os.cpu_count()} cœur(s)")
+
+    start = time.perf_counter()
+    serial = {name: load_data.CLEANERS[name](df.copy()) for name, df in frames.items()}
+    print(f"{'série':<12} | {time.perf_counter() - start:.2f}s")
+
+    for workers in workers_list:
+        parallel_clean.shutdown()
+        parallel_clean.WORKERS = workers
+        start = time.perf_counter()
+        parallel_clean.get_pool().submit(int).result()
+        warmup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = parallel_clean.clean_all({name: df.copy() for name, df in frames.items()}, load_data.CLEANERS)
+        elapsed = time.perf_counter() - start
+        for name in serial:
+            pd.testing.assert_frame_equal(serial[name], result[name], check_exact=True)
+        print(f"{workers:>2} processus | {elapsed:.2f}s (démarrage du pool {warmup:.2f}s) | identique à la série")
+    parallel_clean.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nettoyage série face au nettoyage partitionné sur un pool de processus")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, 8])
+    args = parser.parse_args()
+    run(args.rows, args.workers)
@@ -0,0 +1,85 @@
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from benchmarks import odre_stub
+from scripts import preprocess
+
+
+# Versions d'origine (apply ligne à ligne, melt en chaînes object), conservées pour comparaison
+def legacy_clean_ev_charging(df):
+    def extract_lat(x):
+        return x.get("lat") if isinstance(x, dict) else None
+
+    def extract_lon(x):
+        return x.get("lon") if isinstance(x, dict) else None
+
+    df["lat"] = df["geo_point_borne"].apply(extract_lat)
+    df["lon"] = df["geo_point_borne"].apply(extract_lon)
+    df_clean = df.rename(columns={"n_amenageur": "amenageur", "puiss_max": "puissance_kW", "code_insee_commune": "commune"})
+    df_clean["date_maj"] = pd.to_datetime(df_clean["date_maj"], errors="coerce")
+    return df_clean[[
+        "amenageur", "region", "departement", "commune",
+        "puissance_kW", "lat", "lon", "date_maj"
+    ]].dropna(subset=["lat", "lon"])
+
+
+def legacy_clean_monthly_production(df):
+    df["mois"] = pd.to_datetime(df["mois"], errors="coerce")
+    df_long = df.melt(
+        id_vars=["mois", "region"], value_vars=preprocess.PRODUCTION_COLUMNS,
+        var_name="filiere", value_name="production_GWh"
+    )
+    df_long["filiere"] = df_long["filiere"].str.replace("production_", "", regex=False)
+    return df_long.dropna(subset=["production_GWh", "mois"])
+
+
+CASES = {
+    "ev_charging": (odre_stub.ev_charging_records, legacy_clean_ev_charging, preprocess.clean_ev_charging),
+    "monthly_production": (
+        odre_stub.monthly_production_records, legacy_clean_monthly_production, preprocess.clean_monthly_production
+    ),
+}
+
+
+def measure(func, raw):
+    # Temps et pic mémoire mesurés sur deux exécutions : tracemalloc fausse le chronométrage
+    start = time.perf_counter()
+    result = func(raw.copy())
+    elapsed = time.perf_counter() - start
+
+    df = raw.copy()
+    tracemalloc.start()
+    func(df)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(rows, names):
+    for name in names:
+        generate, legacy, current = CASES[name]
+        raw = pd.DataFrame.from_records(generate(rows))
+        results = {}
+        for label, func in (("avant", legacy), ("après", current)):
+            result, elapsed, peak = measure(func, raw)
+            size = result.memory_usage(deep=True).sum()
+            results[label] = result
+            print(f"{name:<20} {label:<6} | {len(result)} lignes | {elapsed:.2f}s | "
+                  f"pic {peak / 1024 ** 2:.0f} Mo | résultat {size / 1024 ** 2:.0f} Mo")
+
+        before, after = results["avant"], results["après"]
+        pd.testing.assert_frame_equal(
+            before.reset_index(drop=True), after.reset_index(drop=True),
+            check_dtype=False, check_categorical=False, check_exact=False, rtol=1e-6,
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Nettoyage avant / après vectorisation sur des données synthétiques")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--datasets", nargs="+", default=list(CASES), choices=list(CASES))
+    args = parser.parse_args()
+    run(args.rows, args.datasets)
@@ -0,0 +1,75 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic
+from benchmarks.bench_geo import synthetic_regions
+from scripts import ev_map, geo, metrics, preprocess, spatial
+
+# Parc national synthétique (~2 fois les points de charge IRVE publiés) : chaque requête est
+# comparée à son équivalent par parcours complet des coordonnées
+DETAIL_VIEW = ((48.6, 2.0), (49.1, 2.7))
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def report(label, scan, indexed):
+    print(f"{label:<28} | parcours {scan * 1000:>9.2f} ms | index {indexed * 1000:>8.3f} ms | x{scan / indexed:,.0f}")
+
+
+def run(rows, queries, vertices):
+    metrics.logger.disabled = True
+    ev_data = preprocess.clean_ev_charging(synthetic.ev_charging_frame(rows, geo="str"))
+    lat, lon = ev_data["lat"].to_numpy(dtype="float64"), ev_data["lon"].to_numpy(dtype="float64")
+    print(f"{len(ev_data)} bornes géolocalisées, {queries} requêtes par cas")
+
+    index, build = timed(lambda: spatial.GridIndex.from_frame(ev_data), 1)
+    print(f"{'construction GridIndex':<28} | {build * 1000:.1f} ms")
+    region_rows, build = timed(lambda: ev_data.groupby("region", observed=True).indices, 1)
+    print(f"{'positions par région':<28} | {build * 1000:.1f} ms")
+
+    region = ev_data["region"].iloc[0]
+    _, scan = timed(lambda: ev_data[ev_data["region"] == region], queries)
+    _, indexed = timed(lambda: ev_data.iloc[region_rows[region]], queries)
+    report("filtre région", scan, indexed)
+
+    _, scan = timed(lambda: ev_map.in_viewport(ev_data, DETAIL_VIEW), queries)
+    _, indexed = timed(lambda: ev_map.in_viewport(ev_data, DETAIL_VIEW, index=index), queries)
+    report("emprise (département)", scan, indexed)
+
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(43, 50, queries), rng.uniform(-2, 7, queries)])
+    points_iter = iter(np.tile(points, (2, 1)))
+    _, scan = timed(lambda: np.argsort(spatial.haversine_km(*next(points_iter), lat, lon))[:10], queries)
+    _, indexed = timed(lambda: index.nearest(*next(points_iter), k=10), queries)
+    report("10 plus proches", scan, indexed)
+
+    points_iter = iter(np.tile(points, (2, 1)))
+    _, scan = timed(lambda: int((spatial.haversine_km(*next(points_iter), lat, lon) <= 10).sum()), queries)
+    _, indexed = timed(lambda: index.count(*next(points_iter), 10), queries)
+    report("bornes à moins de 10 km", scan, indexed)
+
+    regions_geojson = geo.simplify_geojson(synthetic_regions(vertices), zoom=spatial.ASSIGN_ZOOM)
+    polygons, build = timed(lambda: spatial.PolygonIndex(regions_geojson), 1)
+    edges = len(polygons.owner)
+    print(f"{'construction PolygonIndex':<28} | {build * 1000:.1f} ms ({edges} arêtes)")
+    names, elapsed = timed(lambda: polygons.assign(lat, lon), 1)
+    brute = len(lat) * edges
+    print(f"{'affectation des régions':<28} | {elapsed:.2f}s pour {len(lat)} bornes "
+          f"({np.count_nonzero(pd.notna(names))} dans un contour ; test naïf : {brute / 1e9:.1f} G arêtes×points)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index spatial des bornes IRVE face au parcours complet")
+    parser.add_argument("--rows", type=int, default=300_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vertices", type=int, default=20_000, help="sommets par contour de région synthétique")
+    args = parser.parse_args()
+    run(args.rows, args.queries, args.vertices)
@@ -0,0 +1,68 @@
+import argparse
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks import synthetic
+from scripts import load_data, metrics, streaming
+
+# Export CSV synthétique (format ODRE, séparateur ";") nettoyé soit en mémoire (concat de tous les
+# blocs, nettoyage du jeu complet, écriture), soit en flux vers un ParquetSink. Chaque variante
+# tourne dans un processus neuf pour que le pic RSS ne mesure qu'elle.
+FRAMES = {
+    "ev_charging": lambda rows: synthetic.ev_charging_frame(rows, geo="str"),
+    "monthly_production": synthetic.monthly_production_frame,
+}
+
+
+def in_memory(name, path, out, chunk_rows):
+    raw = pd.concat(load_data.iter_export_chunks(path, chunksize=chunk_rows), ignore_index=True)
+    clean = load_data.CLEANERS[name](raw)
+    clean.to_parquet(out, index=False)
+    return len(clean)
+
+
+def streamed(name, path, out, chunk_rows):
+    with streaming.ParquetSink(out) as sink:
+        for raw in load_data.iter_export_chunks(path, chunksize=chunk_rows):
+            sink.write(load_data.CLEANERS[name](raw))
+    return sink.rows
+
+
+VARIANTS = {"mémoire": in_memory, "flux": streamed}
+
+
+def child(variant, name, path, out, chunk_rows, queue):
+    metrics.logger.disabled = True
+    before = metrics.peak_rss_mb()
+    start = time.perf_counter()
+    rows = VARIANTS[variant](name, path, out, chunk_rows)
+    peak = metrics.peak_rss_mb()
+    queue.put((rows, time.perf_counter() - start, peak, peak - before))
+
+
+def run(name, rows, chunk_rows):
+    ctx = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / f"{name}.csv"
+        FRAMES[name](rows).to_csv(path, sep=";", index=False)
+        print(f"{name} : {rows} lignes brutes, export {path.stat().st_size / 1024 ** 2:.1f} Mo, morceaux de {chunk_rows}")
+        for variant in VARIANTS:
+            queue = ctx.Queue()
+            process = ctx.Process(target=child, args=(variant, name, path, Path(tmp) / f"{variant}.parquet", chunk_rows, queue))
+            process.start()
+            clean_rows, elapsed, peak, growth = queue.get()
+            process.join()
+            print(f"{variant:<8} | {clean_rows} lignes nettoyées | {elapsed:.2f}s | pic RSS {peak:.0f} Mo (+{growth:.0f} Mo)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pic mémoire du nettoyage en flux face au nettoyage en mémoire")
+    parser.add_argument("--dataset", default="ev_charging", choices=list(FRAMES))
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=streaming.CHUNK_ROWS)
+    args = parser.parse_args()
+    run(args.dataset, args.rows, args.chunk_rows)
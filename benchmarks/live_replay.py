@@ -0,0 +1,174 @@
+import argparse
+import bisect
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer
+
+from benchmarks import odre_stub
+from scripts import live
+
+# Serveur de rejeu du flux éCO2mix régional : un enregistrement (réel, capturé avec "record", ou
+# synthétique) est servi comme l'API /records, mais seuls les quarts d'heure antérieurs à une
+# horloge de rejeu (début + temps écoulé × vitesse) sont visibles. Comme sur l'API réelle, les
+# quarts d'heure de l'heure suivante sont déjà présents, sans valeurs.
+STEP = timedelta(minutes=15)
+PLACEHOLDER_STEPS = 4
+SHAPES = {      # région -> (consommation moyenne MW, part nucléaire, part éolienne, part solaire)
+    region: (2000 + 700 * (i % 6), 0.2 + 0.05 * (i % 5), 0.05 + 0.02 * (i % 4), 0.03 + 0.01 * (i % 3))
+    for i, region in enumerate(odre_stub.REGIONS)
+}
+
+
+def iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def eco2mix_records(start, days=3, seed=0):
+    # Enregistrement synthétique : cycle journalier de la consommation, solaire le jour, éolien bruité
+    rng = random.Random(seed)
+    records = []
+    for step in range(int(days * 96)):
+        moment = start + step * STEP
+        hour = moment.hour + moment.minute / 60
+        daily = 1 + 0.18 * math.sin((hour - 9) / 24 * 2 * math.pi) + 0.07 * math.sin((hour - 17) / 12 * 2 * math.pi)
+        sun = max(0.0, math.sin((hour - 6) / 14 * math.pi)) if 6 <= hour <= 20 else 0.0
+        for code, region in enumerate(odre_stub.REGIONS, start=11):
+            mean, nuclear, wind, solar = SHAPES[region]
+            consumption = mean * daily * rng.uniform(0.97, 1.03)
+            records.append({
+                "code_insee_region": str(code),
+                "libelle_region": region,
+                "nature": "Données temps réel",
+                "date": moment.strftime("%Y-%m-%d"),
+                "heure": moment.strftime("%H:%M"),
+                "date_heure": iso(moment),
+                "consommation": round(consumption),
+                "nucleaire": round(mean * nuclear * 2 * rng.uniform(0.98, 1.0)),
+                "thermique": round(consumption * 0.05 * rng.uniform(0.5, 1.5)),
+                "hydraulique": round(mean * 0.1 * rng.uniform(0.6, 1.4)),
+                "eolien": round(mean * wind * 2 * rng.uniform(0.2, 1.8)),
+                "solaire": round(mean * solar * 4 * sun * rng.uniform(0.8, 1.0)),
+                "bioenergies": round(mean * 0.02 * rng.uniform(0.9, 1.1)),
+            })
+    return records
+
+
+def load_recording(path):
+    # Tableau JSON, réponse /records ({"results": [...]}) ou JSON lines
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        data = [json.loads(line) for line in text.splitlines() if line.strip()]
+    records = data.get("results", []) if isinstance(data, dict) else data
+    return sorted(records, key=lambda record: odre_stub.normalize_date(record[live.TIME_FIELD]))
+
+
+def save_recording(base_url, path, hours):
+    # Capture des `hours` dernières heures publiées, rejouables ensuite hors ligne
+    feed = live.LiveFeed(base_url=base_url, lookback_hours=hours)
+    cursor = feed.initial_cursor()
+    params = {"where": f"{live.TIME_FIELD} >= {live.odsql_time(cursor)}"} if cursor is not None else {}
+    records = feed.fetch({**params, "order_by": live.TIME_FIELD})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False)
+    print(f"{len(records)} enregistrements écrits dans {path}")
+
+
+class ReplayClock:
+    def __init__(self, start, speed=1.0):
+        self.start = start
+        self.speed = speed
+        self.origin = time.monotonic()
+
+    def now(self):
+        return self.start + timedelta(seconds=(time.monotonic() - self.origin) * self.speed)
+
+
+class ReplayHandler(odre_stub.StubHandler):
+    records = []        # enregistrement trié par date_heure
+    keys = []           # date_heure normalisés, pour la recherche de la coupure
+    clock = None
+    visible = {}        # coupure courante -> enregistrements visibles (un seul jeu conservé)
+    visible_lock = threading.Lock()
+
+    def visible_records(self):
+        # Quarts d'heure publiés jusqu'à l'horloge, puis PLACEHOLDER_STEPS quarts d'heure vides
+        now = self.clock.now()
+        published = bisect.bisect_right(self.keys, odre_stub.normalize_date(iso(now)))
+        upcoming = bisect.bisect_right(self.keys, odre_stub.normalize_date(iso(now + PLACEHOLDER_STEPS * STEP)))
+        with self.visible_lock:
+            if (published, upcoming) not in self.visible:
+                placeholders = [
+                    {key: (None if key in live.VALUE_FIELDS else value) for key, value in record.items()}
+                    for record in self.records[published:upcoming]
+                ]
+                # Le jeu précédent et ses requêtes mémorisées ne serviront plus
+                self.visible.clear()
+                odre_stub._filtered.clear()
+                self.visible[published, upcoming] = self.records[:published] + placeholders
+            return self.visible[published, upcoming]
+
+    def do_GET(self):
+        self.datasets = {live.LIVE_DATASET: self.visible_records()}
+        super().do_GET()
+
+
+def serve_replay(records, start=None, speed=1.0, port=0):
+    # Démarre le serveur de rejeu dans un thread, renvoie (serveur, BASE_URL équivalent, horloge)
+    keys = [odre_stub.normalize_date(record[live.TIME_FIELD]) for record in records]
+    if start is None:
+        start = datetime.fromisoformat(keys[len(keys) // 2]).replace(tzinfo=timezone.utc)
+    clock = ReplayClock(start, speed)
+    handler = type("Handler", (ReplayHandler,), {
+        "records": records, "keys": keys, "clock": clock, "visible": {}, "visible_lock": threading.Lock(),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/api/explore/v2.1/catalog/datasets", clock
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rejeu local du flux éCO2mix régional au pas de 15 minutes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="sert un enregistrement (synthétique par défaut)")
+    serve.add_argument("--recording", default=None, help="fichier JSON capturé avec 'record'")
+    serve.add_argument("--days", type=float, default=3, help="durée de l'enregistrement synthétique")
+    serve.add_argument("--start", default=None, help="début du rejeu (ISO, UTC), milieu de l'enregistrement par défaut")
+    serve.add_argument("--speed", type=float, default=60, help="secondes rejouées par seconde réelle")
+    serve.add_argument("--port", type=int, default=8765)
+    record = commands.add_parser("record", help="capture les dernières heures du flux réel")
+    record.add_argument("--out", default="data/eco2mix_replay.json")
+    record.add_argument("--hours", type=float, default=48)
+    record.add_argument("--base-url", default=None)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        save_recording(args.base_url, args.out, args.hours)
+        return
+
+    if args.recording:
+        records = load_recording(args.recording)
+    else:
+        today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        records = eco2mix_records(today - timedelta(days=args.days), days=args.days)
+    start = datetime.fromisoformat(args.start).replace(tzinfo=timezone.utc) if args.start else None
+    server, base_url, clock = serve_replay(records, start=start, speed=args.speed, port=args.port)
+    print(f"{len(records)} enregistrements rejoués à x{args.speed:g} depuis {clock.start:%Y-%m-%d %H:%M} UTC")
+    print(f"ODRE_LIVE_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+import csv
+import io
+import json
+import operator
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+REGIONS = [
+    "Auvergne-Rhône-Alpes", "Bourgogne-Franche-Comté", "Bretagne", "Centre-Val de Loire",
+    "Grand Est", "Hauts-de-France", "Île-de-France", "Normandie", "Nouvelle-Aquitaine",
+    "Occitanie", "Pays de la Loire", "Provence-Alpes-Côte d'Azur",
+]
+FILIERES = ["nucleaire", "thermique", "hydraulique", "eolienne", "solaire", "bioenergies"]
+
+
+# Générateurs d'enregistrements au format des 4 jeux de données ODRE
+def annual_consumption_records(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        region = REGIONS[i % len(REGIONS)]
+        annee = 2011 + (i // len(REGIONS)) % 14
+        elec = round(rng.uniform(10000, 70000), 1)
+        gaz = round(rng.uniform(5000, 50000), 1)
+        records.append({
+            "annee": str(annee),
+            "code_insee_region": str(11 + i % len(REGIONS)),
+            "region": region,
+            "consommation_brute_gaz_totale": gaz,
+            "consommation_brute_electricite_rte": elec,
+            "consommation_brute_totale": round(elec + gaz, 1),
+        })
+    return records
+
+
+def monthly_production_records(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        month_index = i // len(REGIONS)
+        record = {
+            "mois": f"{2013 + (month_index // 12) % 12}-{month_index % 12 + 1:02d}",
+            "code_insee_region": str(11 + i % len(REGIONS)),
+            "region": REGIONS[i % len(REGIONS)],
+        }
+        for filiere in FILIERES:
+            record[f"production_{filiere}"] = round(rng.uniform(0, 4000), 1) if rng.random() > 0.05 else None
+        records.append(record)
+    return records
+
+
+def facilities_records(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        records.append({
+            "nominstallation": f"Installation {i}",
+            "codeinseecommune": f"{rng.randint(1000, 95999):05d}",
+            "commune": f"Commune {rng.randint(1, 3000)}",
+            "departement": f"Département {rng.randint(1, 95)}",
+            "region": rng.choice(REGIONS),
+            "filiere": rng.choice(["Solaire", "Eolien", "Hydraulique", "Thermique non renouvelable", "Bioénergies"]),
+            "puismaxinstallee": round(rng.uniform(1, 50000), 1),
+            "nbinstallations": rng.randint(1, 200),
+            "datemiseenservice": f"{rng.randint(1980, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        })
+    return records
+
+
+def ev_charging_records(n, seed=0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        lat = round(rng.uniform(42.5, 51.0), 6)
+        lon = round(rng.uniform(-4.7, 8.2), 6)
+        records.append({
+            "n_amenageur": f"Aménageur {rng.randint(1, 400)}",
+            "n_operateur": f"Opérateur {rng.randint(1, 50)}",
+            "id_station": f"FR*S{i:08d}",
+            "code_insee_commune": f"{rng.randint(1000, 95999):05d}",
+            "puiss_max": rng.choice([3.7, 7.4, 11.0, 22.0, 50.0, 150.0]),
+            "date_maj": f"{rng.randint(2012, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "region": rng.choice(REGIONS),
+            "departement": f"Département {rng.randint(1, 95)}",
+            "geo_point_borne": {"lon": lon, "lat": lat} if rng.random() > 0.01 else None,
+        })
+    return records
+
+
+DATASET_GENERATORS = {
+    "consommation-annuelle-brute-regionale": annual_consumption_records,
+    "production-regionale-mensuelle-filiere": monthly_production_records,
+    "registre-national-installation-production-stockage-electricite-agrege": facilities_records,
+    "bornes-irve": ev_charging_records,
+}
+
+DEFAULT_SIZES = {
+    "consommation-annuelle-brute-regionale": 168,
+    "production-regionale-mensuelle-filiere": 1728,
+    "registre-national-installation-production-stockage-electricite-agrege": 10000,
+    "bornes-irve": 10000,
+}
+
+
+def build_datasets(sizes=None, seed=0):
+    sizes = sizes or DEFAULT_SIZES
+    return {name: DATASET_GENERATORS[name](n, seed=seed) for name, n in sizes.items()}
+
+
+# Sous-ensemble d'ODSQL : clauses "champ op littéral" reliées par "and"
+WHERE_CLAUSE = re.compile(r"""^\s*(\w+)\s*(>=|<=|!=|=|>|<)\s*(date'[^']*'|"[^"]*"|'[^']*'|[-\d.]+)\s*$""")
+OPERATORS = {"=": operator.eq, "!=": operator.ne, ">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+
+def normalize_date(value):
+    # "2013", "2013-01" et "2013-01-15" deviennent comparables ; les horodatages
+    # ("2024-05-01T10:15:00+00:00", supposés en UTC) gardent l'heure à la seconde
+    value = str(value)
+    if len(value) > 10 and value[10] in "T ":
+        return value[:10] + "T" + value[11:19]
+    return value + "-01-01"[len(value) - 4:] if len(value) < 10 else value[:10]
+
+
+WHERE_IN = re.compile(r"^\s*(\w+)\s+in\s*\((.*)\)\s*$", re.IGNORECASE)
+WHERE_NOT_NULL = re.compile(r"^\s*(\w+)\s+is\s+not\s+null\s*$", re.IGNORECASE)
+
+
+def parse_where(where):
+    predicates = []
+    for clause in re.split(r"\s+and\s+", where, flags=re.IGNORECASE):
+        match_in = WHERE_IN.match(clause)
+        if match_in:
+            field, values = match_in.groups()
+            values = {value.strip()[1:-1] for value in re.findall(r"\"[^\"]*\"|'[^']*'", values)}
+            predicates.append((field, lambda a, b: a in b, values, str))
+            continue
+        match_not_null = WHERE_NOT_NULL.match(clause)
+        if match_not_null:
+            predicates.append((match_not_null.group(1), lambda a, b: True, None, str))
+            continue
+        match = WHERE_CLAUSE.match(clause)
+        if match is None:
+            raise ValueError(f"clause non supportée : {clause}")
+        field, op, literal = match.groups()
+        if literal.startswith("date'"):
+            value, convert = normalize_date(literal[5:-1]), normalize_date
+        elif literal[0] in "\"'":
+            value, convert = literal[1:-1], str
+        else:
+            value, convert = float(literal), float
+        predicates.append((field, OPERATORS[op], value, convert))
+    return predicates
+
+
+def apply_where(records, where):
+    if not where:
+        return records
+    predicates = parse_where(where)
+    return [
+        record for record in records
+        if all(record.get(field) is not None and op(convert(record[field]), value)
+               for field, op, value, convert in predicates)
+    ]
+
+
+SELECT_AGGREGATE = re.compile(r"^(\w+)\((\*|\w+)\)(?:\s+as\s+(\w+))?$", re.IGNORECASE)
+STUB_AGGREGATES = {
+    "sum": lambda values: sum(v for v in values if v is not None),
+    "avg": lambda values: (lambda vs: sum(vs) / len(vs) if vs else None)([v for v in values if v is not None]),
+    "min": lambda values: min((v for v in values if v is not None), default=None),
+    "max": lambda values: max((v for v in values if v is not None), default=None),
+    "count": lambda values: sum(1 for v in values if v is not None),
+}
+
+
+def apply_select(records, select=None, group_by=None):
+    # Projection et agrégation : "champ", "fonction(champ) as alias", avec group_by optionnel
+    if not select and not group_by:
+        return records
+    known = set(key for record in records[:1000] for key in record)
+    items = [item.strip() for item in (select or "").split(",") if item.strip()]
+    keys = [key.strip() for key in (group_by or "").split(",") if key.strip()]
+    fields, aggregates = [], []
+    for item in items:
+        match = SELECT_AGGREGATE.match(item)
+        if match:
+            func, column, alias = match.groups()
+            if func.lower() not in STUB_AGGREGATES or (column != "*" and known and column not in known):
+                raise ValueError(f"select non supporté : {item}")
+            aggregates.append((alias or item, func.lower(), column))
+        elif known and item not in known:
+            raise ValueError(f"champ inconnu : {item}")
+        else:
+            fields.append(item)
+    for key in keys:
+        if known and key not in known:
+            raise ValueError(f"champ inconnu : {key}")
+
+    if not aggregates and not keys:
+        return [{field: record.get(field) for field in fields} for record in records]
+
+    groups = {}
+    for record in records:
+        groups.setdefault(tuple(record.get(key) for key in keys), []).append(record)
+    results = []
+    for group_key, rows in groups.items():
+        result = dict(zip(keys, group_key))
+        for alias, func, column in aggregates:
+            values = [1 for _ in rows] if column == "*" else [row.get(column) for row in rows]
+            result[alias] = STUB_AGGREGATES[func](values)
+        results.append(result)
+    return results
+
+
+_filtered = {}
+
+
+def filter_records(records, query):
+    # Mémorisé par requête : toutes les pages d'une même requête partagent le résultat filtré
+    key = (id(records), len(records), query.get("where"), query.get("select"), query.get("group_by"))
+    if key not in _filtered:
+        filtered = apply_where(records, query.get("where"))
+        _filtered[key] = apply_select(filtered, query.get("select"), query.get("group_by"))
+    return _filtered[key]
+
+
+def records_to_csv(records):
+    # Même encodage que l'export ODRE : séparateur ";" et geo_point en "lat, lon"
+    columns = list(dict.fromkeys(key for record in records for key in record))
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, delimiter=";")
+    writer.writeheader()
+    for record in records:
+        row = dict(record)
+        for key, value in row.items():
+            if isinstance(value, dict):
+                row[key] = f"{value['lat']}, {value['lon']}"
+        writer.writerow(row)
+    return buffer.getvalue().encode("utf-8")
+
+
+def records_to_parquet(records):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(pa.Table.from_pylist(records), buffer)
+    return buffer.getvalue()
+
+
+EXPORTERS = {
+    "csv": ("text/csv", records_to_csv),
+    "parquet": ("application/octet-stream", records_to_parquet),
+}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    datasets = {}
+    latency = 0.0
+    modified = "2024-01-01T00:00:00+00:00"
+    page_limit = 100
+    offset_limit = 10000
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_bytes(self, content_type, body):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        parts = parsed.path.strip("/").split("/")
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        # /{dataset}/exports/{format} : export complet, sans limite d'offset
+        if len(parts) >= 3 and parts[-2] == "exports" and parts[-3] in self.datasets:
+            if parts[-1] not in EXPORTERS:
+                self.send_json(400, {"error": f"format inconnu : {parts[-1]}"})
+                return
+            try:
+                records = filter_records(self.datasets[parts[-3]], query)
+            except ValueError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            content_type, exporter = EXPORTERS[parts[-1]]
+            self.send_bytes(content_type, exporter(records))
+            return
+
+        # /{dataset} : métadonnées du catalogue
+        if parts and parts[-1] in self.datasets:
+            self.send_json(200, {"dataset_id": parts[-1], "metas": {"default": {"modified": self.modified}}})
+            return
+
+        if len(parts) < 2 or parts[-1] != "records" or parts[-2] not in self.datasets:
+            self.send_json(404, {"error": "not found"})
+            return
+
+        try:
+            records = filter_records(self.datasets[parts[-2]], query)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        limit = int(query.get("limit", 10))
+        offset = int(query.get("offset", 0))
+        if limit > self.page_limit or offset + limit > self.offset_limit:
+            self.send_json(400, {"error": "limit/offset hors bornes"})
+            return
+
+        self.send_json(200, {"total_count": len(records), "results": records[offset:offset + limit]})
+
+
+def serve(datasets=None, latency=0.0, port=0):
+    # Démarre le serveur dans un thread, renvoie (serveur, BASE_URL équivalent)
+    handler = type("Handler", (StubHandler,), {
+        "datasets": datasets if datasets is not None else build_datasets(),
+        "latency": latency,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}/api/explore/v2.1/catalog/datasets"
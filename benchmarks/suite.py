@@ -0,0 +1,201 @@
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import odre_stub, synthetic
+from benchmarks.bench_geo import synthetic_regions
+from scripts import aggregates, ev_map, geo, load_data, metrics
+
+# Suite reproductible : données synthétiques au format ODRE (graine fixe), serveur ODRE local,
+# médiane de plusieurs exécutions par cas, comparaison à une référence enregistrée par échelle.
+#   python -m benchmarks.suite --scale 10k --save-baseline      (sur la machine de référence)
+#   python -m benchmarks.suite --scale 10k                      (compare, code 1 si régression)
+BASELINE_DIR = Path(__file__).parent / "baselines"
+GROUPS = ("fetch", "clean", "aggregate", "map")
+FETCH_MAX_ROWS = 100_000     # l'export complet est servi en mémoire par le serveur local
+FAST_MAP_MAX_ROWS = 20_000   # le mode "fast" embarque chaque borne : coût linéaire connu
+NOISE_FLOOR_SECONDS = 0.005  # écarts absolus en dessous : bruit de mesure, jamais une régression
+DETAIL_VIEW = ((48.6, 2.0), (49.1, 2.7))
+
+
+def timed(func, prepare=None, repeat=3):
+    # prepare() construit les entrées hors chronométrage (copie des DataFrames modifiés en place)
+    timings = []
+    for _ in range(repeat):
+        args = prepare() if prepare else ()
+        start = time.perf_counter()
+        result = func(*args)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def fetch_cases(n):
+    rows = min(n, FETCH_MAX_ROWS)
+    records_rows = min(rows, odre_stub.StubHandler.offset_limit)
+    sizes = {endpoint: rows for endpoint in odre_stub.DATASET_GENERATORS}
+    server, base_url = odre_stub.serve(datasets=odre_stub.build_datasets(sizes))
+    export_dir = tempfile.TemporaryDirectory()
+    previous_url, load_data.BASE_URL = load_data.BASE_URL, base_url
+    try:
+        for name, endpoint in load_data.DATASETS.items():
+            yield f"fetch_records/{name}", records_rows, lambda endpoint=endpoint: load_data.fetch_api_data(endpoint)
+        yield ("fetch_export_csv/ev_charging", rows,
+               lambda: load_data.download_export(load_data.DATASETS["ev_charging"], "csv", dest_dir=export_dir.name))
+    finally:
+        load_data.BASE_URL = previous_url
+        server.shutdown()
+        export_dir.cleanup()
+
+
+def clean_cases(frames):
+    for name, frame in frames.items():
+        clean = load_data.CLEANERS[name]
+        yield name, clean.__name__, len(frame), clean, lambda frame=frame: (frame.copy(),)
+
+
+def aggregate_cases(clean_data):
+    cube = aggregates.build_cube(clean_data)
+    region = aggregates.regions(cube, "production")[0]
+    year = aggregates.production_years(cube, region)[0]
+    yield "build_cube", metrics.count_rows(clean_data), lambda: aggregates.build_cube(clean_data)
+    yield "monthly_mix", len(cube["production"]), lambda: aggregates.monthly_mix(cube, region, year)
+    yield "production_gap", len(cube["production"]), lambda: aggregates.production_gap(cube)
+    yield "regional_means", len(cube["production"]), lambda: aggregates.regional_means(cube)
+    yield "bornes_per_year", len(cube["bornes"]), lambda: aggregates.bornes_per_year(cube)
+
+
+def map_cases(clean_data, cube):
+    ev_data = clean_data["ev_charging"]
+    sample = ev_data.iloc[:FAST_MAP_MAX_ROWS]
+    render = lambda fmap: fmap.get_root().render()
+    yield "ev_map/cluster_levels", len(ev_data), lambda: ev_map.cluster_levels(ev_data)
+    yield "ev_map/grid_z6", len(ev_data), lambda: render(ev_map.build_map(ev_data, mode="grid", zoom=6))
+    yield ("ev_map/grid_z10_view", len(ev_data),
+           lambda: render(ev_map.build_map(ev_data, mode="grid", zoom=10, bounds=DETAIL_VIEW)))
+    yield "ev_map/fast", len(sample), lambda: render(ev_map.build_map(sample, mode="fast", zoom=6))
+
+    # Contours synthétiques (pas de réseau) simplifiés comme les vrais
+    regions_geojson = geo.simplify_geojson(synthetic_regions(20_000), zoom=5)
+    conso, _ = aggregates.regional_means(cube)
+    yield ("choropleth", len(conso),
+           lambda: render(geo.create_choropleth(conso, "Consommation (GWh)", "Reds", geojson_data=regions_geojson)))
+
+
+def run(scale, groups=GROUPS, repeat=3, seed=0):
+    n = synthetic.parse_scale(scale)
+    results = {}
+
+    def record(case, rows, func, prepare=None):
+        result, timings = timed(func, prepare, repeat)
+        results[case] = {"rows": rows, "seconds": round(statistics.median(timings), 4),
+                         "min_seconds": round(min(timings), 4)}
+        print(f"{case:<34} | {rows:>10} lignes | {results[case]['seconds']:.4f}s", flush=True)
+        return result
+
+    if "fetch" in groups:
+        for case, rows, func in fetch_cases(n):
+            record(case, rows, func)
+
+    print(f"Génération des données synthétiques ({n} lignes par jeu, graine {seed})...", flush=True)
+    frames = synthetic.build_frames(n, seed=seed)
+    clean_data = {}
+    for name, case, rows, clean, prepare in clean_cases(frames):
+        clean_data[name] = record(case, rows, clean, prepare) if "clean" in groups else clean(*prepare())
+    del frames
+
+    cube = aggregates.build_cube(clean_data)
+    if "aggregate" in groups:
+        for case, rows, func in aggregate_cases(clean_data):
+            record(case, rows, func)
+    if "map" in groups:
+        for case, rows, func in map_cases(clean_data, cube):
+            record(case, rows, func)
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+
+
+def baseline_path(scale):
+    return BASELINE_DIR / f"{str(scale).lower()}.json"
+
+
+def save_baseline(path, scale, results, repeat, seed):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {"scale": str(scale), "rows": synthetic.parse_scale(scale), "repeat": repeat, "seed": seed,
+               "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(), "results": results}
+    path.write_text(json.dumps(payload, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    print(f"Référence enregistrée : {path}")
+
+
+def compare(results, baseline, tolerance):
+    # Régression : plus lent que la référence de plus de `tolerance` (relatif) et du seuil de bruit (absolu)
+    reference = baseline["results"]
+    if baseline.get("environment") != environment():
+        print(f"Attention : environnement différent de la référence ({baseline.get('environment')})")
+    regressions = []
+    print(f"\n{'cas':<34} | {'référence':>10} | {'actuel':>10} | ratio")
+    for case, current in results.items():
+        if case not in reference:
+            print(f"{case:<34} | {'-':>10} | {current['seconds']:>9.4f}s | nouveau")
+            continue
+        before, after = reference[case]["seconds"], current["seconds"]
+        ratio = after / before if before else float("inf")
+        slower = ratio > 1 + tolerance and after - before > NOISE_FLOOR_SECONDS
+        flag = "  RÉGRESSION" if slower else ("  amélioration" if ratio < 1 - tolerance else "")
+        print(f"{case:<34} | {before:>9.4f}s | {after:>9.4f}s | {ratio:.2f}{flag}")
+        if slower:
+            regressions.append(case)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suite de benchmarks du pipeline ODRE sur données synthétiques")
+    parser.add_argument("--scale", default="10k", help=f"lignes par jeu : {', '.join(synthetic.SCALES)} ou un entier")
+    parser.add_argument("--groups", nargs="+", default=list(GROUPS), choices=GROUPS)
+    parser.add_argument("--repeat", type=int, default=3, help="exécutions par cas (la médiane est retenue)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=None, help="fichier de référence (défaut : baselines/<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="enregistre les résultats comme référence")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ralentissement relatif toléré (0.25 = +25 %%)")
+    parser.add_argument("--output", type=Path, default=None, help="écrit aussi les résultats bruts en JSON")
+    args = parser.parse_args(argv)
+
+    # Les lignes JSON de l'instrumentation noieraient le tableau ; son coût reste inclus dans les mesures
+    metrics.logger.disabled = True
+    results = run(args.scale, groups=args.groups, repeat=args.repeat, seed=args.seed)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+
+    path = args.baseline or baseline_path(args.scale)
+    if args.save_baseline:
+        save_baseline(path, args.scale, results, args.repeat, args.seed)
+        return 0
+    if not path.exists():
+        print(f"Pas de référence {path} : relancer avec --save-baseline pour en créer une")
+        return 0
+    regressions = compare(results, json.loads(path.read_text(encoding="utf-8")), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) : {', '.join(regressions)}")
+        return 1
+    print("\nAucune régression")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.odre_stub import FILIERES, REGIONS
+
+# Générateurs vectorisés de DataFrames au format brut des 4 jeux ODRE, tels que les reçoit le
+# chargeur (projection preprocess.RAW_COLUMNS quand elle existe) ; utilisables jusqu'à 10 M de
+# lignes, là où les générateurs d'enregistrements d'odre_stub (dicts Python) servent le serveur HTTP
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+FACILITY_FILIERES = ["Solaire", "Eolien", "Hydraulique", "Thermique non renouvelable", "Bioénergies"]
+
+
+def parse_scale(scale):
+    if str(scale).lower() in SCALES:
+        return SCALES[str(scale).lower()]
+    return int(scale)
+
+
+def labels(prefix, codes):
+    # Chaînes "<préfixe> <n>" construites une fois par valeur distincte, puis répétées par indexation
+    uniques, inverse = np.unique(codes, return_inverse=True)
+    return np.array([f"{prefix} {code}" for code in uniques], dtype=object)[inverse]
+
+
+def dates(rng, n, start_year, end_year):
+    years = rng.integers(start_year, end_year + 1, n)
+    months = rng.integers(1, 13, n)
+    days = rng.integers(1, 29, n)
+    values = (years - 1970).astype("datetime64[Y]") + (months - 1).astype("timedelta64[M]")
+    return np.datetime_as_string(values.astype("datetime64[D]") + (days - 1).astype("timedelta64[D]")).astype(object)
+
+
+def annual_consumption_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    i = np.arange(n)
+    elec = np.round(rng.uniform(10000, 70000, n), 1)
+    gaz = np.round(rng.uniform(5000, 50000, n), 1)
+    return pd.DataFrame({
+        "annee": (2011 + (i // len(REGIONS)) % 14).astype(str),
+        "region": np.array(REGIONS, dtype=object)[i % len(REGIONS)],
+        "consommation_brute_electricite_rte": elec,
+        "consommation_brute_gaz_totale": gaz,
+        "consommation_brute_totale": np.round(elec + gaz, 1),
+    })
+
+
+def monthly_production_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    i = np.arange(n)
+    month_index = i // len(REGIONS)
+    mois = pd.Series(2013 + (month_index // 12) % 12).astype(str) + "-" + pd.Series(month_index % 12 + 1).map("{:02d}".format)
+    df = pd.DataFrame({"mois": mois, "region": np.array(REGIONS, dtype=object)[i % len(REGIONS)]})
+    for filiere in FILIERES:
+        values = np.round(rng.uniform(0, 4000, n), 1)
+        values[rng.random(n) < 0.05] = np.nan
+        df[f"production_{filiere}"] = values
+    return df
+
+
+def facilities_frame(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "commune": labels("Commune", rng.integers(1, 3001, n)),
+        "departement": labels("Département", rng.integers(1, 96, n)),
+        "region": np.array(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), n)],
+        "filiere": np.array(FACILITY_FILIERES, dtype=object)[rng.integers(0, len(FACILITY_FILIERES), n)],
+        "puismaxinstallee": np.round(rng.uniform(1, 50000, n), 1),
+        "nbinstallations": rng.integers(1, 201, n),
+        "datemiseenservice": dates(rng, n, 1980, 2024),
+    })
+
+
+def ev_charging_frame(n, seed=0, geo="dict"):
+    # geo="dict" : geo_point comme l'API /records ; geo="str" : "lat, lon" comme l'export CSV (plus léger)
+    rng = np.random.default_rng(seed)
+    lat = np.round(rng.uniform(42.5, 51.0, n), 6)
+    lon = np.round(rng.uniform(-4.7, 8.2, n), 6)
+    missing = rng.random(n) < 0.01
+    if geo == "dict":
+        points = [None if m else {"lon": x, "lat": y} for y, x, m in zip(lat.tolist(), lon.tolist(), missing.tolist())]
+    else:
+        points = pd.Series(lat.astype(str), dtype=object) + ", " + pd.Series(lon.astype(str), dtype=object)
+        points = points.where(~missing, None)
+    return pd.DataFrame({
+        "n_amenageur": labels("Aménageur", rng.integers(1, 401, n)),
+        "region": np.array(REGIONS, dtype=object)[rng.integers(0, len(REGIONS), n)],
+        "departement": labels("Département", rng.integers(1, 96, n)),
+        "code_insee_commune": np.char.zfill(rng.integers(1000, 96000, n).astype(str), 5).astype(object),
+        "puiss_max": rng.choice([3.7, 7.4, 11.0, 22.0, 50.0, 150.0], n),
+        "geo_point_borne": points,
+        "date_maj": dates(rng, n, 2012, 2024),
+    })
+
+
+FRAME_GENERATORS = {
+    "monthly_production": monthly_production_frame,
+    "facilities": facilities_frame,
+    "ev_charging": ev_charging_frame,
+    "annual_consumption": annual_consumption_frame,
+}
+
+
+def build_frames(n, seed=0):
+    return {name: generate(n, seed=seed) for name, generate in FRAME_GENERATORS.items()}
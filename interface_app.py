@@ -1,15 +1,15 @@
-import streamlit as st
-import pandas as pd
-import folium
-from folium.plugins import MarkerCluster
-from streamlit_folium import st_folium
-from scripts import load_data, preprocess
-import plotly.express as px
-import altair as alt
-import requests
+import os
+import sys
+import time
 
+# Début du run (délai avant premier affichage) ; premier run du processus si les modules de
+# données ne sont pas encore importés
+RUN_START = time.perf_counter()
+COLD_START = "scripts.aggregates" not in sys.modules
 
+import streamlit as st
 
+from scripts import metrics
 
 st.set_page_config(page_title="Analyse IRVE", layout="wide")
 
@@ -32,330 +32,538 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_and_prepare():
-    raw_data = load_data.load_all()
-    return preprocess.clean_and_merge(raw_data)
+# Onglets à exécution paresseuse : seul l'onglet ouvert est calculé, un changement d'onglet relance
+# le script. La barre d'onglets est affichée avant tout import de données ou de graphiques.
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ["Production mensuelle par Région", "Conso en temps réel","Comparaison entre Région", "Bornes IRVE", "Parc installé"],
+    key="tab", on_change="rerun",
+)
+FIRST_RUN = not st.session_state.get("first_render_done")
+if FIRST_RUN:
+    st.session_state["first_render_done"] = True
+    metrics.mark("first_render", time.perf_counter() - RUN_START, cold=COLD_START)
+
+# Modules de données importés après le premier affichage ; folium, plotly et altair ne le sont
+# qu'au premier usage, dans les onglets qui en ont besoin
+import pandas as pd
+import streamlit.components.v1 as components
+from scripts import aggregates, artifacts, async_load, cache, facilities, live, store
+
+# Le cache disque (scripts/cache.py) est partagé entre processus. Chaque jeu nettoyé est chargé
+# séparément (artefacts précalculés par "python main.py build" s'ils existent, sinon chargement
+# parallèle de scripts/async_load.py) : ceux de l'onglet ouvert d'abord, les autres en arrière-plan
+# en un seul lot. cache_resource : les frames ne sont ni copiés ni re-hachés à chaque rerun, et ne
+# doivent donc jamais être modifiés en place
+def load_clean(names):
+    if artifacts.available():
+        return artifacts.load_clean(names=names)
+    return async_load.load_all_parallel(names=names)
+
+# Le chargeur expiré est fermé (thread de préchargement arrêté) avant d'être remplacé
+@st.cache_resource(ttl=cache.DEFAULT_TTL, on_release=lambda loader: loader.close())
+def dataset_loader():
+    return async_load.DatasetLoader(load_clean)
+
+# Jeux nettoyés lus par chaque onglet (directement ou par les tables du cube qui en sont tirées)
+TAB_DATASETS = {
+    "production": ["monthly_production"],
+    "consumption": ["annual_consumption"],
+    "comparison": ["annual_consumption", "monthly_production"],
+    "irve": ["ev_charging", "annual_consumption"],
+    "facilities": ["facilities", "monthly_production"],
+}
+TABS = {"production": tab1, "consumption": tab2, "comparison": tab3, "irve": tab4, "facilities": tab5}
+
+# Stockage DuckDB optionnel (ODRE_STORAGE=duckdb) : les données nettoyées sont écrites en Parquet
+# partitionné puis libérées, les onglets n'en lisent que les lignes filtrées ou agrégées
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def prepare_store():
+    store.write_all(async_load.load_all_parallel())
+    return time.time()          # version des données écrites
+
+if store.enabled():
+    prepare_store()
+else:
+    open_datasets = [name for tab, names in TAB_DATASETS.items() if TABS[tab].open for name in names]
+    dataset_loader().prefetch(dict.fromkeys(open_datasets))
+    dataset_loader().prefetch(async_load.load_data.DATASETS)
+
+def clean(name):
+    return dataset_loader().get(name)
+
+# Version des données d'un jeu, passée en argument aux caches qui en dérivent (positions, cube,
+# index) : un jeu rechargé les recalcule au lieu de se voir appliquer ceux de la version précédente
+def data_version(name):
+    if store.enabled():
+        return prepare_store()
+    return dataset_loader().version(name)
+
+# Positions des lignes de chaque région, calculées une fois par version du jeu : le filtre par
+# région d'un rerun devient une sélection iloc au lieu d'une comparaison sur toute la colonne
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def region_rows(name, version):
+    df = clean(name)
+    return df.groupby("region", observed=True).indices if df is not None and not df.empty else {}
+
+def dataset(name, region=None):
+    if store.enabled():
+        return store.read(name, region=region)
+    df = clean(name)
+    if df is None or region is None:
+        return df
+    return df.iloc[region_rows(name, data_version(name)).get(region, [])]
+
+def dataset_regions(name):
+    if store.enabled():
+        return store.regions(name)
+    df = clean(name)
+    return sorted(df["region"].dropna().unique()) if df is not None and not df.empty else []
+
+# Tables d'agrégats calculées une fois par version des données, partagées (en lecture seule) par
+# tous les reruns ; chacune n'est construite qu'au premier accès, à partir de son seul jeu source
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def cube_table(table, version):
+    if store.enabled():
+        return store.build_cube()[table]
+    if artifacts.available():
+        return artifacts.load_cube()[table]
+    source, builder = aggregates.CUBE_SOURCES[table]
+    with metrics.stage("aggregate", table=table):
+        return builder(clean(source))
+
+# Grilles de clusters IRVE par niveau de zoom, calculées une fois par région et version des bornes
+@st.cache_data(ttl=cache.DEFAULT_TTL)
+def ev_cluster_levels(region, version):
+    from scripts import ev_map
+    return ev_map.cluster_levels(dataset("ev_charging", region).dropna(subset=["lat", "lon"]))
+
+# Bornes géolocalisées d'une région et leur index spatial (emprise de la carte, bornes les plus
+# proches) : les positions renvoyées par l'index se rapportent à ce frame, mis en cache avec lui
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def ev_spatial_index(region, version):
+    from scripts import spatial
+    region_ev_data = dataset("ev_charging", region).dropna(subset=["lat", "lon"])
+    return region_ev_data, spatial.GridIndex.from_frame(region_ev_data)
+
+# Flux éCO2mix au pas de 15 minutes, partagé par toutes les sessions (une interrogation au plus
+# toutes les ODRE_LIVE_POLL_SECONDS) ; le fragment se réexécute seul à ce rythme, sans relancer
+# le reste de la page ni recharger les autres jeux de données
+@st.cache_resource
+def live_feed():
+    return live.LiveFeed()
+
+@st.fragment(run_every=live.POLL_SECONDS)
+def live_consumption():
+    with metrics.stage("render", tab="live"):
+        feed = live_feed()
+        _, error = feed.poll_if_due()
+        regions = feed.regions()
+        if not regions:
+            st.warning("Flux temps réel indisponible." + (f" ({error})" if error else ""))
+            return
+
+        selected_region = st.selectbox("Choisissez une région", regions, key="region_live")
+        region_live = feed.frame(selected_region)
+        region_live.index = region_live.index.tz_convert("Europe/Paris")
+        conso = region_live["consommation"]
+        delta = f"{conso.iloc[-1] - conso.iloc[-2]:+,.0f} MW" if len(conso) > 1 else None
+        st.metric(f"Consommation à {conso.index[-1]:%d/%m %H:%M}", f"{conso.iloc[-1]:,.0f} MW", delta=delta)
+        st.line_chart(conso)
+
+        st.subheader("Production par filière (MW)")
+        st.area_chart(region_live[[column for column in live.VALUE_FIELDS if column != "consommation"]])
+        if error:
+            st.caption(f"Dernière mise à jour impossible ({error}), affichage des points déjà reçus.")
+
+cube = aggregates.LazyCube(lambda table: cube_table(table, data_version(aggregates.CUBE_SOURCES[table][0])))
+
+# Calculs de chaque onglet : fonctions pures, mises en cache sur les valeurs des widgets et la
+# version des jeux lus (data_version), comme les positions et le cube dont elles dérivent. Les jeux
+# nettoyés et le cube sont partagés en lecture seule (cache_resource) : les colonnes dérivées sont
+# ajoutées à des copies (assign), jamais aux frames en cache
+@st.cache_data(ttl=cache.DEFAULT_TTL)
+def production_view(region, year, version):
+    return aggregates.monthly_mix(cube, region, year)
+
+@st.cache_data(ttl=cache.DEFAULT_TTL)
+def annual_view(region, version):
+    region_data = dataset("annual_consumption", region)
+    years = pd.to_datetime(region_data["année"], unit="ns", errors="coerce").dt.year
+    region_data = region_data.assign(année=years).dropna(subset=["année"]).sort_values("année")
+    region_data = region_data.assign(année=region_data["année"].astype(int).astype(str))
+
+    region_pct = region_data.dropna(subset=["conso_elec_GWh", "conso_gaz_GWh"])
+    total = region_pct["conso_elec_GWh"] + region_pct["conso_gaz_GWh"]
+    region_pct = region_pct.assign(
+        elec_pct=(region_pct["conso_elec_GWh"] / total * 100).round(2),
+        gaz_pct=(region_pct["conso_gaz_GWh"] / total * 100).round(2),
+    )
+    df_pct_plot = region_pct[["année", "elec_pct", "gaz_pct"]].melt(
+        id_vars="année",
+        value_vars=["elec_pct", "gaz_pct"],
+        var_name="Énergie",
+        value_name="Part (%)"
+    )
+    return region_data, df_pct_plot
+
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def annual_share_figure(region, version):
+    import plotly.express as px
+    fig = px.line(
+        annual_view(region, version)[1],
+        x="année",
+        y="Part (%)",
+        color="Énergie",
+        markers=True,
+        labels={"année": "Année"},
+        title="Évolution comparée de la part Électricité vs Gaz (%)"
+    )
+    fig.update_layout(legend_title_text="Source d'énergie", xaxis_type='category')
+    return fig
+
+# versions : (consommation annuelle, production mensuelle)
+@st.cache_data(ttl=cache.DEFAULT_TTL)
+def comparison_view(selected_regions, versions):
+    selected_regions = list(selected_regions)
+    df_conso = aggregates.annual_consumption(cube, selected_regions)
+    df_conso_pivot = (df_conso.assign(année=df_conso["year"].astype(str))
+                      .pivot(index="année", columns="region", values="conso_elec_GWh"))
+
+    df_prod_grouped = aggregates.annual_production(cube, selected_regions)
+    df_prod_pivot = (df_prod_grouped.assign(year=df_prod_grouped["year"].astype(str))
+                     .pivot(index="year", columns="region", values="prod_GWh"))
+
+    df_national_gap = aggregates.production_gap(cube, selected_regions)
+    df_national_gap = df_national_gap.assign(année=df_national_gap["year"].astype(str))
+    return df_conso_pivot, df_prod_pivot, df_national_gap, sorted(df_conso["region"].unique())
+
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def gap_chart(selected_regions, region, versions):
+    import altair as alt
+    df_national_gap = comparison_view(selected_regions, versions)[2]
+    df_gap = df_national_gap[df_national_gap["region"] == region]
+    df_mean = df_national_gap.groupby("année")["écart_GWh"].mean().reset_index()
+
+    bar_chart = alt.Chart(df_gap).mark_bar().encode(
+        x=alt.X('année:N', title="Année"),
+        y=alt.Y('écart_GWh:Q', title="Écart Production - Consommation (GWh)"),
+        color=alt.condition(
+            alt.datum.écart_GWh > 0,
+            alt.value("#2E86DE"),
+            alt.value("#E74C3C")
+        ),
+        tooltip=["année", "écart_GWh"]
+    )
+
+    line_chart = alt.Chart(df_mean).mark_line(strokeDash=[5, 5], color='black').encode(
+        x='année:N',
+        y='écart_GWh:Q',
+        tooltip=["année", alt.Tooltip("écart_GWh", title="Moyenne nationale")]
+    )
+
+    return (bar_chart + line_chart).properties(
+        width=700,
+        height=400,
+        title=f"Écart Production - Consommation – {region} (avec moyenne nationale)"
+    )
+
+def comparison_versions():
+    return data_version("annual_consumption"), data_version("monthly_production")
+
+# Choroplèthes des moyennes annuelles par région : pré-rendues par "python main.py build" si
+# disponibles, sinon rendues une fois en HTML sur les contours simplifiés (scripts/geo.py)
+CHOROPLETHS = {
+    "choropleth_conso": (0, "Consommation (GWh)"),
+    "choropleth_prod": (1, "Production (GWh)"),
+}
+
+@st.cache_data(ttl=cache.DEFAULT_TTL)
+def choropleth_html(name, versions):
+    html = artifacts.read_map(name)
+    if html:
+        return html
+    from scripts import geo
+    position, legend_name = CHOROPLETHS[name]
+    values = aggregates.regional_means(cube)[position]
+    return geo.create_choropleth(values, legend_name, "Reds").get_root().render()
+
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def bornes_figure(version):
+    import plotly.express as px
+    df_bornes = aggregates.bornes_per_year(cube).rename(columns={"year": "annee_installation"})
+    return px.bar(
+        df_bornes,
+        x="annee_installation",
+        y="n_bornes",
+        color="region",
+        barmode="group",
+        title="Nombre de bornes installées par an et par région",
+        labels={"annee_installation": "Année", "n_bornes": "Nombre de bornes"}
+    )
+
+# Registre des installations sous forme compacte (scripts/facilities.py) : cumuls de puissance par
+# région × filière × année calculés une fois, facteurs de charge tirés du cube de production
+@st.cache_resource(ttl=cache.DEFAULT_TTL)
+def facility_registry(version):
+    return facilities.build_registry(dataset("facilities"))
+
+# versions : (registre, production mensuelle)
+@st.cache_data(ttl=cache.DEFAULT_TTL)
+def load_factor_view(region, versions):
+    factors = facilities.load_factors(facility_registry(versions[0]), cube["production"], region)
+    return factors.pivot(index="year", columns="filiere", values="facteur_charge_pct"), factors
+
+# Chaque onglet est un fragment : un changement de widget ne relance que l'onglet concerné
+@st.fragment
+def production_tab():
+    with metrics.stage("render", tab="production"):
+        st.header("Production mensuelle par filière et région")
+
+        if not cube["production"].empty:
+            regions = aggregates.regions(cube, "production")
+            selected_region = st.selectbox("Choisissez une région", regions, key="region_prod")
+
+            years = aggregates.production_years(cube, selected_region)
+
+            if years:
+                selected_year = st.selectbox("Choisissez une année", years)
+                pivot_pct, filiere_total = production_view(selected_region, selected_year, data_version("monthly_production"))
+
+                st.subheader("Répartition mensuelle (en %)")
+                st.bar_chart(pivot_pct)
+
+                st.subheader(" Répartition totale par filière (% de la production annuelle)")
+                total_year = filiere_total["production_GWh"].sum()
+
+                st.dataframe(filiere_total.sort_values("%", ascending=False))
+
+                st.metric("Production totale en GWh", f"{total_year:,.1f}")
+            else:
+                st.warning("Aucune donnée dispo pour cette région.")
+        else:
+            st.warning("Les données ne sont pas disponibles.")
 
-clean_data = load_and_prepare()
-ev_data = clean_data.get("ev_charging")
+@st.fragment
+def consumption_tab():
+    with metrics.stage("render", tab="consumption"):
+        st.header("Consommation annuelle par région (GWh)")
 
-tab1, tab2, tab3, tab4 = st.tabs(["Production mensuelle par Région", "Conso en temps réel","Comparaison entre Région", "Bornes IRVE"])
+        regions = dataset_regions("annual_consumption")
+        if regions:
+            selected_region = st.selectbox("Choisissez une région", regions, key="region_select_tab2")
+            region_data, _ = annual_view(selected_region, data_version("annual_consumption"))
 
-with tab1:
-    st.header("Production mensuelle par filière et région")
+            st.subheader(f"Consommation électrique annuelle – {selected_region}")
+            st.line_chart(region_data.set_index("année")["conso_elec_GWh"])
 
-    df_prod = clean_data.get("monthly_production")
-    if df_prod is not None and not df_prod.empty:
-        regions = sorted(df_prod["region"].dropna().unique())
-        selected_region = st.selectbox("Choisissez une région", regions, key="region_prod")
+            st.subheader("Répartition annuelle électricité vs gaz")
+            st.bar_chart(region_data.set_index("année")[["conso_elec_GWh", "conso_gaz_GWh"]])
 
-        region_data = df_prod[df_prod["region"] == selected_region].copy()
+            st.subheader("Répartition % Électricité vs Gaz")
+            st.plotly_chart(annual_share_figure(selected_region, data_version("annual_consumption")), use_container_width=True)
 
-        if not region_data.empty:
-            region_data["year"] = region_data["mois"].dt.year
-            region_data["month"] = region_data["mois"].dt.strftime("%Y-%m")
+            st.subheader("Données brutes")
+            st.dataframe(region_data)
+        else:
+            st.warning("Données annuelles indisponibles.")
 
-            selected_year = st.selectbox("Choisissez une année", sorted(region_data["year"].unique(), reverse=True))
-            year_data = region_data[region_data["year"] == selected_year]
+@st.fragment
+def comparison_tab():
+    with metrics.stage("render", tab="comparison"):
+        st.header("Comparaison entre régions – Production & Consommation")
 
-            st.subheader("Répartition mensuelle (en %)")
-            monthly_total = year_data.groupby("month")["production_GWh"].sum().reset_index(name="total")
-            merged = pd.merge(year_data, monthly_total, on="month")
-            merged["production_pct"] = (merged["production_GWh"] / merged["total"] * 100).round(2)
+        if not cube["consumption"].empty and not cube["production"].empty:
+            st.subheader("🔌 Choix des régions")
+            regions = sorted(set(aggregates.regions(cube, "consumption")).intersection(aggregates.regions(cube, "production")))
+            selected_regions = tuple(st.multiselect("Sélectionnez les régions à comparer", regions, default=regions[:3]))
+            df_conso_pivot, df_prod_pivot, _, gap_regions = comparison_view(selected_regions, comparison_versions())
 
-            agg_pct = merged.groupby(["month", "filiere"])["production_pct"].mean().reset_index()
+            st.subheader("Consommation électrique annuelle (GWh)")
+            st.line_chart(df_conso_pivot)
 
-            pivot_pct = agg_pct.pivot(index="month", columns="filiere", values="production_pct").fillna(0)
+            st.subheader("Production annuelle totale (GWh)")
+            st.line_chart(df_prod_pivot)
 
-            st.bar_chart(pivot_pct)
+            st.subheader("Écart Production - Consommation")
 
-            st.subheader(" Répartition totale par filière (% de la production annuelle)")
-            filiere_total = year_data.groupby("filiere")["production_GWh"].sum().reset_index()
-            total_year = filiere_total["production_GWh"].sum()
-            filiere_total["%"] = (filiere_total["production_GWh"] / total_year * 100).round(2)
+            selected_region_for_gap = st.selectbox(
+                "Choisissez une région pour afficher l'écart production-consommation",
+                gap_regions,
+                key="region_gap"
+            )
 
-            st.dataframe(filiere_total.sort_values("%", ascending=False))
+            st.altair_chart(gap_chart(selected_regions, selected_region_for_gap, comparison_versions()), use_container_width=True)
 
-            st.metric("Production totale en GWh", f"{total_year:,.1f}")
+            st.markdown("""
+            - Un **écart positif** signifie que la région **produit plus qu'elle ne consomme**, ce qui en fait un **territoire exportateur net**.
+            - Un **écart négatif** indique une **dépendance à l'importation d'énergie**, souvent liée à une faible capacité de production locale.
+            - La **ligne pointillée** représente la **moyenne nationale** de l’écart, ce qui permet de situer chaque région par rapport à l’ensemble du pays.
+            """)
         else:
-            st.warning("Aucune donnée dispo pour cette région.")
-    else:
-        st.warning("Les données ne sont pas disponibles.")
-
-with tab2:
-    st.header("Consommation annuelle par région (GWh)")
-
-    df_annual = clean_data.get("annual_consumption")
-    if df_annual is not None and not df_annual.empty:
-        regions = sorted(df_annual["region"].unique())
-
-        selected_region = st.selectbox("Choisissez une région", regions, key="region_select_tab2")
-        region_data = df_annual[df_annual["region"] == selected_region].copy()
-
-        region_data["année"] = pd.to_datetime(region_data["année"], unit="ns", errors="coerce").dt.year
-        region_data = region_data.dropna(subset=["année"]).sort_values("année")
-        region_data["année"] = region_data["année"].astype(int).astype(str)
-
-        st.subheader(f"Consommation électrique annuelle – {selected_region}")
-        st.line_chart(region_data.set_index("année")["conso_elec_GWh"])
-
-        st.subheader("Répartition annuelle électricité vs gaz")
-        st.bar_chart(region_data.set_index("année")[["conso_elec_GWh", "conso_gaz_GWh"]])
-
-        st.subheader("Répartition % Électricité vs Gaz")
-
-        region_pct = region_data.dropna(subset=["conso_elec_GWh", "conso_gaz_GWh"]).copy()
-        region_pct["total"] = region_pct["conso_elec_GWh"] + region_pct["conso_gaz_GWh"]
-        region_pct["elec_pct"] = (region_pct["conso_elec_GWh"] / region_pct["total"] * 100).round(2)
-        region_pct["gaz_pct"] = (region_pct["conso_gaz_GWh"] / region_pct["total"] * 100).round(2)
-
-        df_pct_plot = region_pct[["année", "elec_pct", "gaz_pct"]].melt(
-            id_vars="année",
-            value_vars=["elec_pct", "gaz_pct"],
-            var_name="Énergie",
-            value_name="Part (%)"
-        )
-
-        fig = px.line(
-            df_pct_plot,
-            x="année",
-            y="Part (%)",
-            color="Énergie",
-            markers=True,
-            labels={"année": "Année"},
-            title="Évolution comparée de la part Électricité vs Gaz (%)"
-        )
-        fig.update_layout(legend_title_text="Source d'énergie", xaxis_type='category')
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.subheader("Données brutes")
-        st.dataframe(region_data)
-    else:
-        st.warning("Données annuelles indisponibles.")
-
-
-with tab3:
-    st.header("Comparaison entre régions – Production & Consommation")
-
-    df_annual = clean_data.get("annual_consumption")
-    df_prod = clean_data.get("monthly_production")
-
-    if df_annual is not None and not df_annual.empty and df_prod is not None and not df_prod.empty:
-        st.subheader("🔌 Choix des régions")
-        regions = sorted(set(df_annual["region"]).intersection(set(df_prod["region"])))
-        selected_regions = st.multiselect("Sélectionnez les régions à comparer", regions, default=regions[:3])
-
-        # Conversion propre de l'année depuis timestamp
-        df_annual["année"] = pd.to_datetime(df_annual["année"], unit="ns", errors="coerce").dt.year.astype(str)
-
-        st.subheader("Consommation électrique annuelle (GWh)")
-        df_conso = df_annual[df_annual["region"].isin(selected_regions)].copy()
-        df_conso_pivot = df_conso.pivot(index="année", columns="region", values="conso_elec_GWh")
-        st.line_chart(df_conso_pivot)
-
-        st.subheader("Production annuelle totale (GWh)")
-        df_prod["year"] = df_prod["mois"].dt.year.astype(str)
-        df_prod_grouped = df_prod[df_prod["region"].isin(selected_regions)].groupby(["year", "region"])[
-            "production_GWh"].sum().reset_index()
-        df_prod_pivot = df_prod_grouped.pivot(index="year", columns="region", values="production_GWh")
-        st.line_chart(df_prod_pivot)
-
-        st.subheader("Écart Production - Consommation")
-
-        selected_region_for_gap = st.selectbox(
-            "Choisissez une région pour afficher l'écart production-consommation",
-            sorted(df_conso["region"].unique()),
-            key="region_gap"
-        )
-
-        df_conso_gap = df_conso[df_conso["region"] == selected_region_for_gap]
-        df_prod_gap = df_prod_grouped[df_prod_grouped["region"] == selected_region_for_gap].rename(
-            columns={"year": "année", "production_GWh": "prod_GWh"}
-        )
-
-        df_gap = pd.merge(
-            df_conso_gap.groupby(["année", "region"])["conso_elec_GWh"].sum().reset_index(),
-            df_prod_gap,
-            on=["année", "region"],
-            how="inner"
-        )
-        df_gap["écart_GWh"] = df_gap["prod_GWh"] - df_gap["conso_elec_GWh"]
-
-        df_national_gap = pd.merge(
-            df_conso.groupby(["année", "region"])["conso_elec_GWh"].sum().reset_index(),
-            df_prod_grouped.rename(columns={"year": "année", "production_GWh": "prod_GWh"}),
-            on=["année", "region"],
-            how="inner"
-        )
-        df_national_gap["écart_GWh"] = df_national_gap["prod_GWh"] - df_national_gap["conso_elec_GWh"]
-        df_mean = df_national_gap.groupby("année")["écart_GWh"].mean().reset_index()
-
-        bar_chart = alt.Chart(df_gap).mark_bar().encode(
-            x=alt.X('année:N', title="Année"),
-            y=alt.Y('écart_GWh:Q', title="Écart Production - Consommation (GWh)"),
-            color=alt.condition(
-                alt.datum.écart_GWh > 0,
-                alt.value("#2E86DE"),
-                alt.value("#E74C3C")
-            ),
-            tooltip=["année", "écart_GWh"]
-        )
-
-        line_chart = alt.Chart(df_mean).mark_line(strokeDash=[5, 5], color='black').encode(
-            x='année:N',
-            y='écart_GWh:Q',
-            tooltip=["année", alt.Tooltip("écart_GWh", title="Moyenne nationale")]
-        )
-
-        final_chart = (bar_chart + line_chart).properties(
-            width=700,
-            height=400,
-            title=f"Écart Production - Consommation – {selected_region_for_gap} (avec moyenne nationale)"
-        )
-
-        st.altair_chart(final_chart, use_container_width=True)
-
-        st.markdown("""
-        - Un **écart positif** signifie que la région **produit plus qu'elle ne consomme**, ce qui en fait un **territoire exportateur net**.
-        - Un **écart négatif** indique une **dépendance à l'importation d'énergie**, souvent liée à une faible capacité de production locale.
-        - La **ligne pointillée** représente la **moyenne nationale** de l’écart, ce qui permet de situer chaque région par rapport à l’ensemble du pays.
-        """)
-    else:
-        st.warning("Les données production ou consommation ne sont pas disponibles.")
-
-    st.subheader("Visualisation cartographique")
-
-    geojson_url = "https://france-geojson.gregoiredavid.fr/repo/regions.geojson"
-    geojson_data = requests.get(geojson_url).json()
-
-    # Préparation des données
-    df_conso_mean = df_annual.groupby("region")["conso_elec_GWh"].mean().reset_index()
-    df_prod["year"] = df_prod["mois"].dt.year
-    df_prod_annual = df_prod.groupby(["region", "year"])["production_GWh"].sum().reset_index()
-    df_prod_mean = df_prod_annual.groupby("region")["production_GWh"].mean().reset_index()
-
-    # Merge pour liaison nom -> valeur
-    conso_dict = dict(zip(df_conso_mean["region"], df_conso_mean["conso_elec_GWh"]))
-    prod_dict = dict(zip(df_prod_mean["region"], df_prod_mean["production_GWh"]))
-
-
-    # Création des cartes Folium
-    def create_choropleth(data_dict, legend_name, color_scale):
-        fmap = folium.Map(location=[46.5, 2.5], zoom_start=5, tiles="cartodb positron")
-        folium.Choropleth(
-            geo_data=geojson_data,
-            name="choropleth",
-            data=data_dict,
-            columns=["region", "value"],
-            key_on="feature.properties.nom",
-            fill_color=color_scale,
-            fill_opacity=0.7,
-            line_opacity=0.2,
-            legend_name=legend_name,
-            highlight=True
-        ).add_to(fmap)
-
-        folium.GeoJson(
-            geojson_data,
-            name="labels",
-            style_function=lambda x: {"color": "transparent", "fillOpacity": 0},
-            tooltip=folium.GeoJsonTooltip(fields=["nom"], aliases=["Région :"])
-        ).add_to(fmap)
-
-        return fmap
-
-    col1, col2 = st.columns(2)
-
-    with col1:
-        st.markdown("### Consommation moyenne (GWh)")
-        conso_data = pd.DataFrame({"region": list(conso_dict.keys()), "value": list(conso_dict.values())})
-        map_conso = create_choropleth(conso_dict, "Consommation (GWh)", "Reds")
-        st_folium(map_conso, width=500, height=550)
-
-    with col2:
-        st.markdown("### Production moyenne (GWh)")
-        prod_data = pd.DataFrame({"region": list(prod_dict.keys()), "value": list(prod_dict.values())})
-        map_prod = create_choropleth(prod_dict, "Production (GWh)", "Reds")
-        st_folium(map_prod, width=500, height=550)
-
-with tab4:
-    st.header("Carte des bornes de recharge pour véhicules électriques")
-    st.write("Visualisez les bornes IRVE installées en France métropolitaine.")
-
-    ev_data = clean_data.get("ev_charging")
-
-    if ev_data is not None and not ev_data.empty:
-        # Choix de la région pour filtrer la carte uniquement
-        available_regions = sorted(ev_data["region"].dropna().unique())
-        selected_region_map = st.selectbox("Sélectionnez une région à afficher sur la carte", available_regions)
-
-        region_ev_data = ev_data[ev_data["region"] == selected_region_map].dropna(subset=["lat", "lon"])
-
-        if not region_ev_data.empty:
-            lat_center = region_ev_data["lat"].mean()
-            lon_center = region_ev_data["lon"].mean()
-
-            m = folium.Map(location=[lat_center, lon_center], zoom_start=8, control_scale=True)
-            marker_cluster = MarkerCluster().add_to(m)
-
-            for _, row in region_ev_data.iterrows():
-                folium.Marker(
-                    location=[row["lat"], row["lon"]],
-                    popup=folium.Popup(
-                        f"<b>Aménageur :</b> {row['amenageur']}<br><b>Région :</b> {row['region']}",
-                        max_width=250
-                    ),
-                    icon=folium.Icon(color="blue", icon="bolt", prefix="fa")
-                ).add_to(marker_cluster)
-
-            # Correction du bug d'espace blanc
-            with st.container():
-                with st.spinner("Chargement de la carte..."):
-                    st_folium(m, height=500)
-
-            st.write("Quelques indicateurs clés sur les infrastructures de recharge.")
-            st.metric("Nombre de bornes dans la région", len(region_ev_data))
-            st.metric("Puissance moyenne (kW)", f"{region_ev_data['puissance_kW'].mean():.1f}")
-
+            st.warning("Les données production ou consommation ne sont pas disponibles.")
+
+        st.subheader("Visualisation cartographique")
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("### Consommation moyenne (GWh)")
+            components.html(choropleth_html("choropleth_conso", comparison_versions()), width=500, height=550)
+
+        with col2:
+            st.markdown("### Production moyenne (GWh)")
+            components.html(choropleth_html("choropleth_prod", comparison_versions()), width=500, height=550)
+
+@st.fragment
+def irve_tab():
+    from streamlit_folium import st_folium
+    from scripts import ev_map
+
+    with metrics.stage("render", tab="irve"):
+        st.header("Carte des bornes de recharge pour véhicules électriques")
+        st.write("Visualisez les bornes IRVE installées en France métropolitaine.")
+
+        available_regions = dataset_regions("ev_charging")
+
+        if available_regions:
+            # Choix de la région pour filtrer la carte uniquement
+            selected_region_map = st.selectbox("Sélectionnez une région à afficher sur la carte", available_regions)
+
+            region_ev_data, ev_index = ev_spatial_index(selected_region_map, data_version("ev_charging"))
+
+            if not region_ev_data.empty:
+                render_mode = st.radio("Rendu de la carte", ev_map.RENDER_MODES, horizontal=True, key="ev_render_mode")
+
+                # Vue courante (emprise, zoom) renvoyée par la carte au rerun précédent, pour la même région
+                view_region, map_state = st.session_state.get("ev_map_view", (None, None))
+                bounds, zoom = ev_map.viewport(map_state) if view_region == selected_region_map else (None, None)
+                if bounds:
+                    (south, west), (north, east) = bounds
+                    center = [(south + north) / 2, (west + east) / 2]
+                else:
+                    center = [region_ev_data["lat"].mean(), region_ev_data["lon"].mean()]
+
+                prerendered = artifacts.read_map(f"ev_{artifacts.slug(selected_region_map)}") if render_mode == "fast" else None
+
+                m = None if prerendered else ev_map.build_map(
+                    region_ev_data, mode=render_mode, center=center, zoom=zoom or 8, bounds=bounds,
+                    levels=ev_cluster_levels(selected_region_map, data_version("ev_charging")) if render_mode == "grid" else None,
+                    index=ev_index if render_mode == "grid" else None,
+                )
+
+                # Correction du bug d'espace blanc
+                with st.container():
+                    with st.spinner("Chargement de la carte..."):
+                        if prerendered:
+                            components.html(prerendered, height=500)
+                            map_state = None
+                        else:
+                            map_state = st_folium(
+                                m, height=500, key=f"ev_map_{selected_region_map}",
+                                returned_objects=["bounds", "zoom"] if render_mode == "grid" else [],
+                            )
+                st.session_state["ev_map_view"] = (selected_region_map, map_state)
+
+                st.write("Quelques indicateurs clés sur les infrastructures de recharge.")
+                st.metric("Nombre de bornes dans la région", len(region_ev_data))
+                st.metric("Puissance moyenne (kW)", f"{region_ev_data['puissance_kW'].mean():.1f}")
+
+                with st.expander("Bornes les plus proches d'un point"):
+                    col_lat, col_lon, col_km = st.columns(3)
+                    point_lat = col_lat.number_input("Latitude", value=float(region_ev_data["lat"].mean()), format="%.5f")
+                    point_lon = col_lon.number_input("Longitude", value=float(region_ev_data["lon"].mean()), format="%.5f")
+                    radius_km = col_km.slider("Rayon (km)", 1, 50, 10)
+
+                    nearest, distances = ev_index.nearest(point_lat, point_lon, k=10)
+                    nearest_data = region_ev_data.iloc[nearest][["amenageur", "commune", "puissance_kW"]]
+                    st.dataframe(nearest_data.assign(distance_km=distances.round(2)), hide_index=True)
+                    st.metric(f"Bornes à moins de {radius_km} km",
+                              ev_index.count(point_lat, point_lon, radius_km),
+                              help=f"{ev_index.density(point_lat, point_lon, radius_km):.2f} borne(s) par km²")
+
+            else:
+                st.warning("Aucune donnée valide pour cette région.")
         else:
-            st.warning("Aucune donnée valide pour cette région.")
-    else:
-        st.warning("Aucune donnée disponible pour les bornes IRVE.")
-
-    st.header("Bornes IRVE & Corrélation énergétique")
-
-    df_annual = clean_data.get("annual_consumption")
-    ev_data = clean_data.get("ev_charging")
-
-    if df_annual is not None and not df_annual.empty and ev_data is not None and not ev_data.empty:
-
-        if "date_maj" in ev_data.columns:
-            ev_data["annee_installation"] = pd.to_datetime(ev_data["date_maj"], errors="coerce").dt.year
+            st.warning("Aucune donnée disponible pour les bornes IRVE.")
+
+        st.header("Bornes IRVE & Corrélation énergétique")
+
+        # Table des bornes vide : jeu non chargé, ou chargé sans date_maj exploitable
+        if cube["bornes"].empty:
+            if available_regions:
+                st.error("La colonne `date_maj` est absente ou vide dans vos données de bornes IRVE.")
+            else:
+                st.warning("Les données des bornes IRVE ne sont pas disponibles.")
+        elif cube["consumption"].empty:
+            st.warning("Les données de consommation ne sont pas disponibles.")
+        else:
+            st.subheader("Évolution du nombre de bornes IRVE installées")
+            st.plotly_chart(bornes_figure(data_version("ev_charging")), use_container_width=True)
+
+            st.markdown("""
+            Cette visualisation permet de voir **la dynamique d’installation des bornes de recharge** selon les régions.
+
+            Une corrélation avec l’augmentation de la consommation électrique pourrait indiquer l’impact du développement de la mobilité électrique sur la demande énergétique.
+            """)
+
+@st.fragment
+def facilities_tab():
+    with metrics.stage("render", tab="facilities"):
+        st.header("Parc de production installé et facteurs de charge")
+
+        registry = facility_registry(data_version("facilities"))
+        if registry is not None:
+            options = ["France entière", *registry.regions]
+            choice = st.selectbox("Choisissez une région", options, key="region_facilities")
+            region = None if choice == options[0] else choice
+
+            by_filiere = registry.by_filiere(region)
+            col1, col2 = st.columns(2)
+            col1.metric("Puissance installée (MW)", f"{by_filiere['puissance_MW'].sum():,.0f}")
+            col2.metric("Installations", f"{by_filiere['nb_installations'].sum():,}")
+
+            st.subheader("Puissance en service par filière (MW)")
+            st.area_chart(registry.capacity_by_year(region))
+
+            st.subheader("Mises en service par année (MW)")
+            st.bar_chart(registry.additions_by_year(region))
+
+            st.subheader("Facteur de charge par filière (%)")
+            pivot_factors, factors = load_factor_view(region, (data_version("facilities"), data_version("monthly_production")))
+            if not factors.empty:
+                st.line_chart(pivot_factors)
+                st.caption("Production mensuelle rapportée à la puissance en service en fin d'année. Le registre ne "
+                           "recense que les installations actuelles : les années anciennes sont surestimées.")
+                st.dataframe(factors[factors["year"] == factors["year"].max()], hide_index=True)
+            else:
+                st.warning("Pas de production mensuelle pour cette sélection.")
+
+            if region is not None:
+                with st.expander("Installations les plus puissantes"):
+                    st.dataframe(registry.installations(region, top=20), hide_index=True)
         else:
-            st.error("La colonne `date_maj` est absente de vos données de bornes IRVE.")
-            st.stop()
-
-        df_bornes = ev_data.groupby(["region", "annee_installation"]).size().reset_index(name="n_bornes")
-        df_bornes = df_bornes.dropna(subset=["annee_installation"])
-        df_bornes = df_bornes[df_bornes["annee_installation"] >= 2010]
-
-        st.subheader("Évolution du nombre de bornes IRVE installées")
-        fig = px.bar(
-            df_bornes,
-            x="annee_installation",
-            y="n_bornes",
-            color="region",
-            barmode="group",
-            title="Nombre de bornes installées par an et par région",
-            labels={"annee_installation": "Année", "n_bornes": "Nombre de bornes"}
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-        st.markdown("""
-        Cette visualisation permet de voir **la dynamique d’installation des bornes de recharge** selon les régions.
-
-        Une corrélation avec l’augmentation de la consommation électrique pourrait indiquer l’impact du développement de la mobilité électrique sur la demande énergétique.
-        """)
-    else:
-        st.warning("Les données de consommation ou de bornes IRVE ne sont pas disponibles.")
+            st.warning("Le registre des installations n'est pas disponible.")
+
+TAB_RENDERERS = {
+    "production": production_tab,
+    "consumption": consumption_tab,
+    "comparison": comparison_tab,
+    "irve": irve_tab,
+    "facilities": facilities_tab,
+}
+
+for name, tab in TABS.items():
+    if not tab.open:
+        continue
+    with tab:
+        if name == "consumption" and live.ENABLED:
+            st.header("Consommation électrique en temps réel (MW)")
+            live_consumption()
+        TAB_RENDERERS[name]()
+    if FIRST_RUN:
+        metrics.mark("first_tab", time.perf_counter() - RUN_START, cold=COLD_START, tab=name)
+
+# Panneau de diagnostic (ODRE_DEBUG_PANEL=1) : dernières étapes mesurées par scripts/metrics.py
+if os.environ.get("ODRE_DEBUG_PANEL") == "1":
+    with st.sidebar.expander("Instrumentation", expanded=False):
+        st.dataframe(pd.DataFrame(metrics.recent(100)).iloc[::-1], use_container_width=True)
@@ -1,2 +1,47 @@
+import argparse
 
+from scripts import artifacts, async_load, load_data
 
+
+def build(args):
+    # Chargement -> nettoyage -> agrégats -> cartes, hors de toute session Streamlit
+    if args.sequential:
+        clean_data = load_data.load_all_clean(mode=args.mode, refresh=args.refresh)
+    else:
+        clean_data = async_load.load_all_parallel(mode=args.mode, refresh=args.refresh)
+    manifest = artifacts.build(clean_data, out_dir=args.out, maps=not args.no_maps)
+    for name, rows in manifest["rows"].items():
+        print(f"{name} : {rows} lignes")
+
+
+def info(args):
+    manifest = artifacts.read_manifest(args.out)
+    if manifest is None:
+        print(f"Aucun artefact dans {args.out or artifacts.ARTIFACT_DIR}")
+        return
+    for key, value in manifest.items():
+        print(f"{key} : {value}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Précalcul des sorties du tableau de bord (à planifier avec cron)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = sub.add_parser("build", help="charge, nettoie, agrège et écrit les artefacts")
+    build_parser.add_argument("--mode", default="records", choices=["records", "csv", "parquet"])
+    build_parser.add_argument("--refresh", action="store_true", help="ignore le cache disque")
+    build_parser.add_argument("--sequential", action="store_true", help="chargement séquentiel plutôt que parallèle")
+    build_parser.add_argument("--no-maps", action="store_true", help="n'écrit pas les cartes HTML")
+    build_parser.add_argument("--out", default=None, help=f"répertoire de sortie (défaut : {artifacts.ARTIFACT_DIR})")
+    build_parser.set_defaults(func=build)
+
+    info_parser = sub.add_parser("info", help="affiche le manifeste des derniers artefacts")
+    info_parser.add_argument("--out", default=None)
+    info_parser.set_defaults(func=info)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import pandas as pd
+
+from scripts import metrics
+
+# Cube d'agrégats calculé une fois après le nettoyage : les onglets lisent des tranches
+# de ces petites tables indexées au lieu de re-parcourir les séries longues à chaque rerun
+CONSUMPTION_COLUMNS = ["conso_elec_GWh", "conso_gaz_GWh", "conso_totale_GWh"]
+
+
+def production_cube(df_prod):
+    # region × year × month × filiere -> production_GWh
+    if df_prod is None or df_prod.empty:
+        return pd.DataFrame(columns=["production_GWh"])
+    mois = pd.to_datetime(df_prod["mois"], errors="coerce")
+    keys = [df_prod["region"], mois.dt.year.rename("year"), mois.dt.month.rename("month"), df_prod["filiere"]]
+    # Sommes en float64 : le cube est petit, la précision des totaux prime sur la mémoire
+    production = df_prod["production_GWh"].astype("float64")
+    return production.groupby(keys, observed=True).sum().to_frame().sort_index()
+
+
+def consumption_cube(df_annual):
+    # region × year -> consommations électricité / gaz / totale
+    if df_annual is None or df_annual.empty:
+        return pd.DataFrame(columns=CONSUMPTION_COLUMNS)
+    year = pd.to_datetime(df_annual["année"], errors="coerce").dt.year.rename("year")
+    columns = [col for col in CONSUMPTION_COLUMNS if col in df_annual.columns]
+    consumption = df_annual[columns].astype("float64")
+    return consumption.groupby([df_annual["region"], year], observed=True).sum(min_count=1).sort_index()
+
+
+def bornes_cube(ev_data):
+    # region × year (de date_maj) -> nombre de bornes
+    if ev_data is None or ev_data.empty or "date_maj" not in ev_data.columns:
+        return pd.DataFrame(columns=["n_bornes"])
+    year = pd.to_datetime(ev_data["date_maj"], errors="coerce").dt.year.rename("year")
+    return ev_data.groupby([ev_data["region"], year], observed=True).size().to_frame("n_bornes").sort_index()
+
+
+# Table du cube -> (jeu nettoyé dont elle est tirée, construction)
+CUBE_SOURCES = {
+    "production": ("monthly_production", production_cube),
+    "consumption": ("annual_consumption", consumption_cube),
+    "bornes": ("ev_charging", bornes_cube),
+}
+
+
+@metrics.instrument("aggregate")
+def build_cube(clean_data):
+    return {table: builder(clean_data.get(source)) for table, (source, builder) in CUBE_SOURCES.items()}
+
+
+class LazyCube(dict):
+    # Cube dont chaque table n'est demandée à `loader(table)` qu'au premier accès : un onglet
+    # n'attend que le jeu dont ses tables sont tirées
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+    def __missing__(self, table):
+        self[table] = self.loader(table)
+        return self[table]
+
+
+def regions(cube, table):
+    frame = cube[table]
+    return sorted(frame.index.get_level_values("region").unique()) if not frame.empty else []
+
+
+def production_years(cube, region):
+    production = cube["production"].xs(region, level="region")
+    return sorted(production.index.get_level_values("year").unique(), reverse=True)
+
+
+def monthly_mix(cube, region, year):
+    # Part (%) de chaque filière dans la production de chaque mois, et totaux annuels par filière
+    production = cube["production"].xs((region, year), level=("region", "year"))["production_GWh"]
+    monthly = production.unstack("filiere").fillna(0)
+    monthly.index = [f"{year}-{month:02d}" for month in monthly.index]
+    monthly.index.name = "month"
+    pct = monthly.div(monthly.sum(axis=1), axis=0).mul(100).round(2).fillna(0)
+
+    filiere_total = production.groupby(level="filiere", observed=True).sum().reset_index()
+    filiere_total["%"] = (filiere_total["production_GWh"] / filiere_total["production_GWh"].sum() * 100).round(2)
+    return pct, filiere_total
+
+
+def annual_production(cube, selected_regions=None):
+    # year × region -> production totale (GWh)
+    production = cube["production"]["production_GWh"].groupby(level=["year", "region"], observed=True).sum()
+    if selected_regions is not None:
+        production = production[production.index.get_level_values("region").isin(selected_regions)]
+    return production.rename("prod_GWh").reset_index()
+
+
+def annual_consumption(cube, selected_regions=None):
+    consumption = cube["consumption"].reset_index()
+    if selected_regions is not None:
+        consumption = consumption[consumption["region"].isin(selected_regions)].copy()
+    return consumption
+
+
+def production_gap(cube, selected_regions=None):
+    # Écart production - consommation électrique par région et par année
+    gap = pd.merge(
+        annual_consumption(cube, selected_regions)[["year", "region", "conso_elec_GWh"]],
+        annual_production(cube, selected_regions),
+        on=["year", "region"],
+        how="inner",
+    )
+    gap["écart_GWh"] = gap["prod_GWh"] - gap["conso_elec_GWh"]
+    return gap
+
+
+def regional_means(cube):
+    # Moyennes annuelles par région : consommation électrique et production
+    conso = cube["consumption"]["conso_elec_GWh"].groupby(level="region", observed=True).mean()
+    prod = annual_production(cube).groupby("region", observed=True)["prod_GWh"].mean()
+    return conso.to_dict(), prod.to_dict()
+
+
+def bornes_per_year(cube, since=2010):
+    bornes = cube["bornes"].reset_index()
+    return bornes[bornes["year"] >= since]
@@ -0,0 +1,127 @@
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+
+from scripts import aggregates, metrics
+
+# Sorties précalculées hors session (cron) et servies telles quelles par l'application :
+#   clean/<jeu>.parquet, cube/<table>.parquet, choropleth.json, maps/*.html, manifest.json
+ARTIFACT_DIR = Path(os.environ.get("ODRE_ARTIFACT_DIR", "data/artifacts"))
+CHOROPLETHS = {
+    "choropleth_conso": ("conso", "Consommation (GWh)", "Reds"),
+    "choropleth_prod": ("prod", "Production (GWh)", "Reds"),
+}
+
+
+def slug(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def write_frame(path, df):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(path)
+
+
+def write_html(path, fmap):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(fmap.get_root().render(), encoding="utf-8")
+
+
+@metrics.instrument("artifacts")
+def build(clean_data, out_dir=None, maps=True):
+    # Tout est écrit dans un répertoire temporaire, puis substitué : l'application ne lit jamais
+    # un jeu d'artefacts incomplet
+    out_dir = Path(out_dir or ARTIFACT_DIR)
+    tmp = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    start = time.perf_counter()
+
+    for name, df in clean_data.items():
+        if df is not None:
+            write_frame(tmp / "clean" / f"{name}.parquet", df)
+
+    cube = aggregates.build_cube(clean_data)
+    for table, df in cube.items():
+        write_frame(tmp / "cube" / f"{table}.parquet", df)
+
+    conso, prod = aggregates.regional_means(cube)
+    choropleth_data = {"conso": conso, "prod": prod}
+    (tmp / "choropleth.json").write_text(json.dumps(choropleth_data, ensure_ascii=False), encoding="utf-8")
+
+    rendered = []
+    if maps:
+        # folium et requests ne sont chargés que pour la construction : l'application lit les
+        # artefacts sans les importer
+        import requests
+        from scripts import ev_map, geo
+
+        try:
+            geojson_data = geo.regions_geojson(zoom=5)
+        except (requests.RequestException, OSError) as e:
+            print(f"Artefacts : contours des régions indisponibles ({e}), cartes choroplèthes ignorées")
+            geojson_data = None
+        if geojson_data is not None:
+            for name, (key, legend, colors) in CHOROPLETHS.items():
+                write_html(tmp / "maps" / f"{name}.html",
+                           geo.create_choropleth(choropleth_data[key], legend, colors, geojson_data=geojson_data))
+                rendered.append(name)
+
+        ev_data = clean_data.get("ev_charging")
+        if ev_data is not None and not ev_data.empty:
+            for region, region_data in ev_data.dropna(subset=["lat", "lon"]).groupby("region", observed=True):
+                name = f"ev_{slug(region)}"
+                write_html(tmp / "maps" / f"{name}.html", ev_map.build_map(region_data, mode="fast"))
+                rendered.append(name)
+
+    manifest = {
+        "generated_at": time.time(),
+        "seconds": round(time.perf_counter() - start, 3),
+        "rows": {name: len(df) for name, df in clean_data.items() if df is not None},
+        "cube": {table: len(df) for table, df in cube.items()},
+        "maps": rendered,
+    }
+    (tmp / "manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+    old = out_dir.with_name(out_dir.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if out_dir.exists():
+        out_dir.replace(old)
+    tmp.replace(out_dir)
+    shutil.rmtree(old, ignore_errors=True)
+    print(f"Artefacts écrits dans {out_dir} ({manifest['seconds']}s, {len(rendered)} cartes)")
+    return manifest
+
+
+def read_manifest(out_dir=None):
+    path = Path(out_dir or ARTIFACT_DIR) / "manifest.json"
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def available(out_dir=None):
+    return read_manifest(out_dir) is not None
+
+
+def load_clean(out_dir=None, names=None):
+    clean_dir = Path(out_dir or ARTIFACT_DIR) / "clean"
+    paths = sorted(clean_dir.glob("*.parquet"))
+    return {path.stem: pd.read_parquet(path) for path in paths if names is None or path.stem in names}
+
+
+def load_cube(out_dir=None):
+    cube_dir = Path(out_dir or ARTIFACT_DIR) / "cube"
+    return {path.stem: pd.read_parquet(path) for path in sorted(cube_dir.glob("*.parquet"))}
+
+
+def read_map(name, out_dir=None):
+    path = Path(out_dir or ARTIFACT_DIR) / "maps" / f"{name}.html"
+    return path.read_text(encoding="utf-8") if path.exists() else None
@@ -0,0 +1,289 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+from scripts import cache, load_data, metrics
+
+# Limites globales du chargement parallèle des 4 jeux de données
+GLOBAL_CONCURRENCY = int(os.environ.get("ODRE_GLOBAL_CONCURRENCY", 16))   # requêtes en vol, tous jeux confondus
+HOST_RATE_LIMIT = float(os.environ.get("ODRE_HOST_RATE_LIMIT", 0))        # requêtes / seconde / hôte (0 = illimité)
+HOST_BURST = int(os.environ.get("ODRE_HOST_BURST", 10))
+
+# Numéros de version des jeux chargés par DatasetLoader, uniques dans le processus
+_versions = itertools.count(1)
+
+
+class RateLimiter:
+    # Seau à jetons : HOST_RATE_LIMIT requêtes par seconde, rafales de HOST_BURST
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class Fetcher:
+    # Exécute les appels bloquants (session requests partagée) sous limite globale et par hôte
+    def __init__(self, concurrency=GLOBAL_CONCURRENCY, rate=HOST_RATE_LIMIT, burst=HOST_BURST):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.rate = rate
+        self.burst = burst
+        self.limiters = {}
+        self.requests = Counter()
+
+    async def call(self, url, func, *args, tag=None):
+        host = urlparse(url).netloc
+        limiter = self.limiters.setdefault(host, RateLimiter(self.rate, self.burst))
+        async with self.semaphore:
+            await limiter.acquire()
+            self.requests[tag] += 1
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def run(self, func, *args):
+        # Travail local (cache disque, nettoyage) : hors limites réseau, mais hors de la boucle
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+async def fetch_records_async(fetcher, endpoint, params=None, limit=100, max_records=10000):
+    # Même découpage que load_data.fetch_api_data, mais toutes les pages partent dans la même boucle
+    url = f"{load_data.BASE_URL}/{endpoint}/records"
+    params = params or {}
+
+    first_page = await fetcher.call(url, load_data.fetch_page, url, params, 0, min(limit, max_records), tag=endpoint)
+    records = list(first_page.get("results", []))
+    total = min(first_page.get("total_count", len(records)), max_records)
+    offsets = range(limit, total, limit)
+
+    pages = await asyncio.gather(*(
+        fetcher.call(url, load_data.fetch_page, url, params, offset, min(limit, max_records - offset), tag=endpoint)
+        for offset in offsets
+    ))
+    for page in pages:
+        records.extend(page.get("results", []))
+    return pd.DataFrame.from_records(records)
+
+
+async def fetch_source_async(fetcher, endpoint, mode="records", params=None):
+    # load_data.fetch_source sous les limites du fetcher : une requête par page, ou l'export entier
+    if mode == "records":
+        return await fetch_records_async(fetcher, endpoint, params)
+    url = f"{load_data.BASE_URL}/{endpoint}/exports/{mode}"
+    return await fetcher.call(url, load_data.fetch_export_data, endpoint, mode, params, tag=endpoint)
+
+
+async def fetch_query_async(fetcher, endpoint, query=None, mode="records"):
+    # load_data.fetch_query : requête poussée côté serveur ; si l'API la refuse (400), jeu complet
+    # puis filtrage local, toujours sous les mêmes limites
+    try:
+        return await fetch_source_async(fetcher, endpoint, mode, query.to_params() if query else None)
+    except requests.HTTPError as e:
+        if query is None or e.response is None or e.response.status_code != 400:
+            raise
+        print(f"Requête {endpoint} non supportée côté serveur ({e}), filtrage local")
+        return await fetcher.run(query.apply, await fetch_source_async(fetcher, endpoint, mode))
+
+
+async def fetch_modified_async(fetcher, endpoint, default=None):
+    url = f"{load_data.BASE_URL}/{endpoint}"
+    try:
+        return await fetcher.call(url, load_data.fetch_dataset_modified, endpoint, tag=endpoint)
+    except requests.RequestException:
+        return default
+
+
+async def sync_async(fetcher, name, mode, plan):
+    # load_data.sync_incremental, pages récentes comprises dans la concurrence et le débit communs
+    endpoint = load_data.DATASETS[name]
+    new_raw = await fetch_query_async(fetcher, endpoint, plan["query"], mode)
+    modified = await fetch_modified_async(fetcher, endpoint, plan["raw_meta"].get("modified"))
+    return await fetcher.run(load_data.sync_merge, name, mode, plan, new_raw, modified)
+
+
+async def load_dataset_async(fetcher, name, mode="records", refresh=False):
+    mode = load_data.dataset_mode(name, mode)
+    endpoint = load_data.DATASETS[name]
+    start = time.perf_counter()
+
+    with metrics.stage("load", http=endpoint, dataset=name, mode=mode, engine="async") as record:
+        # Les lectures de cache et le nettoyage passent par l'exécuteur (la boucle reste libre),
+        # toutes les requêtes par fetcher.call (concurrence globale et débit par hôte)
+        df = None
+        if not refresh and await fetcher.run(load_data.needs_sync, name, mode):
+            plan = await fetcher.run(load_data.sync_plan, name, mode)
+            if plan is None:
+                refresh = True          # copie locale inexploitable : chargement complet
+            else:
+                df, source = await sync_async(fetcher, name, mode, plan), "sync"
+        if df is None:
+            df = None if refresh else await fetcher.run(load_data.read_clean_cache, name, mode)
+            source = "cache"
+        if df is None:
+            # Nettoyé absent mais brut encore frais (comme cache.get_or_fetch côté synchrone) :
+            # seul le nettoyage est refait
+            raw_params = load_data.dataset_params(name, mode)
+            previous = await fetcher.run(cache.read_meta, endpoint, raw_params, "raw")
+            raw = None if refresh else await fetcher.run(load_data.read_raw_cache, name, mode)
+            source = "raw_cache"
+            if raw is None:
+                raw = await fetch_query_async(fetcher, endpoint, load_data.DEFAULT_QUERIES.get(name), mode)
+                modified = await fetch_modified_async(fetcher, endpoint)
+                await fetcher.run(partial(cache.save, endpoint, raw_params, "raw", raw, modified=modified))
+                source = "api"
+            df = await fetcher.run(load_data.save_clean, name, raw, mode, previous)
+        record["source"] = source
+        record.rows(rows_out=len(df))
+
+    timing = {
+        "source": source,
+        "rows": len(df),
+        "requests": fetcher.requests[endpoint],
+        "bytes": record.get("http_bytes"),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+    return df, timing
+
+
+async def load_all_async(mode="records", refresh=False, concurrency=GLOBAL_CONCURRENCY, rate=HOST_RATE_LIMIT, names=None):
+    # Renvoie (données nettoyées, temps par jeu de données) ; names : sous-ensemble des jeux
+    names = list(names or load_data.DATASETS)
+    fetcher = Fetcher(concurrency=concurrency, rate=rate)
+    start = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(
+            load_dataset_async(fetcher, name, mode, refresh) for name in names
+        ))
+    finally:
+        fetcher.close()
+
+    data = {name: df for name, (df, _) in zip(names, results)}
+    timings = {name: timing for name, (_, timing) in zip(names, results)}
+    timings["total"] = {"seconds": round(time.perf_counter() - start, 3), "requests": sum(fetcher.requests.values())}
+    return data, timings
+
+
+def print_timings(timings):
+    for name, timing in timings.items():
+        details = " | ".join(f"{key}={value}" for key, value in timing.items())
+        print(f"{name:<20} {details}")
+
+
+def run_sync(coro):
+    # Streamlit exécute le script dans un thread sans boucle ; ailleurs (notebook), thread dédié
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def load_all_parallel(mode="records", refresh=False, concurrency=GLOBAL_CONCURRENCY, rate=HOST_RATE_LIMIT, names=None):
+    data, timings = run_sync(load_all_async(mode, refresh, concurrency, rate, names))
+    print_timings(timings)
+    return data
+
+
+class DatasetLoader:
+    # Jeux nettoyés chargés à la demande par `load(names)` (liste de jeux -> dict) : l'application
+    # demande d'abord ceux de l'onglet ouvert, puis tous les autres en un seul lot, chargé par un
+    # thread en un appel (load_all_parallel garde ainsi toute la concurrence et le débit par hôte
+    # prévus sur l'ensemble du lot). Un jeu demandé avant que son lot ait commencé est chargé tout
+    # de suite par l'appelant. Chaque chargement reçoit un numéro de version, clé des caches
+    # dérivés du jeu (positions, agrégats, index).
+    def __init__(self, load):
+        self.load = load
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="odre-prefetch")
+        self.futures = {}
+        self.versions = {}
+        self.lock = threading.Lock()
+
+    def track(self, name, future):
+        self.futures[name] = future
+        self.versions[name] = next(_versions)
+
+    def prefetch(self, names):
+        with self.lock:
+            batch = {}
+            for name in names:
+                if name not in self.futures or self.failed(self.futures[name]):
+                    batch[name] = Future()
+                    self.track(name, batch[name])
+            if batch:
+                self.executor.submit(self.run_batch, batch)
+
+    def run_batch(self, batch):
+        # Les jeux déjà repris par get() (futurs annulés) sont retirés du lot
+        batch = {name: future for name, future in batch.items() if future.set_running_or_notify_cancel()}
+        if not batch:
+            return
+        try:
+            data = self.load(list(batch))
+        except BaseException as e:
+            for future in batch.values():
+                future.set_exception(e)
+            return
+        for name, future in batch.items():
+            future.set_result(data.get(name))
+
+    @staticmethod
+    def failed(future):
+        return future.done() and not future.cancelled() and future.exception() is not None
+
+    def ready(self, name):
+        future = self.futures.get(name)
+        return future is not None and future.done() and not self.failed(future)
+
+    def version(self, name):
+        # Version du jeu chargé ou en cours de chargement (None s'il n'a jamais été demandé)
+        with self.lock:
+            return self.versions.get(name)
+
+    def get(self, name):
+        with self.lock:
+            future = self.futures.get(name)
+            inline = future is None or future.cancel() or self.failed(future)
+            if inline:
+                future = Future()
+                future.set_running_or_notify_cancel()
+                self.track(name, future)
+        if inline:
+            try:
+                future.set_result(self.load([name]).get(name))
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    def close(self):
+        # Appelé quand le cache de l'application libère le chargeur : les lots en attente sont
+        # abandonnés et le thread est arrêté
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            for future in self.futures.values():
+                future.cancel()
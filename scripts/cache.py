@@ -0,0 +1,224 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+# Cache disque persistant des jeux de données (brut et nettoyé), partagé entre processus
+CACHE_DIR = Path(os.environ.get("ODRE_CACHE_DIR", "data/cache"))
+DEFAULT_TTL = int(os.environ.get("ODRE_CACHE_TTL", 24 * 3600))               # secondes
+MAX_CACHE_BYTES = int(os.environ.get("ODRE_CACHE_MAX_BYTES", 2 * 1024 ** 3))  # 2 Go
+
+
+def cache_key(dataset, params=None):
+    payload = json.dumps({"dataset": dataset, "params": params or {}}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def entry_paths(dataset, params, kind):
+    base = Path(CACHE_DIR) / dataset / f"{cache_key(dataset, params)}.{kind}"
+    return base.with_name(base.name + ".parquet"), base.with_name(base.name + ".json")
+
+
+def write_json(path, payload):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(payload, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_meta(dataset, params, kind):
+    data_path, meta_path = entry_paths(dataset, params, kind)
+    if not meta_path.exists() or not (data_path.exists() or data_path.with_suffix(".pkl").exists()):
+        return None
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def load(dataset, params, kind):
+    meta = read_meta(dataset, params, kind)
+    if meta is None:
+        return None
+
+    data_path, meta_path = entry_paths(dataset, params, kind)
+    if meta.get("format") == "pickle":
+        df = pd.read_pickle(data_path.with_suffix(".pkl"))
+    else:
+        df = pd.read_parquet(data_path)
+
+    meta["last_access"] = time.time()
+    write_json(meta_path, meta)
+    return df
+
+
+def save(dataset, params, kind, df, modified=None, extra=None):
+    data_path, meta_path = entry_paths(dataset, params, kind)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    tmp = data_path.with_name(data_path.name + ".tmp")
+    try:
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, data_path)
+        data_path.with_suffix(".pkl").unlink(missing_ok=True)
+        fmt = "parquet"
+    except (TypeError, ValueError, ImportError) as e:
+        # Colonnes hétérogènes non représentables en Parquet : repli en pickle
+        print(f"Cache {dataset} ({kind}) : Parquet impossible ({e}), repli en pickle")
+        tmp.unlink(missing_ok=True)
+        df.to_pickle(data_path.with_suffix(".pkl"))
+        fmt = "pickle"
+
+    now = time.time()
+    meta = {
+        "dataset": dataset,
+        "params": params or {},
+        "kind": kind,
+        "format": fmt,
+        "rows": len(df),
+        "modified": modified,
+        "fetched_at": now,
+        "checked_at": now,
+        "last_access": now,
+        **(extra or {}),
+    }
+    write_json(meta_path, meta)
+    return meta
+
+
+def remove(dataset, params, kind):
+    data_path, meta_path = entry_paths(dataset, params, kind)
+    for path in (data_path, data_path.with_suffix(".pkl"), meta_path):
+        path.unlink(missing_ok=True)
+
+
+def fresh_meta(dataset, params, kind, ttl=None, modified_fn=None):
+    # Entrée valide si plus récente que le TTL, sinon revalidée contre le "modified" du jeu (type ETag)
+    meta = read_meta(dataset, params, kind)
+    if meta is None:
+        return None
+
+    ttl = DEFAULT_TTL if ttl is None else ttl
+    if time.time() - meta.get("checked_at", 0) < ttl:
+        return meta
+    if modified_fn is None:
+        return None
+
+    try:
+        modified = modified_fn()
+    except Exception as e:
+        # API injoignable : on sert la copie locale plutôt que rien
+        print(f"Cache {dataset} : vérification de fraîcheur impossible ({e}), copie locale conservée")
+        return meta
+
+    if modified is None or modified != meta.get("modified"):
+        return None
+
+    meta["checked_at"] = time.time()
+    write_json(entry_paths(dataset, params, kind)[1], meta)
+    return meta
+
+
+def get_or_fetch(dataset, params, kind, fetch, ttl=None, modified_fn=None, refresh=False):
+    if not refresh and fresh_meta(dataset, params, kind, ttl=ttl, modified_fn=modified_fn):
+        df = load(dataset, params, kind)
+        if df is not None:
+            print(f"Cache {dataset} ({kind}) : lecture locale")
+            return df
+
+    df = fetch()
+    modified = None
+    if modified_fn is not None:
+        try:
+            modified = modified_fn()
+        except Exception:
+            pass
+    save(dataset, params, kind, df, modified=modified)
+    evict()
+    return df
+
+
+def list_entries():
+    entries = []
+    for meta_path in Path(CACHE_DIR).glob("*/*.json"):
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        stem = meta_path.name[:-len(".json")]
+        files = [p for p in meta_path.parent.glob(stem + ".*")]
+        meta["size"] = sum(p.stat().st_size for p in files)
+        meta["files"] = files
+        entries.append(meta)
+    return entries
+
+
+def evict(max_bytes=None):
+    # Éviction LRU (dernier accès) jusqu'à repasser sous la taille maximale
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    entries = sorted(list_entries(), key=lambda m: m.get("last_access", 0))
+    total = sum(m["size"] for m in entries)
+    removed = 0
+    for meta in entries:
+        if total <= max_bytes:
+            break
+        for path in meta["files"]:
+            path.unlink(missing_ok=True)
+        total -= meta["size"]
+        removed += 1
+    if removed:
+        print(f"Cache : {removed} entrée(s) évincée(s), {total / 1024 ** 2:.1f} Mo conservés")
+    return removed
+
+
+def clear():
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gestion du cache local des jeux de données ODRE")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    warm = sub.add_parser("warm", help="télécharge et nettoie tous les jeux de données")
+    warm.add_argument("--mode", default="records", choices=["records", "csv", "parquet"])
+    warm.add_argument("--refresh", action="store_true", help="ignore les entrées existantes")
+
+    sync = sub.add_parser("sync", help="rafraîchissement incrémental des séries temporelles")
+    sync.add_argument("--mode", default="records", choices=["records", "csv", "parquet"])
+
+    sub.add_parser("info", help="liste les entrées du cache")
+    sub.add_parser("evict", help="applique la politique d'éviction")
+    sub.add_parser("clear", help="vide le cache")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "warm":
+        from scripts import load_data
+
+        data = load_data.load_all_clean(mode=args.mode, refresh=args.refresh)
+        for name, df in data.items():
+            print(f"{name} : {len(df)} lignes")
+    elif args.command == "sync":
+        from scripts import load_data
+
+        for name, df in load_data.sync_all_incremental(mode=args.mode).items():
+            print(f"{name} : {len(df)} lignes")
+    elif args.command == "info":
+        entries = list_entries()
+        for meta in sorted(entries, key=lambda m: (m["dataset"], m["kind"])):
+            age = (time.time() - meta.get("fetched_at", 0)) / 3600
+            print(f"{meta['dataset']} [{meta['kind']}] {meta['params']} | {meta['rows']} lignes | "
+                  f"{meta['size'] / 1024 ** 2:.1f} Mo | {age:.1f} h")
+        print(f"Total : {sum(m['size'] for m in entries) / 1024 ** 2:.1f} Mo dans {CACHE_DIR}")
+    elif args.command == "evict":
+        evict()
+    elif args.command == "clear":
+        clear()
+
+
+if __name__ == "__main__":
+    main()
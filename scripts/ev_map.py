@@ -0,0 +1,147 @@
+import folium
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster, MarkerCluster
+
+# Modes de rendu de la carte IRVE :
+#   "grid"    : agrégation côté serveur sur une grille dépendant du zoom, points détaillés au-delà de DETAIL_ZOOM
+#   "fast"    : tous les points en tableaux, regroupés dans le navigateur (FastMarkerCluster)
+#   "markers" : un folium.Marker par borne (rendu historique, à réserver aux petits volumes)
+RENDER_MODES = ("grid", "fast", "markers")
+CLUSTER_CELL_PX = 64     # taille d'une cellule de la grille, en pixels à l'écran
+DETAIL_ZOOM = 14         # à partir de ce zoom, les bornes sont affichées une par une
+MAX_DETAIL_POINTS = 5000
+
+# Marqueur créé dans le navigateur pour chaque ligne [lat, lon, aménageur, région, puissance]
+POINT_CALLBACK = """
+var callback = function (row) {
+    var popup = document.createElement("div");
+    [["Aménageur", row[2]], ["Région", row[3]], ["Puissance (kW)", row[4]]].forEach(function (item) {
+        var line = document.createElement("div");
+        var label = document.createElement("b");
+        label.textContent = item[0] + " : ";
+        line.appendChild(label);
+        line.appendChild(document.createTextNode(item[1] === null ? "" : item[1]));
+        popup.appendChild(line);
+    });
+    return L.marker(new L.LatLng(row[0], row[1])).bindPopup(popup, {maxWidth: 250});
+};
+"""
+
+
+def cell_size(zoom):
+    # Largeur en degrés d'une cellule de CLUSTER_CELL_PX pixels au zoom donné (tuiles de 256 px)
+    return CLUSTER_CELL_PX * 360.0 / (256 * 2 ** zoom)
+
+
+def in_viewport(df, bounds, margin=0.1, index=None):
+    # bounds : ((sud, ouest), (nord, est)) ; marge relative pour éviter les bords vides au déplacement.
+    # index : spatial.GridIndex construit sur df, qui évite le parcours complet des coordonnées
+    if not bounds:
+        return df
+    if index is not None:
+        return df.iloc[index.viewport(bounds, margin)]
+    (south, west), (north, east) = bounds
+    dlat, dlon = (north - south) * margin, (east - west) * margin
+    mask = df["lat"].between(south - dlat, north + dlat) & df["lon"].between(west - dlon, east + dlon)
+    return df[mask]
+
+
+def grid_clusters(df, zoom):
+    # Une ligne par cellule occupée : nombre de bornes, centroïde, puissance moyenne
+    if df.empty:
+        return pd.DataFrame(columns=["lat", "lon", "n_bornes", "puissance_kW"])
+    size = cell_size(zoom)
+    lat = df["lat"].to_numpy(dtype="float64")
+    lon = df["lon"].to_numpy(dtype="float64")
+    cells = pd.DataFrame({
+        "cell_x": np.floor(lon / size).astype("int64"),
+        "cell_y": np.floor(lat / size).astype("int64"),
+        "lat": lat,
+        "lon": lon,
+        "puissance_kW": df["puissance_kW"].to_numpy(dtype="float64"),
+    })
+    return cells.groupby(["cell_x", "cell_y"]).agg(
+        lat=("lat", "mean"),
+        lon=("lon", "mean"),
+        n_bornes=("lat", "size"),
+        puissance_kW=("puissance_kW", "mean"),
+    ).reset_index(drop=True)
+
+
+def cluster_levels(df, zooms=range(5, DETAIL_ZOOM)):
+    # Index spatial précalculé : grille de clusters pour chaque niveau de zoom
+    return {zoom: grid_clusters(df, zoom) for zoom in zooms}
+
+
+def point_rows(df):
+    # Tableaux [lat, lon, aménageur, région, puissance] sérialisés tels quels dans la page
+    columns = {
+        "lat": df["lat"].astype("float64").round(6),
+        "lon": df["lon"].astype("float64").round(6),
+        "amenageur": df["amenageur"].astype("object").where(df["amenageur"].notna(), None),
+        "region": df["region"].astype("object").where(df["region"].notna(), None),
+        "puissance_kW": df["puissance_kW"].astype("float64").round(1).astype("object").where(df["puissance_kW"].notna(), None),
+    }
+    return pd.DataFrame(columns).to_numpy().tolist()
+
+
+def add_clusters(fmap, clusters):
+    radius = 6 + 4 * np.log10(clusters["n_bornes"].to_numpy(dtype="float64"))
+    for (lat, lon, n, power), r in zip(clusters[["lat", "lon", "n_bornes", "puissance_kW"]].itertuples(index=False), radius):
+        folium.CircleMarker(
+            location=[lat, lon],
+            radius=float(r),
+            color="#1f6fb2",
+            fill=True,
+            fill_opacity=0.6,
+            weight=1,
+            tooltip=f"{n} borne(s) – {power:.1f} kW en moyenne" if pd.notna(power) else f"{n} borne(s)",
+        ).add_to(fmap)
+
+
+def add_markers(fmap, df):
+    marker_cluster = MarkerCluster().add_to(fmap)
+    for _, row in df.iterrows():
+        folium.Marker(
+            location=[row["lat"], row["lon"]],
+            popup=folium.Popup(
+                f"<b>Aménageur :</b> {row['amenageur']}<br><b>Région :</b> {row['region']}",
+                max_width=250
+            ),
+            icon=folium.Icon(color="blue", icon="bolt", prefix="fa")
+        ).add_to(marker_cluster)
+
+
+def build_map(df, mode="grid", center=None, zoom=8, bounds=None, levels=None, index=None):
+    if mode not in RENDER_MODES:
+        raise ValueError(f"Mode de rendu inconnu : {mode} (attendu : {RENDER_MODES})")
+
+    if center is None:
+        center = [df["lat"].mean(), df["lon"].mean()]
+    fmap = folium.Map(location=center, zoom_start=zoom, control_scale=True)
+
+    if mode == "markers":
+        add_markers(fmap, df)
+    elif mode == "fast":
+        FastMarkerCluster(point_rows(df), callback=POINT_CALLBACK).add_to(fmap)
+    else:
+        visible = in_viewport(df, bounds, index=index)
+        if zoom >= DETAIL_ZOOM and len(visible) <= MAX_DETAIL_POINTS:
+            FastMarkerCluster(point_rows(visible), callback=POINT_CALLBACK).add_to(fmap)
+        else:
+            level = min(int(zoom), DETAIL_ZOOM - 1)
+            clusters = levels[level] if levels is not None and level in levels else grid_clusters(df, level)
+            add_clusters(fmap, in_viewport(clusters, bounds))
+    return fmap
+
+
+def viewport(map_state):
+    # Bornes et zoom renvoyés par st_folium -> (((sud, ouest), (nord, est)), zoom)
+    if not map_state or not map_state.get("bounds"):
+        return None, None
+    bounds = map_state["bounds"]
+    south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+    if None in (south_west.get("lat"), south_west.get("lng"), north_east.get("lat"), north_east.get("lng")):
+        return None, map_state.get("zoom")
+    return ((south_west["lat"], south_west["lng"]), (north_east["lat"], north_east["lng"])), map_state.get("zoom")
@@ -0,0 +1,200 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from scripts import metrics
+
+# Registre national des installations sous forme compacte : une entrée par ligne du registre
+# (installation, ou groupe de petites installations du registre agrégé) codée en tableaux numpy
+# triés par région, filière et année de mise en service, plus les cumuls de puissance installée
+# région × filière × année calculés une fois. Les requêtes lisent des tranches de ces tableaux.
+FIRST_YEAR = 1900
+UNKNOWN_YEAR = -1          # date de mise en service absente : puissance comptée dès la première année
+
+# Filière du registre (sans accents, en minuscules) -> filière de la production mensuelle
+PRODUCTION_FILIERES = {
+    "nucleaire": "nucleaire",
+    "thermique non renouvelable": "thermique",
+    "hydraulique": "hydraulique",
+    "eolien": "eolienne",
+    "solaire": "solaire",
+    "bioenergies": "bioenergies",
+}
+
+
+def normalize_label(label):
+    text = unicodedata.normalize("NFKD", str(label)).encode("ascii", "ignore").decode("ascii")
+    return text.strip().lower()
+
+
+def codes(series):
+    # (codes int16 / int32, libellés) d'une colonne, -1 pour les valeurs manquantes
+    categorical = series.astype("category")
+    categories = categorical.cat.categories
+    dtype = "int16" if len(categories) < np.iinfo(np.int16).max else "int32"
+    return categorical.cat.codes.to_numpy().astype(dtype), np.asarray(categories, dtype=object)
+
+
+class FacilityRegistry:
+    def __init__(self, df):
+        region, self.regions = codes(df["region"])
+        filiere, self.filieres = codes(df["filiere"])
+        departement, self.departements = codes(df["departement"])
+        commune, self.communes = codes(df["commune"])
+        year = pd.to_datetime(df["date_mise_en_service"], errors="coerce").dt.year.to_numpy(dtype="float64")
+        capacity = pd.to_numeric(df["puissance_MW"], errors="coerce").to_numpy(dtype="float64")
+        count = pd.to_numeric(df["nb_installations"], errors="coerce").fillna(1).to_numpy(dtype="int64")
+
+        # Lignes sans région, filière ou puissance : hors des cumuls
+        keep = (region >= 0) & (filiere >= 0) & ~np.isnan(capacity)
+        self.dropped = int(len(keep) - keep.sum())
+        current_year = pd.Timestamp.now().year
+        known = ~np.isnan(year) & (year >= FIRST_YEAR) & (year <= current_year + 1)
+        year = np.where(known, np.nan_to_num(year), UNKNOWN_YEAR).astype("int16")
+
+        order = np.lexsort((year[keep], filiere[keep], region[keep]))
+        positions = np.flatnonzero(keep)[order]
+        self.region = region[positions]
+        self.filiere = filiere[positions]
+        self.year = year[positions]
+        self.capacity = capacity[positions].astype("float32")
+        self.count = count[positions].astype("int32")
+        self.departement = departement[positions]
+        self.commune = commune[positions]
+        # Lignes de chaque région : self.region[offsets[r]:offsets[r + 1]] == r
+        self.offsets = np.searchsorted(self.region, np.arange(len(self.regions) + 1))
+
+        dated = self.year[self.year != UNKNOWN_YEAR]
+        first, last = (int(dated.min()), int(dated.max())) if len(dated) else (current_year, current_year)
+        self.years = np.arange(first, last + 1)
+        self.build_rollups()
+
+    def build_rollups(self):
+        # added[r, f, 0] : puissance sans date ; added[r, f, 1 + i] : mise en service en years[i].
+        # installed = cumul sur les années : puissance en service à la fin de chaque année
+        shape = (len(self.regions), len(self.filieres), len(self.years) + 1)
+        slot = np.where(self.year == UNKNOWN_YEAR, 0, self.year - self.years[0] + 1)
+        flat = np.ravel_multi_index((self.region, self.filiere, slot), shape)
+        size = int(np.prod(shape))
+        self.added = np.bincount(flat, weights=self.capacity.astype("float64"), minlength=size).reshape(shape)
+        self.added_count = np.bincount(flat, weights=self.count, minlength=size).reshape(shape).astype("int64")
+        self.installed = np.cumsum(self.added, axis=2)
+        self.installed_count = np.cumsum(self.added_count, axis=2)
+
+    @property
+    def nbytes(self):
+        arrays = [self.region, self.filiere, self.year, self.capacity, self.count, self.departement,
+                  self.commune, self.added, self.added_count, self.installed, self.installed_count]
+        return sum(array.nbytes for array in arrays)
+
+    def __len__(self):
+        return len(self.capacity)
+
+    def region_index(self, region):
+        positions = np.flatnonzero(self.regions == region)
+        if not len(positions):
+            raise KeyError(region)
+        return int(positions[0])
+
+    def year_slot(self, year=None):
+        # Colonne des cumuls pour la fin de `year` (dernière année connue par défaut)
+        if year is None:
+            return len(self.years)
+        return int(np.clip(year - self.years[0] + 1, 0, len(self.years)))
+
+    def select(self, rollup, region=None):
+        # Cumul (filière × années) d'une région ou de la France entière
+        return rollup.sum(axis=0) if region is None else rollup[self.region_index(region)]
+
+    def capacity_by_year(self, region=None):
+        # Puissance en service (MW) à la fin de chaque année, par filière
+        installed = self.select(self.installed, region)[:, 1:]
+        return pd.DataFrame(installed.T, index=pd.Index(self.years, name="year"), columns=self.filieres)
+
+    def additions_by_year(self, region=None):
+        # Puissance mise en service (MW) chaque année, par filière
+        added = self.select(self.added, region)[:, 1:]
+        return pd.DataFrame(added.T, index=pd.Index(self.years, name="year"), columns=self.filieres)
+
+    def by_filiere(self, region=None, year=None):
+        slot = self.year_slot(year)
+        return pd.DataFrame({
+            "puissance_MW": self.select(self.installed, region)[:, slot],
+            "nb_installations": self.select(self.installed_count, region)[:, slot],
+        }, index=pd.Index(self.filieres, name="filiere"))
+
+    def by_region(self, year=None):
+        slot = self.year_slot(year)
+        return pd.DataFrame(self.installed[:, :, slot], index=pd.Index(self.regions, name="region"),
+                            columns=self.filieres)
+
+    def total_capacity(self, region=None, filiere=None, year=None):
+        by_filiere = self.by_filiere(region, year)["puissance_MW"]
+        return float(by_filiere.sum() if filiere is None else by_filiere.get(filiere, 0.0))
+
+    def installations(self, region, filiere=None, top=None):
+        # Lignes du registre d'une région (tranche contiguë), les plus puissantes d'abord
+        r = self.region_index(region)
+        rows = np.arange(self.offsets[r], self.offsets[r + 1])
+        if filiere is not None:
+            rows = rows[self.filieres[self.filiere[rows]] == filiere]
+        rows = rows[np.argsort(-self.capacity[rows], kind="stable")][:top]
+        year = self.year[rows]
+        return pd.DataFrame({
+            "commune": pd.Categorical.from_codes(self.commune[rows], self.communes),
+            "departement": pd.Categorical.from_codes(self.departement[rows], self.departements),
+            "filiere": pd.Categorical.from_codes(self.filiere[rows], self.filieres),
+            "puissance_MW": self.capacity[rows],
+            "nb_installations": self.count[rows],
+            "annee_mise_en_service": pd.array(np.where(year == UNKNOWN_YEAR, None, year), dtype="Int16"),
+        })
+
+
+@metrics.instrument("facility_registry")
+def build_registry(df):
+    # Registre compact à partir de preprocess.clean_energy_facilities ; None si le jeu est vide
+    if df is None or df.empty:
+        return None
+    return FacilityRegistry(df)
+
+
+def production_capacity(registry, region=None):
+    # Puissance en service (MW) par année et filière de la production mensuelle ; les filières du
+    # registre sans équivalent (stockage, énergies marines…) sont ignorées
+    capacity = registry.capacity_by_year(region)
+    mapping = {label: PRODUCTION_FILIERES.get(normalize_label(label)) for label in capacity.columns}
+    capacity = capacity[[label for label, filiere in mapping.items() if filiere]]
+    capacity = capacity.T.groupby(lambda label: mapping[label]).sum().T
+    return capacity.rename_axis(columns="filiere").stack().rename("puissance_MW")
+
+
+@metrics.instrument("load_factors")
+def load_factors(registry, production, region=None):
+    # Facteur de charge annuel par filière : production (cube region × year × month × filiere) sur
+    # puissance en service en fin d'année × heures des mois publiés. Le registre ne recense que les
+    # installations actuelles : les années anciennes sous-estiment la puissance (démantèlements)
+    columns = ["year", "filiere", "production_GWh", "puissance_MW", "heures", "facteur_charge_pct"]
+    if registry is None or production.empty or not len(registry):
+        return pd.DataFrame(columns=columns)
+    production = production["production_GWh"]
+    if region is not None:
+        if region not in production.index.get_level_values("region"):
+            return pd.DataFrame(columns=columns)
+        production = production.xs(region, level="region")
+    monthly = production.groupby(level=["year", "month", "filiere"], observed=True).sum()
+
+    index = monthly.index
+    days = pd.to_datetime(pd.DataFrame({"year": index.get_level_values("year"),
+                                        "month": index.get_level_values("month"), "day": 1})).dt.days_in_month
+    hours = pd.Series(days.to_numpy() * 24.0, index=index)
+    annual = pd.DataFrame({
+        "production_GWh": monthly.groupby(level=["year", "filiere"], observed=True).sum(),
+        "heures": hours.groupby(level=["year", "filiere"], observed=True).sum(),
+    })
+
+    capacity = production_capacity(registry, region)
+    factors = annual.join(capacity, how="inner")
+    factors = factors[factors["puissance_MW"] > 0]
+    factors["facteur_charge_pct"] = (factors["production_GWh"] * 1000 / (factors["puissance_MW"] * factors["heures"]) * 100).round(2)
+    return factors.reset_index()[columns]
@@ -0,0 +1,153 @@
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+import folium
+import numpy as np
+
+from scripts import load_data, metrics
+
+# Contours des régions : téléchargés une seule fois, puis simplifiés et quantifiés par niveau de zoom
+REGIONS_GEOJSON_URL = "https://france-geojson.gregoiredavid.fr/repo/regions.geojson"
+GEO_DIR = Path(os.environ.get("ODRE_GEO_DIR", "data/geo"))
+TOLERANCE_PX = 0.5       # écart maximal toléré entre contour simplifié et original, en pixels
+KEEP_PROPERTIES = ("nom", "code")
+
+
+def regions_path():
+    return Path(GEO_DIR) / "regions.geojson"
+
+
+def download_regions(url=REGIONS_GEOJSON_URL):
+    path = regions_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    response = load_data.get_session().get(url, timeout=load_data.TIMEOUT_SECONDS)
+    metrics.record_http(url, len(response.content))
+    response.raise_for_status()
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(response.content)
+    os.replace(tmp, path)
+    print(f"GeoJSON régions : {url} -> {path}")
+    return path
+
+
+def load_regions(refresh=False):
+    # GeoJSON pleine résolution, lu depuis la copie locale (téléchargée au premier appel)
+    path = regions_path()
+    if refresh or not path.exists():
+        download_regions()
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def pixel_degrees(zoom):
+    # Largeur d'un pixel en degrés de longitude au zoom donné (tuiles de 256 px)
+    return 360.0 / (256 * 2 ** zoom)
+
+
+def simplify_ring(points, tolerance):
+    # Douglas-Peucker itératif ; les extrémités (anneau fermé) sont toujours conservées
+    points = np.asarray(points, dtype="float64")
+    if len(points) <= 4:
+        return points
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        inner = points[start + 1:end] - points[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    simplified = points[keep]
+    # Un anneau doit garder au moins 4 positions (3 sommets + fermeture)
+    return simplified if len(simplified) >= 4 else points[np.linspace(0, len(points) - 1, 4).astype(int)]
+
+
+def simplify_rings(rings, tolerance, decimals):
+    result = []
+    for ring in rings:
+        ring = np.round(simplify_ring(ring, tolerance), decimals)
+        # La quantification peut créer des doublons consécutifs : on les retire
+        distinct = np.r_[True, np.any(np.diff(ring, axis=0) != 0, axis=1)]
+        ring = ring[distinct]
+        if len(ring) >= 4:
+            result.append(ring.tolist())
+    return result
+
+
+def simplify_geometry(geometry, tolerance, decimals):
+    if geometry["type"] == "Polygon":
+        rings = simplify_rings(geometry["coordinates"], tolerance, decimals)
+        return {"type": "Polygon", "coordinates": rings}
+    if geometry["type"] == "MultiPolygon":
+        polygons = [simplify_rings(polygon, tolerance, decimals) for polygon in geometry["coordinates"]]
+        return {"type": "MultiPolygon", "coordinates": [polygon for polygon in polygons if polygon]}
+    return geometry
+
+
+def simplify_geojson(geojson, zoom):
+    # Tolérance et nombre de décimales déduits de la taille d'un pixel au zoom visé
+    tolerance = TOLERANCE_PX * pixel_degrees(zoom)
+    decimals = max(0, int(np.ceil(-np.log10(tolerance))))
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "properties": {key: feature["properties"][key] for key in KEEP_PROPERTIES if key in feature["properties"]},
+                "geometry": simplify_geometry(feature["geometry"], tolerance, decimals),
+            }
+            for feature in geojson["features"]
+        ],
+    }
+
+
+@lru_cache(maxsize=None)
+def regions_geojson(zoom=5):
+    # Version simplifiée mise en cache sur disque et en mémoire : un seul calcul par zoom et par processus
+    path = Path(GEO_DIR) / f"regions-z{zoom}.geojson"
+    source = regions_path()
+    if path.exists() and source.exists() and path.stat().st_mtime >= source.stat().st_mtime:
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    simplified = simplify_geojson(load_regions(), zoom)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(simplified, separators=(",", ":"), ensure_ascii=False), encoding="utf-8")
+    os.replace(tmp, path)
+    return simplified
+
+
+def create_choropleth(data_dict, legend_name, color_scale, geojson_data=None, zoom=5):
+    # Carte choroplèthe des régions (nom -> valeur) sur la géométrie simplifiée partagée
+    geojson_data = geojson_data if geojson_data is not None else regions_geojson(zoom)
+    fmap = folium.Map(location=[46.5, 2.5], zoom_start=zoom, tiles="cartodb positron")
+    choropleth = folium.Choropleth(
+        geo_data=geojson_data,
+        name="choropleth",
+        data=data_dict,
+        columns=["region", "value"],
+        key_on="feature.properties.nom",
+        fill_color=color_scale,
+        fill_opacity=0.7,
+        line_opacity=0.2,
+        legend_name=legend_name,
+        highlight=True
+    ).add_to(fmap)
+
+    # Infobulle portée par la couche choroplèthe : la géométrie n'est embarquée qu'une fois
+    choropleth.geojson.add_child(folium.GeoJsonTooltip(fields=["nom"], aliases=["Région :"]))
+
+    return fmap
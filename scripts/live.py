@@ -0,0 +1,215 @@
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from scripts import load_data, metrics
+
+# Flux quasi temps réel : consommation et production régionales au pas de 15 minutes (éCO2mix).
+# Chaque région garde les BUFFER_POINTS derniers points dans un tampon circulaire de taille fixe ;
+# son dernier horodatage reçu lui sert de curseur, et chaque interrogation repart du plus ancien
+# de ces curseurs : une région qui publie après les autres ne perd pas ses derniers quarts d'heure.
+ENABLED = os.environ.get("ODRE_LIVE", "1") != "0"
+LIVE_DATASET = "eco2mix-regional-tr"
+LIVE_BASE_URL = os.environ.get("ODRE_LIVE_BASE_URL")            # serveur de rejeu, sinon load_data.BASE_URL
+POLL_SECONDS = float(os.environ.get("ODRE_LIVE_POLL_SECONDS", 60))
+BUFFER_POINTS = int(os.environ.get("ODRE_LIVE_BUFFER_POINTS", 7 * 96))   # 7 jours de quarts d'heure
+LOOKBACK_HOURS = float(os.environ.get("ODRE_LIVE_LOOKBACK_HOURS", 24))
+PAGE_LIMIT = 100
+MAX_OFFSET = 10000
+
+TIME_FIELD = "date_heure"
+REGION_FIELD = "libelle_region"
+VALUE_FIELDS = ["consommation", "nucleaire", "thermique", "hydraulique", "eolien", "solaire", "bioenergies"]
+
+
+class RingBuffer:
+    # Horodatages (ns, UTC) croissants et valeurs (MW) ; le plus ancien point est écrasé une fois plein.
+    # Un horodatage déjà présent est mis à jour en place (révision de la dernière valeur publiée).
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.columns = list(columns)
+        self.times = np.zeros(capacity, dtype="int64")
+        self.values = np.full((capacity, len(self.columns)), np.nan, dtype="float64")
+        self.start = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def slots(self):
+        return (self.start + np.arange(self.size)) % self.capacity
+
+    @property
+    def last_time(self):
+        return int(self.times[(self.start + self.size - 1) % self.capacity]) if self.size else None
+
+    def extend(self, times, values):
+        times = np.asarray(times, dtype="int64")
+        values = np.asarray(values, dtype="float64").reshape(len(times), len(self.columns))
+        if self.size and len(times):
+            known = times <= self.last_time
+            if known.any():
+                slots = self.slots()
+                existing = self.times[slots]
+                positions = np.searchsorted(existing, times[known])
+                found = positions < self.size
+                found[found] = existing[positions[found]] == times[known][found]
+                self.values[slots[positions[found]]] = values[known][found]
+            times, values = times[~known], values[~known]
+        if not len(times):
+            return 0
+
+        added = len(times)
+        times, values = times[-self.capacity:], values[-self.capacity:]
+        n = len(times)
+        slots = (self.start + self.size + np.arange(n)) % self.capacity
+        self.times[slots] = times
+        self.values[slots] = values
+        overflow = max(0, self.size + n - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+        return added
+
+    def frame(self):
+        slots = self.slots()
+        index = pd.DatetimeIndex(self.times[slots], tz="UTC", name=TIME_FIELD)
+        return pd.DataFrame(self.values[slots], index=index, columns=self.columns)
+
+
+def parse_records(records):
+    # Enregistrements /records -> frame triée par horodatage ; points sans consommation (quart
+    # d'heure pas encore publié) ignorés pour être relus à l'interrogation suivante
+    df = pd.DataFrame.from_records(records, columns=[TIME_FIELD, REGION_FIELD, *VALUE_FIELDS])
+    df[TIME_FIELD] = pd.to_datetime(df[TIME_FIELD], utc=True, errors="coerce")
+    df[VALUE_FIELDS] = df[VALUE_FIELDS].apply(pd.to_numeric, errors="coerce")
+    df = df.dropna(subset=[TIME_FIELD, REGION_FIELD, "consommation"])
+    return df.sort_values(TIME_FIELD, kind="stable")
+
+
+def odsql_time(timestamp):
+    return f"date'{timestamp.tz_convert('UTC').strftime('%Y-%m-%dT%H:%M:%S')}'"
+
+
+class LiveFeed:
+    # Partagé par toutes les sessions : une seule interrogation par POLL_SECONDS, quel que soit
+    # le nombre d'onglets ouverts
+    def __init__(self, base_url=None, dataset=LIVE_DATASET, capacity=BUFFER_POINTS,
+                 poll_seconds=POLL_SECONDS, lookback_hours=LOOKBACK_HOURS):
+        self.base_url = base_url
+        self.dataset = dataset
+        self.capacity = capacity
+        self.poll_seconds = poll_seconds
+        self.lookback = pd.Timedelta(hours=lookback_hours)
+        self.buffers = {}
+        self.cursor = None
+        self.last_poll = None
+        self.last_error = None
+        self.lock = threading.Lock()
+
+    def url(self):
+        return f"{self.base_url or LIVE_BASE_URL or load_data.BASE_URL}/{self.dataset}/records"
+
+    def fetch(self, params):
+        records = []
+        for offset in range(0, MAX_OFFSET, PAGE_LIMIT):
+            page = load_data.fetch_page(self.url(), params, offset, PAGE_LIMIT)
+            results = page.get("results", [])
+            records.extend(results)
+            if len(results) < PAGE_LIMIT or offset + PAGE_LIMIT >= page.get("total_count", 0):
+                break
+        return records
+
+    def initial_cursor(self):
+        # Premier appel : dernier horodatage publié moins la profondeur d'historique voulue ; le jeu
+        # contient déjà les quarts d'heure à venir de la journée, sans valeurs
+        params = {"select": f"max({TIME_FIELD}) as last", "where": "consommation is not null"}
+        page = load_data.fetch_page(self.url(), params, 0, 1)
+        results = page.get("results", [])
+        last = pd.to_datetime(results[0].get("last"), utc=True, errors="coerce") if results else pd.NaT
+        return None if pd.isna(last) else last - self.lookback
+
+    def region_cursor(self):
+        # Plus ancien des derniers points reçus par région, au plus `lookback` derrière la région la
+        # plus avancée (une région muette ne fait pas relire tout l'historique)
+        last_times = [buffer.last_time for buffer in self.buffers.values() if len(buffer)]
+        if not last_times:
+            return None
+        return pd.Timestamp(max(min(last_times), max(last_times) - self.lookback.value), tz="UTC")
+
+    def poll(self):
+        # Relit à partir du curseur inclus (révision possible du dernier point), ajoute le reste
+        with metrics.stage("live_poll", http=self.dataset, dataset=self.dataset) as record:
+            cursor = self.region_cursor()
+            if cursor is None:
+                cursor = self.cursor if self.cursor is not None else self.initial_cursor()
+            params = {"select": ", ".join([TIME_FIELD, REGION_FIELD, *VALUE_FIELDS]), "order_by": TIME_FIELD}
+            if cursor is not None:
+                params["where"] = f"{TIME_FIELD} >= {odsql_time(cursor)}"
+            df = parse_records(self.fetch(params))
+
+            added = 0
+            for region, rows in df.groupby(REGION_FIELD, sort=False):
+                buffer = self.buffers.setdefault(region, RingBuffer(self.capacity, VALUE_FIELDS))
+                added += buffer.extend(rows[TIME_FIELD].to_numpy(dtype="datetime64[ns]").astype("int64"),
+                                       rows[VALUE_FIELDS].to_numpy(dtype="float64"))
+            self.cursor = cursor
+            record.rows(rows_in=len(df), rows_out=added)
+        return added
+
+    def poll_if_due(self):
+        # (nouveaux points, erreur éventuelle) ; en cas d'échec les tampons restent servis tels quels
+        with self.lock:
+            now = time.monotonic()
+            if self.last_poll is not None and now - self.last_poll < self.poll_seconds:
+                return 0, self.last_error
+            self.last_poll = now
+            try:
+                added = self.poll()
+                self.last_error = None
+            except Exception as e:
+                print(f"Flux {self.dataset} : interrogation impossible ({e})")
+                added, self.last_error = 0, e
+            return added, self.last_error
+
+    def regions(self):
+        with self.lock:
+            return sorted(self.buffers)
+
+    def frame(self, region):
+        with self.lock:
+            buffer = self.buffers.get(region)
+            return buffer.frame() if buffer is not None else pd.DataFrame(columns=VALUE_FIELDS)
+
+    def latest(self):
+        # Dernier point de chaque région
+        with self.lock:
+            rows = {region: buffer.frame().iloc[-1] for region, buffer in self.buffers.items() if len(buffer)}
+        return pd.DataFrame.from_dict(rows, orient="index").sort_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Suivi du flux éCO2mix régional au pas de 15 minutes")
+    parser.add_argument("--base-url", default=None, help="URL du catalogue (serveur de rejeu par exemple)")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="secondes entre deux interrogations")
+    parser.add_argument("--count", type=int, default=0, help="nombre d'interrogations (0 = sans fin)")
+    args = parser.parse_args(argv)
+
+    feed = LiveFeed(base_url=args.base_url, poll_seconds=0)
+    polls = 0
+    while not args.count or polls < args.count:
+        added = feed.poll()
+        polls += 1
+        latest = feed.latest()
+        print(f"{pd.Timestamp.now():%H:%M:%S} | curseur {feed.cursor} | {added} nouveaux points")
+        if not latest.empty:
+            print(latest[["consommation"]].to_string())
+        if not args.count or polls < args.count:
+            time.sleep(args.poll)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,432 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
-import streamlit as st
+
+from scripts import cache, metrics, parallel_clean, preprocess, spatial
+from scripts.query import Query
 
 BASE_URL = "https://odre.opendatasoft.com/api/explore/v2.1/catalog/datasets"
 HEADERS = {"Accept": "application/json"}
 
-def fetch_api_data(endpoint, params=None, limit=100, max_records=10000):
-    url = f"{BASE_URL}/{endpoint}/records"
-    all_records = []
-    offset = 0
+# Paramètres du moteur de pagination
+MAX_WORKERS = 8          # requêtes simultanées par jeu de données
+POOL_SIZE = 32           # connexions keep-alive conservées par hôte
+MAX_RETRIES = 3          # nouvelles tentatives par page
+BACKOFF_SECONDS = 0.5    # délai initial, doublé à chaque tentative
+TIMEOUT_SECONDS = 30
 
-    if params is None:
-        params = {}
+# Mode export : téléchargement complet, sans le plafond de 10 000 offsets
+EXPORT_FORMATS = ("csv", "parquet")
+EXPORT_DIR = Path(os.environ.get("ODRE_EXPORT_DIR", "data/exports"))
+DOWNLOAD_CHUNK_BYTES = 1 << 20
+PARSE_CHUNK_ROWS = 100_000
+
+# Codes à garder en texte (zéros initiaux) lors de la lecture CSV
+EXPORT_STRING_COLUMNS = [
+    "annee", "mois", "code_insee_region", "code_insee_commune", "codeinseecommune",
+    "codedepartement", "coderegion", "id_station", "id_pdc", "departement",
+]
+
+# Nom interne -> identifiant du jeu de données ODRE, et nettoyage associé
+DATASETS = {
+    "monthly_production": "production-regionale-mensuelle-filiere",
+    "facilities": "registre-national-installation-production-stockage-electricite-agrege",
+    "ev_charging": "bornes-irve",
+    "annual_consumption": "consommation-annuelle-brute-regionale",
+}
+CLEANERS = {
+    "monthly_production": preprocess.clean_monthly_production,
+    "facilities": preprocess.clean_energy_facilities,
+    "ev_charging": preprocess.clean_ev_charging,
+    "annual_consumption": preprocess.clean_annual_consumption,
+}
+
+# Projection par défaut : seuls les champs utilisés par le nettoyage traversent le réseau
+DEFAULT_QUERIES = {name: Query(select=columns) for name, columns in preprocess.RAW_COLUMNS.items()}
+
+# Jeux plus grands que le plafond de /records (10 000 enregistrements) : chargés par l'export
+# complet même en mode "records", pour que leurs totaux portent sur tout le jeu
+EXPORT_ONLY = {
+    "facilities": os.environ.get("ODRE_FACILITIES_MODE", "csv"),
+    "ev_charging": os.environ.get("ODRE_EV_CHARGING_MODE", "csv"),
+}
 
-    # Pagination
-    while offset < max_records:
-        current_params = params.copy()
-        current_params["limit"] = limit
-        current_params["offset"] = offset
+# Jeux dont la région peut être déduite des coordonnées (ODRE_ASSIGN_REGIONS=1)
+REGION_FROM_COORDINATES = ("ev_charging",)
 
-        print(f"Requête : {url} | offset = {offset}")
+# Séries temporelles rafraîchies de façon incrémentale : colonne brute -> colonne nettoyée
+INCREMENTAL_FIELDS = {
+    "monthly_production": ("mois", "mois"),
+    "annual_consumption": ("annee", "année"),
+}
 
+_session = None
+
+
+def get_session():
+    # Session unique, keep-alive, partagée par tous les threads de téléchargement
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(HEADERS)
+        _session = session
+    return _session
+
+
+def fetch_page(url, params, offset, limit, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS):
+    current_params = params.copy()
+    current_params["limit"] = limit
+    current_params["offset"] = offset
+
+    for attempt in range(retries + 1):
         try:
-            response = requests.get(url, headers=HEADERS, params=current_params)
+            response = get_session().get(url, params=current_params, timeout=TIMEOUT_SECONDS)
+            metrics.record_http(url, len(response.content))
             response.raise_for_status()
-            data = response.json()
-            results = data.get("results", [])
-            if not results:
-                print("Fin des résultats")
-                break
+            return response.json()
+        except requests.RequestException as e:
+            # Les erreurs client (requête invalide) ne se corrigent pas en réessayant, sauf 429
+            status = getattr(e.response, "status_code", None)
+            client_error = status is not None and 400 <= status < 500 and status != 429
+            if attempt == retries or client_error:
+                print(f"Échec définitif {url} à l’offset {offset} : {e}")
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"Erreur {url} à l’offset {offset} ({e}), nouvel essai dans {delay:.1f}s")
+            time.sleep(delay)
 
-            all_records.extend(results)
 
-            if len(results) < limit:
-                print("Moins de résultats que le 'limit' => Fin")
-                break
+def iter_api_pages(endpoint, params=None, limit=100, max_records=10000, workers=MAX_WORKERS):
+    # Pages /records dans l'ordre des offsets ; au plus 2 × workers pages en vol ou en attente,
+    # si bien que le consommateur peut traiter chaque page sans que tout le jeu soit en mémoire
+    url = f"{BASE_URL}/{endpoint}/records"
+
+    if params is None:
+        params = {}
+
+    # La première page donne total_count, ce qui permet de calculer tous les offsets
+    first_page = fetch_page(url, params, 0, min(limit, max_records))
+    total_count = first_page.get("total_count", len(first_page.get("results", [])))
+    total = min(total_count, max_records)
+    if total_count > max_records:
+        print(f"Attention : {url} tronqué à {max_records} enregistrements sur {total_count} (utiliser l'export)")
 
-            offset += limit
+    offsets = list(range(limit, total, limit))
+    print(f"Requête : {url} | {total} enregistrements, {len(offsets) + 1} pages")
+    yield first_page.get("results", [])
 
-            if offset >= max_records:
-                print("Offset limite atteint (10000 max)")
-                break
+    if offsets:
+        def fetch_offset(offset):
+            page = fetch_page(url, params, offset, min(limit, max_records - offset))
+            return page.get("results", [])
 
-        except Exception as e:
-            print(f"Erreur API {endpoint} à l’offset {offset} : {e}")
-            break
+        workers = max(1, workers)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for offset in offsets:
+                pending.append(executor.submit(fetch_offset, offset))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
 
+
+def fetch_api_data(endpoint, params=None, limit=100, max_records=10000, workers=MAX_WORKERS):
+    all_records = []
+    for results in iter_api_pages(endpoint, params, limit, max_records, workers):
+        all_records.extend(results)
     return pd.DataFrame.from_records(all_records)
 
+
+def download_export(endpoint, fmt="csv", params=None, dest_dir=None):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {fmt} (attendu : {EXPORT_FORMATS})")
+
+    url = f"{BASE_URL}/{endpoint}/exports/{fmt}"
+    dest_dir = Path(dest_dir or EXPORT_DIR)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    suffix = f"-{cache.cache_key(endpoint, params)}" if params else ""
+    path = dest_dir / f"{endpoint}{suffix}.{fmt}"
+    part_path = path.with_name(path.name + ".part")
+
+    print(f"Export : {url} -> {path}")
+
+    # Écriture par blocs : le fichier complet n'est jamais chargé en mémoire
+    downloaded = 0
+    with get_session().get(url, params=params or {}, stream=True, timeout=TIMEOUT_SECONDS) as response:
+        response.raise_for_status()
+        with open(part_path, "wb") as f:
+            for block in response.iter_content(chunk_size=DOWNLOAD_CHUNK_BYTES):
+                f.write(block)
+                downloaded += len(block)
+    metrics.record_http(url, downloaded)
+
+    part_path.replace(path)
+    return path
+
+
+def iter_export_chunks(path, fmt="csv", chunksize=PARSE_CHUNK_ROWS):
+    # Les geo_point du CSV ("lat, lon") sont laissés tels quels : preprocess.extract_geo_point
+    # lit cette forme comme celle de l'API /records
+    path = Path(path)
+    if fmt == "csv":
+        reader = pd.read_csv(
+            path, sep=";", chunksize=chunksize,
+            dtype={col: str for col in EXPORT_STRING_COLUMNS},
+        )
+        yield from reader
+    else:
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+def fetch_export_data(endpoint, fmt="csv", params=None, chunksize=PARSE_CHUNK_ROWS):
+    path = download_export(endpoint, fmt=fmt, params=params)
+    chunks = list(iter_export_chunks(path, fmt=fmt, chunksize=chunksize))
+    if not chunks:
+        return pd.DataFrame()
+    return pd.concat(chunks, ignore_index=True)
+
+
+def fetch_dataset_modified(endpoint):
+    # Date de dernière modification publiée dans le catalogue (sert de validateur de cache)
+    response = get_session().get(f"{BASE_URL}/{endpoint}", timeout=TIMEOUT_SECONDS)
+    metrics.record_http(response.url, len(response.content))
+    response.raise_for_status()
+    return response.json().get("metas", {}).get("default", {}).get("modified")
+
+
+def fetch_source(endpoint, mode="records", params=None):
+    # mode "records" : pagination /records (10 000 max) ; "csv" / "parquet" : export complet
+    if mode == "records":
+        return fetch_api_data(endpoint, params=params)
+    return fetch_export_data(endpoint, fmt=mode, params=params)
+
+
+def fetch_query(endpoint, query, mode="records"):
+    # Requête poussée côté serveur ; si l'API la refuse, filtrage local sur le jeu complet
+    try:
+        return fetch_source(endpoint, mode, params=query.to_params())
+    except requests.HTTPError as e:
+        if e.response is None or e.response.status_code != 400:
+            raise
+        print(f"Requête {endpoint} non supportée côté serveur ({e}), filtrage local")
+        return query.apply(fetch_dataset(endpoint, mode))
+
+
+def fetch_dataset(endpoint, mode="records", params=None, refresh=False, query=None):
+    if query is not None:
+        params = query.to_params()
+        fetch = lambda: fetch_query(endpoint, query, mode)
+    else:
+        fetch = lambda: fetch_source(endpoint, mode, params)
+
+    return cache.get_or_fetch(
+        endpoint, {"mode": mode, **(params or {})}, "raw", fetch,
+        modified_fn=lambda: fetch_dataset_modified(endpoint), refresh=refresh,
+    )
+
+
+def dataset_mode(name, mode="records"):
+    # Mode effectif d'un jeu : les jeux de EXPORT_ONLY ne passent jamais par /records
+    return EXPORT_ONLY.get(name, mode) if mode == "records" else mode
+
+
+def dataset_params(name, mode="records"):
+    # Clé de cache du brut d'un jeu de données : mode + projection par défaut
+    query = DEFAULT_QUERIES.get(name)
+    return {"mode": mode, **(query.to_params() if query else {})}
+
 # Consommation annuelle par région
-@st.cache_data
-def load_annual_energy_consumption():
-    return fetch_api_data("consommation-annuelle-brute-regionale")
+def load_annual_energy_consumption(mode="records", refresh=False):
+    return fetch_dataset(DATASETS["annual_consumption"], mode=mode, refresh=refresh, query=DEFAULT_QUERIES.get("annual_consumption"))
 
 # Production mensuelle par filière
-@st.cache_data
-def load_monthly_production_by_filiere():
-    return fetch_api_data("production-regionale-mensuelle-filiere")
+def load_monthly_production_by_filiere(mode="records", refresh=False):
+    return fetch_dataset(DATASETS["monthly_production"], mode=mode, refresh=refresh, query=DEFAULT_QUERIES.get("monthly_production"))
 
 # Installations de production et stockage d'électricité
-@st.cache_data
-def load_energy_facilities():
-    return fetch_api_data("registre-national-installation-production-stockage-electricite-agrege")
+def load_energy_facilities(mode="records", refresh=False):
+    return fetch_dataset(DATASETS["facilities"], mode=dataset_mode("facilities", mode), refresh=refresh,
+                         query=DEFAULT_QUERIES.get("facilities"))
 
 # Bornes de recharge IRVE
-@st.cache_data
-def load_ev_charging_stations():
-    return fetch_api_data("bornes-irve")
+def load_ev_charging_stations(mode="records", refresh=False):
+    return fetch_dataset(DATASETS["ev_charging"], mode=mode, refresh=refresh, query=DEFAULT_QUERIES.get("ev_charging"))
+
+LOADERS = {
+    "monthly_production": load_monthly_production_by_filiere,
+    "facilities": load_energy_facilities,
+    "ev_charging": load_ev_charging_stations,
+    "annual_consumption": load_annual_energy_consumption,
+}
 
 # Chargement de toutes les données
-def load_all():
+def load_all(mode="records", refresh=False):
+    return {name: loader(mode, refresh) for name, loader in LOADERS.items()}
+
+
+def needs_sync(name, mode="records"):
+    # Série temporelle déjà en cache mais périmée : rafraîchissement incrémental possible
+    endpoint = DATASETS[name]
+    raw_params = dataset_params(name, mode)
+    if name not in INCREMENTAL_FIELDS or cache.read_meta(endpoint, raw_params, "raw") is None:
+        return False
+    return cache.fresh_meta(endpoint, raw_params, "raw", modified_fn=lambda: fetch_dataset_modified(endpoint)) is None
+
+
+def read_raw_cache(name, mode="records"):
+    # Brut encore frais (TTL ou "modified" inchangé), sinon None
+    endpoint = DATASETS[name]
+    raw_params = dataset_params(name, mode)
+    if cache.fresh_meta(endpoint, raw_params, "raw", modified_fn=lambda: fetch_dataset_modified(endpoint)) is None:
+        return None
+    df = cache.load(endpoint, raw_params, "raw")
+    if df is not None:
+        print(f"Cache {endpoint} (raw) : lecture locale")
+    return df
+
+
+def read_clean_cache(name, mode="records"):
+    # Le nettoyé est indexé sur la version du brut : il est invalidé dès que le brut est rechargé
+    endpoint = DATASETS[name]
+    raw_params = dataset_params(name, mode)
+    raw_meta = cache.fresh_meta(endpoint, raw_params, "raw", modified_fn=lambda: fetch_dataset_modified(endpoint))
+    if raw_meta is None:
+        return None
+    df = cache.load(endpoint, {**raw_params, "raw_fetched_at": raw_meta["fetched_at"]}, "clean")
+    if df is not None:
+        print(f"Cache {endpoint} (clean) : lecture locale")
+    return df
+
+
+def save_clean(name, raw, mode="records", previous=None):
+    # Nettoie le brut fraîchement mis en cache et remplace l'ancienne version nettoyée
+    endpoint = DATASETS[name]
+    raw_params = dataset_params(name, mode)
+    previous = previous or {}
+    raw_meta = cache.read_meta(endpoint, raw_params, "raw") or {}
+    clean = parallel_clean.clean(name, raw, CLEANERS[name])
+    if name in REGION_FROM_COORDINATES and spatial.ASSIGN_REGIONS:
+        clean = spatial.assign_regions(clean)
+    cache.save(endpoint, {**raw_params, "raw_fetched_at": raw_meta.get("fetched_at")}, "clean", clean)
+    if previous.get("fetched_at") != raw_meta.get("fetched_at"):
+        cache.remove(endpoint, {**raw_params, "raw_fetched_at": previous.get("fetched_at")}, "clean")
+    cache.evict()
+    return clean
+
+
+def fetch_clean(name, mode="records", refresh=False):
+    # Renvoie (données nettoyées, provenance)
+    mode = dataset_mode(name, mode)
+    if not refresh:
+        if needs_sync(name, mode):
+            return sync_incremental(name, mode), "sync"
+        df = read_clean_cache(name, mode)
+        if df is not None:
+            return df, "cache"
+
+    previous = cache.read_meta(DATASETS[name], dataset_params(name, mode), "raw")
+    raw = LOADERS[name](mode, refresh)
+    return save_clean(name, raw, mode, previous), "fetch"
+
+
+def load_clean(name, mode="records", refresh=False):
+    mode = dataset_mode(name, mode)
+    with metrics.stage("load", http=DATASETS[name], dataset=name, mode=mode) as record:
+        df, record["source"] = fetch_clean(name, mode, refresh)
+        record.rows(rows_out=len(df))
+        return df
+
+
+def load_all_clean(mode="records", refresh=False):
+    return {name: load_clean(name, mode, refresh) for name in DATASETS}
+
+
+def sync_plan(name, mode="records"):
+    # Copie locale et requête des périodes >= high-water mark ; None si la copie est inexploitable
+    # (chargement complet nécessaire)
+    endpoint = DATASETS[name]
+    raw_field, _ = INCREMENTAL_FIELDS[name]
+    raw_params = dataset_params(name, mode)
+
+    raw_meta = cache.read_meta(endpoint, raw_params, "raw")
+    raw = cache.load(endpoint, raw_params, "raw") if raw_meta else None
+    clean_params = {**raw_params, "raw_fetched_at": raw_meta["fetched_at"]} if raw_meta else None
+    clean = cache.load(endpoint, clean_params, "clean") if raw_meta else None
+
+    if raw is None or clean is None or raw.empty or raw_field not in raw.columns:
+        print(f"Sync {endpoint} : pas de copie locale exploitable, chargement complet")
+        return None
+
+    high_water_mark = pd.to_datetime(raw[raw_field], errors="coerce").max()
+    if pd.isna(high_water_mark):
+        return None
+
+    query = DEFAULT_QUERIES.get(name) or Query()
+    query = Query(select=query.select, filters=query.filters, date_field=raw_field,
+                  start=f"{high_water_mark:%Y-%m-%d}")
+    print(f"Sync {endpoint} : {query.where()}")
     return {
-        "monthly_production": load_monthly_production_by_filiere(),
-        "facilities": load_energy_facilities(),
-        "ev_charging": load_ev_charging_stations(),
-        "annual_consumption": load_annual_energy_consumption()
+        "raw": raw, "clean": clean, "raw_meta": raw_meta, "clean_params": clean_params,
+        "high_water_mark": high_water_mark, "query": query,
     }
+
+
+def sync_merge(name, mode, plan, new_raw, modified):
+    # La dernière période connue est remplacée (révisions possibles), les nouvelles sont ajoutées
+    endpoint = DATASETS[name]
+    raw_field, clean_field = INCREMENTAL_FIELDS[name]
+    raw_params = dataset_params(name, mode)
+    raw, clean, high_water_mark = plan["raw"], plan["clean"], plan["high_water_mark"]
+
+    if not new_raw.empty:
+        new_clean = CLEANERS[name](new_raw.copy())
+        raw = pd.concat(
+            [raw[pd.to_datetime(raw[raw_field], errors="coerce") < high_water_mark], new_raw],
+            ignore_index=True,
+        )
+        # concat de catégories différentes repasse en object : on recompacte
+        clean = preprocess.compact_dtypes(pd.concat(
+            [clean[pd.to_datetime(clean[clean_field], errors="coerce") < high_water_mark], new_clean],
+            ignore_index=True,
+        ))
+
+    new_meta = cache.save(endpoint, raw_params, "raw", raw, modified=modified,
+                          extra={"high_water_mark": f"{high_water_mark:%Y-%m-%d}"})
+    cache.save(endpoint, {**raw_params, "raw_fetched_at": new_meta["fetched_at"]}, "clean", clean)
+    cache.remove(endpoint, plan["clean_params"], "clean")
+    cache.evict()
+    print(f"Sync {endpoint} : {len(new_raw)} enregistrements récents, {len(clean)} lignes nettoyées")
+    return clean
+
+
+def sync_incremental(name, mode="records"):
+    # Ne télécharge que les périodes >= high-water mark et les fusionne aux frames en cache
+    plan = sync_plan(name, mode)
+    if plan is None:
+        return load_clean(name, mode, refresh=True)
+
+    endpoint = DATASETS[name]
+    new_raw = fetch_query(endpoint, plan["query"], mode)
+    try:
+        modified = fetch_dataset_modified(endpoint)
+    except requests.RequestException:
+        modified = plan["raw_meta"].get("modified")
+    return sync_merge(name, mode, plan, new_raw, modified)
+
+
+def sync_all_incremental(mode="records"):
+    return {name: sync_incremental(name, mode) for name in INCREMENTAL_FIELDS}
+
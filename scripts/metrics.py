@@ -0,0 +1,199 @@
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+try:
+    import resource
+except ImportError:         # Windows : pas de pic mémoire
+    resource = None
+
+# Instrumentation du pipeline : une ligne JSON par étape (chargement, nettoyage, agrégats, rendu)
+# avec durée, requêtes / octets HTTP, lignes en entrée / sortie et mémoire du processus.
+# Coût : deux horloges, un getrusage et une lecture de /proc par étape, assez faible pour rester
+# actif en production.
+ENABLED = os.environ.get("ODRE_METRICS", "1") != "0"
+LOG_PATH = os.environ.get("ODRE_METRICS_LOG")          # fichier JSON lines, sinon stderr
+HISTORY_SIZE = 500
+
+logger = logging.getLogger("odre.metrics")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+if not logger.handlers:
+    logger.addHandler(logging.FileHandler(LOG_PATH, encoding="utf-8") if LOG_PATH else logging.StreamHandler(sys.stderr))
+
+_lock = threading.Lock()
+_http_requests = Counter()    # jeu de données (ou hôte) -> requêtes
+_http_bytes = Counter()       # jeu de données (ou hôte) -> octets reçus
+_history = deque(maxlen=HISTORY_SIZE)
+_local = threading.local()    # enregistrements retenus par `collect` (thread courant)
+
+
+def http_key(url):
+    # Identifiant du jeu de données ODRE dans l'URL (.../datasets/<id>/...), sinon l'hôte
+    parsed = urlparse(url)
+    parts = parsed.path.strip("/").split("/")
+    if "datasets" in parts and parts.index("datasets") + 1 < len(parts):
+        return parts[parts.index("datasets") + 1]
+    return parsed.netloc
+
+
+def record_http(url, nbytes):
+    if not ENABLED:
+        return
+    key = http_key(url)
+    with _lock:
+        _http_requests[key] += 1
+        _http_bytes[key] += nbytes or 0
+
+
+def http_totals(key=None):
+    with _lock:
+        if key is None:
+            return sum(_http_requests.values()), sum(_http_bytes.values())
+        return _http_requests[key], _http_bytes[key]
+
+
+def peak_rss_mb():
+    # ru_maxrss : Ko sous Linux, octets sous macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 ** 2 if sys.platform == "darwin" else 1024), 1)
+
+
+def rss_mb():
+    # Mémoire résidente actuelle (Linux : /proc/self/statm, en pages), None ailleurs
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2, 1)
+
+
+class Stage(dict):
+    # Champs libres d'une étape en cours (rows_in, rows_out, source…), complétés à la sortie
+    def rows(self, rows_in=None, rows_out=None):
+        if rows_in is not None:
+            self["rows_in"] = rows_in
+        if rows_out is not None:
+            self["rows_out"] = rows_out
+
+
+@contextmanager
+def stage(name, http=None, **fields):
+    # http : identifiant du jeu de données dont on attribue les requêtes à l'étape ("*" = toutes)
+    record = Stage(stage=name, **fields)
+    if not ENABLED:
+        yield record
+        return
+
+    http_key_ = None if http == "*" else http
+    requests_before, bytes_before = http_totals(http_key_) if http else (0, 0)
+    # ru_maxrss est le pic sur toute la vie du processus, pas celui de l'étape : process_peak_growth_mb
+    # ne dit que de combien l'étape a relevé ce pic (0 si elle reste sous un pic antérieur) ;
+    # rss_delta_mb est la variation de la mémoire résidente entre l'entrée et la sortie de l'étape
+    peak_before, rss_before = peak_rss_mb(), rss_mb()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield record
+    except BaseException as e:
+        status = type(e).__name__
+        raise
+    finally:
+        record["seconds"] = round(time.perf_counter() - start, 4)
+        if http:
+            requests_after, bytes_after = http_totals(http_key_)
+            record["http_requests"] = requests_after - requests_before
+            record["http_bytes"] = bytes_after - bytes_before
+        record["peak_rss_mb"] = peak_rss_mb()
+        if peak_before is not None:
+            record["process_peak_growth_mb"] = round(record["peak_rss_mb"] - peak_before, 1)
+        rss_after = rss_mb()
+        if rss_before is not None and rss_after is not None:
+            record["rss_mb"] = rss_after
+            record["rss_delta_mb"] = round(rss_after - rss_before, 1)
+        record["status"] = status
+        record["ts"] = round(time.time(), 3)
+        emit(record)
+
+
+def mark(name, seconds, **fields):
+    # Durée mesurée hors d'un bloc `with stage` (ex. délai avant le premier affichage)
+    if not ENABLED:
+        return
+    emit(Stage(stage=name, **fields, seconds=round(seconds, 4), peak_rss_mb=peak_rss_mb(),
+               status="ok", ts=round(time.time(), 3)))
+
+
+def emit(record):
+    collected = getattr(_local, "collected", None)
+    if collected is not None:
+        collected.append(dict(record))
+        return
+    with _lock:
+        _history.append(dict(record))
+    logger.info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+@contextmanager
+def collect():
+    # Étapes du bloc retenues dans la liste renvoyée au lieu d'être journalisées : un processus du
+    # pool de nettoyage les renvoie avec son résultat, le processus parent les rejoue (`replay`)
+    previous = getattr(_local, "collected", None)
+    _local.collected = records = []
+    try:
+        yield records
+    finally:
+        _local.collected = previous
+
+
+def replay(records, **fields):
+    # Étapes mesurées dans un autre processus : historique et journal du processus courant
+    if not ENABLED:
+        return
+    for record in records:
+        emit({**record, **fields})
+
+
+def count_rows(obj):
+    # DataFrame -> nombre de lignes ; dict de DataFrames -> somme
+    if isinstance(obj, dict):
+        counts = [count for count in map(count_rows, obj.values()) if count is not None]
+        return sum(counts) if counts else None
+    return len(obj) if hasattr(obj, "columns") else None
+
+
+def instrument(name):
+    # Décorateur : une étape par appel, lignes en entrée (1er argument) et en sortie (résultat)
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as record:
+                record.rows(rows_in=count_rows(args[0]) if args else None)
+                result = func(*args, **kwargs)
+                record.rows(rows_out=count_rows(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def recent(limit=None):
+    with _lock:
+        records = list(_history)
+    return records[-limit:] if limit else records
+
+
+def reset():
+    with _lock:
+        _history.clear()
+        _http_requests.clear()
+        _http_bytes.clear()
@@ -0,0 +1,139 @@
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from scripts import metrics, preprocess
+
+# Nettoyage en parallèle sur plusieurs processus : les gros jeux sont découpés par région, chaque
+# partition est nettoyée dans un processus du pool, puis les morceaux sont remis dans l'ordre exact
+# du nettoyage série (mêmes lignes, même index, mêmes catégories).
+WORKERS = int(os.environ.get("ODRE_CLEAN_WORKERS", os.cpu_count() or 1))
+PARTITION_MIN_ROWS = int(os.environ.get("ODRE_CLEAN_PARTITION_MIN_ROWS", 200_000))
+PARTITION_COLUMN = "region"
+
+# Jeu partitionnable -> forme de la sortie du nettoyage :
+#   "rows" : une ligne nettoyée par ligne brute au plus, index d'origine conservé
+#   "melt" : sortie dépliée par filière, index = filière × nombre de lignes + position de la ligne
+PARTITIONED = {
+    "ev_charging": "rows",
+    "monthly_production": "melt",
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def enabled():
+    return WORKERS > 1
+
+
+def get_pool():
+    # Pool unique, démarré au premier usage ; "forkserver" évite de dupliquer les threads
+    # du chargeur (boucle asyncio, Streamlit) dans les processus fils
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=context)
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def run_cleaner(cleaner, df):
+    # Exécuté dans un processus du pool : jeu nettoyé et étapes mesurées pendant le nettoyage
+    # (clean_* de preprocess), sans quoi elles resteraient dans l'historique du processus fils
+    with metrics.collect() as records:
+        result = cleaner(df)
+    return result, records
+
+
+def cleaned(future):
+    # Résultat d'une tâche run_cleaner ; ses étapes rejoignent l'historique du processus courant
+    result, records = future.result()
+    metrics.replay(records, worker=True)
+    return result
+
+
+def partition_positions(df, column=PARTITION_COLUMN):
+    # Positions des lignes de chaque valeur de `column` (valeurs manquantes comprises)
+    groups = df.groupby(column, sort=False, dropna=False, observed=True).indices
+    return [np.asarray(positions) for positions in groups.values()]
+
+
+def merge_partitions(name, df, parts, positions):
+    # Replace chaque partition nettoyée à la position qu'auraient ses lignes dans le nettoyage série
+    shape = PARTITIONED[name]
+    frames = []
+    for part, pos in zip(parts, positions):
+        if part is None or part.empty:
+            continue
+        local = part.index.to_numpy()
+        if shape == "melt":
+            order = (local // len(pos)) * len(df) + pos[local % len(pos)]
+        else:
+            order = pos[local]
+        frames.append(part.set_axis(order))
+    if not frames:
+        return None
+    merged = pd.concat(frames).sort_index(kind="stable")
+    if shape == "rows":
+        merged.index = df.index[merged.index.to_numpy()]
+    # Catégories différentes d'une partition à l'autre : recompactées sur le jeu complet
+    return preprocess.compact_dtypes(merged)
+
+
+def partitionable(name, df):
+    return (name in PARTITIONED and df is not None and len(df) >= PARTITION_MIN_ROWS
+            and PARTITION_COLUMN in df.columns)
+
+
+def submit(pool, name, df, cleaner):
+    # Envoie le nettoyage d'un jeu au pool (en partitions si possible) ; renvoie une fonction
+    # sans argument qui attend les résultats et rend le jeu nettoyé
+    positions = partition_positions(df) if partitionable(name, df) else []
+    if len(positions) < 2:
+        return functools.partial(cleaned, pool.submit(run_cleaner, cleaner, df))
+
+    futures = [pool.submit(run_cleaner, cleaner, df.iloc[pos].reset_index(drop=True)) for pos in positions]
+
+    def result():
+        with metrics.stage("clean_parallel", dataset=name, partitions=len(positions), workers=WORKERS) as record:
+            record.rows(rows_in=len(df))
+            merged = merge_partitions(name, df, [cleaned(future) for future in futures], positions)
+            if merged is None:
+                merged = cleaner(df.iloc[:0].copy())
+            record.rows(rows_out=len(merged))
+        return merged
+    return result
+
+
+def clean(name, df, cleaner):
+    # Nettoyage d'un jeu : sur le pool s'il est gros (en partitions si possible), sinon sur place.
+    # Les chargeurs nettoient les jeux en parallèle (un thread par jeu) : le pool reçoit alors les
+    # tâches de tous les jeux, comme avec clean_all
+    if not enabled() or df is None or len(df) < PARTITION_MIN_ROWS:
+        return cleaner(df)
+    return submit(get_pool(), name, df, cleaner)()
+
+
+def clean_all(data, cleaners):
+    # Équivalent parallèle de preprocess.clean_and_merge : toutes les tâches (jeux entiers ou
+    # partitions) sont envoyées au pool avant d'attendre le premier résultat
+    if not enabled():
+        return {name: cleaners[name](data.get(name)) for name in cleaners}
+    pool = get_pool()
+    pending = {name: submit(pool, name, data.get(name), cleaner) for name, cleaner in cleaners.items()}
+    return {name: result() for name, result in pending.items()}
@@ -1,45 +1,146 @@
+import numpy as np
 import pandas as pd
 
+from scripts import metrics
+
+PRODUCTION_COLUMNS = [
+    "production_nucleaire", "production_thermique",
+    "production_hydraulique", "production_eolienne",
+    "production_solaire", "production_bioenergies"
+]
+
+# Champs bruts utilisés par chaque nettoyage (projection "select" envoyée à l'API)
+RAW_COLUMNS = {
+    "monthly_production": ["mois", "region", *PRODUCTION_COLUMNS],
+    "ev_charging": [
+        "n_amenageur", "region", "departement", "code_insee_commune",
+        "puiss_max", "geo_point_borne", "date_maj"
+    ],
+    "annual_consumption": [
+        "annee", "region", "consommation_brute_electricite_rte",
+        "consommation_brute_gaz_totale", "consommation_brute_totale"
+    ],
+    "facilities": [
+        "region", "departement", "commune", "filiere",
+        "puismaxinstallee", "nbinstallations", "datemiseenservice"
+    ],
+}
+
+# Registre national : puissance maximale installée (kW), nombre d'installations regroupées sur la
+# ligne (registre agrégé) et date de mise en service
+FACILITY_RENAMES = {
+    "puismaxinstallee": "puissance_MW",
+    "nbinstallations": "nb_installations",
+    "datemiseenservice": "date_mise_en_service",
+}
+
+# Colonnes peu distinctes stockées en category, entiers réduits à int32 s'ils y tiennent. Seules
+# les mesures des grands jeux (une ligne par borne, installation ou mois × filière) passent en
+# float32 : les consommations annuelles (quelques centaines de lignes) restent en float64, sans quoi
+# leurs GWh s'affichent avec les artefacts de l'arrondi float32 (12458.400391)
+CATEGORY_COLUMNS = ["region", "filiere", "departement", "amenageur"]
+FLOAT32_COLUMNS = ["production_GWh", "puissance_kW", "puissance_MW", "lat", "lon"]
+INT32_RANGE = (np.iinfo(np.int32).min, np.iinfo(np.int32).max)
+
+
+def compact_dtypes(df):
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col in FLOAT32_COLUMNS:
+        if col in df.columns and df[col].dtype == "float64":
+            df[col] = df[col].astype("float32")
+    for col in df.select_dtypes(include="int64").columns:
+        if df[col].empty or df[col].between(*INT32_RANGE).all():
+            df[col] = df[col].astype("int32")
+    return df
+
+
+@metrics.instrument("clean_monthly_production")
 def clean_monthly_production(df):
     if df.empty:
         return df
 
-    df["mois"] = pd.to_datetime(df["mois"], errors="coerce")
-
-    df_long = df.melt(
-        id_vars=["mois", "region"],
-        value_vars=[
-            "production_nucleaire", "production_thermique",
-            "production_hydraulique", "production_eolienne",
-            "production_solaire", "production_bioenergies"
-        ],
-        var_name="filiere",
-        value_name="production_GWh"
-    )
-
-    df_long["filiere"] = df_long["filiere"].str.replace("production_", "", regex=False)
-    df_long = df_long.dropna(subset=["production_GWh", "mois"])
-    return df_long
-
-
+    mois = pd.to_datetime(df["mois"], errors="coerce")
+    region = df["region"].astype("category")
+    values = df.reindex(columns=PRODUCTION_COLUMNS).apply(pd.to_numeric, errors="coerce")
+
+    # Équivalent de melt (filière par filière) puis dropna, construit directement à partir des
+    # codes : region et filiere ne sont jamais matérialisées en chaînes répétées
+    n, k = len(df), len(PRODUCTION_COLUMNS)
+    production = values.to_numpy(dtype="float64").ravel(order="F")
+    keep = ~np.isnan(production) & np.tile(mois.notna().to_numpy(), k)
+    rows = np.flatnonzero(keep)
+
+    df_long = pd.DataFrame({
+        "mois": mois.to_numpy()[rows % n],
+        "region": pd.Categorical.from_codes(region.cat.codes.to_numpy()[rows % n], region.cat.categories),
+        "filiere": pd.Categorical.from_codes(
+            rows // n, [col.replace("production_", "", 1) for col in PRODUCTION_COLUMNS]
+        ),
+        "production_GWh": production[rows],
+    }, index=rows)
+    return compact_dtypes(df_long)
+
+
+@metrics.instrument("clean_energy_facilities")
 def clean_energy_facilities(df):
     if df is None or df.empty:
         return pd.DataFrame()
 
-    # Afficher les colonnes dispo pour debug
-    print("Colonnes disponibles dans facilities :", df.columns.tolist())
-
-    expected_cols = ["region", "commune", "filiere", "puissance_MW", "date_mise_en_service"]
+    df = df.rename(columns=FACILITY_RENAMES)
+    expected_cols = ["region", "departement", "commune", "filiere", "puissance_MW", "nb_installations", "date_mise_en_service"]
     missing = [col for col in expected_cols if col not in df.columns]
 
     if missing:
         print(f"Colonnes manquantes dans facilities : {missing}")
-        for col in missing:
-            df[col] = None
-
-    return df[expected_cols]
-
 
+    # Colonnes absentes : valeurs manquantes typées (NaN / NaT), pas des objets None
+    df = df.reindex(columns=expected_cols)
+    puissance_kw = pd.to_numeric(df["puissance_MW"], errors="coerce")
+    df_clean = pd.DataFrame({
+        "region": df["region"],
+        "departement": df["departement"],
+        "commune": df["commune"].astype("category"),
+        "filiere": df["filiere"],
+        "puissance_MW": puissance_kw / 1000,
+        "nb_installations": pd.to_numeric(df["nb_installations"], errors="coerce").fillna(1).astype("int64"),
+        "date_mise_en_service": pd.to_datetime(df["date_mise_en_service"], errors="coerce"),
+    }, index=df.index)
+    return compact_dtypes(df_clean)
+
+
+def extract_geo_point(points):
+    # geo_point {"lon", "lat"} (API /records, Parquet) ou "lat, lon" (export CSV) -> deux colonnes
+    sample = points.dropna()
+    if not sample.empty and isinstance(sample.iloc[0], str):
+        parts = points.str.split(",", n=1, expand=True).reindex(columns=[0, 1])
+        coords = pd.DataFrame({"lat": parts[0], "lon": parts[1]}, index=points.index)
+    else:
+        coords = geo_point_struct(points)
+        if coords is None:
+            coords = pd.DataFrame.from_records(
+                [p if isinstance(p, dict) else {} for p in points], columns=["lat", "lon"]
+            )
+            coords.index = points.index
+    return coords.apply(pd.to_numeric, errors="coerce")
+
+
+def geo_point_struct(points):
+    # Conversion en une passe par pyarrow (optionnel) ; None si indisponible ou contenu inattendu
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return None
+    try:
+        struct = pa.array(points.tolist(), type=pa.struct([("lat", pa.float64()), ("lon", pa.float64())]))
+    except (TypeError, ValueError):
+        return None
+    lat, lon = (field.to_numpy(zero_copy_only=False) for field in struct.flatten())
+    return pd.DataFrame({"lat": lat, "lon": lon}, index=points.index)
+
+
+@metrics.instrument("clean_ev_charging")
 def clean_ev_charging(df):
     if df.empty:
         return pd.DataFrame(columns=[
@@ -47,16 +148,9 @@ def clean_ev_charging(df):
             "puissance_kW", "lat", "lon", "date_maj"
         ])
 
-    def extract_lat(x):
-        return x.get("lat") if isinstance(x, dict) else None
-
-    def extract_lon(x):
-        return x.get("lon") if isinstance(x, dict) else None
+    coords = extract_geo_point(df["geo_point_borne"])
 
-    df["lat"] = df["geo_point_borne"].apply(extract_lat)
-    df["lon"] = df["geo_point_borne"].apply(extract_lon)
-
-    df_clean = df.rename(columns={
+    df_clean = df.assign(lat=coords["lat"], lon=coords["lon"]).rename(columns={
         "n_amenageur": "amenageur",
         "puiss_max": "puissance_kW",
         "code_insee_commune": "commune",
@@ -66,12 +160,15 @@ def clean_ev_charging(df):
     if "date_maj" in df_clean.columns:
         df_clean["date_maj"] = pd.to_datetime(df_clean["date_maj"], errors="coerce")
 
-    return df_clean[[
+    df_clean = df_clean[[
         "amenageur", "region", "departement", "commune",
         "puissance_kW", "lat", "lon", "date_maj"
     ]].dropna(subset=["lat", "lon"])
+    df_clean["puissance_kW"] = pd.to_numeric(df_clean["puissance_kW"], errors="coerce")
+    return compact_dtypes(df_clean)
 
 
+@metrics.instrument("clean_annual_consumption")
 def clean_annual_consumption(df):
     if df.empty:
         return df
@@ -90,13 +187,17 @@ def clean_annual_consumption(df):
     # Convertir les années en format datetime (au 1er janvier de l'année)
     df["année"] = pd.to_datetime(df["année"].astype(int), format="%Y")
 
-    return df[["année", "region", "conso_elec_GWh", "conso_gaz_GWh", "conso_totale_GWh"]]
+    return compact_dtypes(df[["année", "region", "conso_elec_GWh", "conso_gaz_GWh", "conso_totale_GWh"]].copy())
 
 
 def clean_and_merge(data: dict):
-    return {
-        "monthly_production": clean_monthly_production(data.get("monthly_production")),
-        "facilities": clean_energy_facilities(data.get("facilities")),
-        "ev_charging": clean_ev_charging(data.get("ev_charging")),
-        "annual_consumption": clean_annual_consumption(data.get("annual_consumption")),
-    }
+    # Nettoyage des 4 jeux sur le pool de processus de scripts/parallel_clean.py (série si
+    # ODRE_CLEAN_WORKERS=1) ; import local, parallel_clean important ce module
+    from scripts import parallel_clean
+
+    return parallel_clean.clean_all(data, {
+        "monthly_production": clean_monthly_production,
+        "facilities": clean_energy_facilities,
+        "ev_charging": clean_ev_charging,
+        "annual_consumption": clean_annual_consumption,
+    })
@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+# Fonctions d'agrégat ODSQL -> équivalent pandas pour le repli local
+AGGREGATES = {"sum": "sum", "avg": "mean", "count": "count", "min": "min", "max": "max"}
+
+
+def odsql_literal(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def utc_timestamp(value):
+    # Borne de date sans fuseau lue en UTC, comme le serveur lit date'...'
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+
+@dataclass
+class Query:
+    # Requête déclarative traduite en paramètres ODRE select / where / group_by
+    select: list = field(default_factory=list)
+    filters: dict = field(default_factory=dict)       # champ -> valeur ou liste de valeurs
+    date_field: str = None
+    start: str = None                                  # inclus, ex. "2020-01-01"
+    end: str = None                                    # exclu
+    group_by: list = field(default_factory=list)
+    aggregates: dict = field(default_factory=dict)    # alias -> (fonction, champ), champ "*" pour count
+
+    def __post_init__(self):
+        for alias, (func, _) in self.aggregates.items():
+            if func not in AGGREGATES:
+                raise ValueError(f"Agrégat non supporté pour {alias} : {func} (attendu : {list(AGGREGATES)})")
+
+    def where(self):
+        clauses = []
+        for name, value in self.filters.items():
+            if isinstance(value, (list, tuple, set)):
+                values = ", ".join(odsql_literal(v) for v in sorted(value, key=str))
+                clauses.append(f"{name} in ({values})")
+            else:
+                clauses.append(f"{name} = {odsql_literal(value)}")
+        if self.date_field and self.start:
+            clauses.append(f"{self.date_field} >= date'{self.start}'")
+        if self.date_field and self.end:
+            clauses.append(f"{self.date_field} < date'{self.end}'")
+        return " and ".join(clauses) or None
+
+    def to_params(self):
+        params = {}
+        select = [*self.group_by, *[
+            f"{func}({column}) as {alias}" for alias, (func, column) in self.aggregates.items()
+        ]] if self.group_by or self.aggregates else list(self.select)
+        if select:
+            params["select"] = ", ".join(select)
+        where = self.where()
+        if where:
+            params["where"] = where
+        if self.group_by:
+            params["group_by"] = ", ".join(self.group_by)
+        return params
+
+    def apply(self, df):
+        # Repli local : mêmes sémantiques que la requête poussée côté serveur
+        if df is None or df.empty:
+            return df
+
+        mask = pd.Series(True, index=df.index)
+        for name, value in self.filters.items():
+            if isinstance(value, (list, tuple, set)):
+                mask &= df[name].isin(list(value))
+            else:
+                mask &= df[name] == value
+        if self.date_field and (self.start or self.end):
+            # Comparaison en UTC : les horodatages de l'API portent un fuseau, les bornes non
+            dates = pd.to_datetime(df[self.date_field], errors="coerce", utc=True)
+            if self.start:
+                mask &= dates >= utc_timestamp(self.start)
+            if self.end:
+                mask &= dates < utc_timestamp(self.end)
+        df = df[mask]
+
+        if self.group_by or self.aggregates:
+            if not self.group_by:
+                return pd.DataFrame([{
+                    alias: len(df) if column == "*" else df[column].agg(AGGREGATES[func])
+                    for alias, (func, column) in self.aggregates.items()
+                }])
+            grouped = df.groupby(self.group_by, dropna=False)
+            result = pd.DataFrame({
+                alias: grouped.size() if column == "*" else grouped[column].agg(AGGREGATES[func])
+                for alias, (func, column) in self.aggregates.items()
+            })
+            return result.reset_index() if self.aggregates else grouped.size().reset_index()[self.group_by]
+
+        if self.select:
+            df = df[[col for col in self.select if col in df.columns]]
+        return df.reset_index(drop=True)
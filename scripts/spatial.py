@@ -0,0 +1,219 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Index spatiaux en numpy pur sur les lat / lon produits par clean_ev_charging :
+#  - GridIndex : grille régulière (à la geohash), points triés par cellule ; emprise, rayon,
+#    plus proches voisins et densité ne parcourent que les cellules concernées
+#  - PolygonIndex : contours GeoJSON découpés en bandes de latitude ; test point-dans-polygone
+#    pair / impair sur les seules arêtes de la bande du point (régions, départements, communes…)
+CELL_DEGREES = 0.05            # ~5 km : quelques dizaines de bornes par cellule en ville
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180
+POLYGON_BANDS = 512
+MAX_TEST_CELLS = 4_000_000     # points × arêtes testés par bloc : borne la mémoire du test
+
+# Réaffectation des bornes à la région qui contient leurs coordonnées, plutôt que le libellé de l'API
+ASSIGN_REGIONS = os.environ.get("ODRE_ASSIGN_REGIONS", "0") == "1"
+ASSIGN_ZOOM = 10               # contours simplifiés à ~70 m près
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype="float64")) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class GridIndex:
+    # Les résultats sont des positions (iloc) dans le tableau indexé, triées dans l'ordre d'origine
+    def __init__(self, lat, lon, cell_deg=CELL_DEGREES):
+        self.lat = np.asarray(lat, dtype="float64")
+        self.lon = np.asarray(lon, dtype="float64")
+        self.cell_deg = cell_deg
+        positions = np.flatnonzero(np.isfinite(self.lat) & np.isfinite(self.lon))
+        if len(positions) == 0:
+            self.x0 = self.y0 = 0
+            self.nx = self.ny = 1
+            self.order = self.keys = np.empty(0, dtype="int64")
+            return
+
+        cx = np.floor(self.lon[positions] / cell_deg).astype("int64")
+        cy = np.floor(self.lat[positions] / cell_deg).astype("int64")
+        self.x0, self.y0 = int(cx.min()), int(cy.min())
+        self.nx, self.ny = int(cx.max()) - self.x0 + 1, int(cy.max()) - self.y0 + 1
+        keys = (cy - self.y0) * self.nx + (cx - self.x0)
+        order = np.argsort(keys, kind="stable")
+        self.order = positions[order]
+        self.keys = keys[order]
+
+    @classmethod
+    def from_frame(cls, df, cell_deg=CELL_DEGREES):
+        return cls(df["lat"].to_numpy(dtype="float64"), df["lon"].to_numpy(dtype="float64"), cell_deg)
+
+    def __len__(self):
+        return len(self.order)
+
+    def candidates(self, south, west, north, east):
+        # Points des cellules recouvrant l'emprise : une plage contiguë de clés par rangée de cellules
+        if not len(self.order):
+            return self.order
+        cx0 = max(int(np.floor(west / self.cell_deg)) - self.x0, 0)
+        cx1 = min(int(np.floor(east / self.cell_deg)) - self.x0, self.nx - 1)
+        cy0 = max(int(np.floor(south / self.cell_deg)) - self.y0, 0)
+        cy1 = min(int(np.floor(north / self.cell_deg)) - self.y0, self.ny - 1)
+        if cx0 > cx1 or cy0 > cy1:
+            return self.order[:0]
+        rows = np.arange(cy0, cy1 + 1) * self.nx
+        starts = np.searchsorted(self.keys, rows + cx0, side="left")
+        ends = np.searchsorted(self.keys, rows + cx1, side="right")
+        return np.concatenate([self.order[start:end] for start, end in zip(starts, ends)])
+
+    def bbox(self, south, west, north, east):
+        found = self.candidates(south, west, north, east)
+        lat, lon = self.lat[found], self.lon[found]
+        return np.sort(found[(lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)])
+
+    def viewport(self, bounds, margin=0.1):
+        # bounds au format de ev_map.in_viewport : ((sud, ouest), (nord, est))
+        (south, west), (north, east) = bounds
+        dlat, dlon = (north - south) * margin, (east - west) * margin
+        return self.bbox(south - dlat, west - dlon, north + dlat, east + dlon)
+
+    def radius(self, lat, lon, km):
+        # (positions, distances en km) des points à moins de `km` du point donné
+        dlat = km / KM_PER_DEGREE
+        dlon = km / (KM_PER_DEGREE * max(np.cos(np.radians(lat)), 1e-6))
+        found = self.candidates(lat - dlat, lon - dlon, lat + dlat, lon + dlon)
+        distances = haversine_km(lat, lon, self.lat[found], self.lon[found])
+        keep = distances <= km
+        order = np.argsort(found[keep], kind="stable")
+        return found[keep][order], distances[keep][order]
+
+    def nearest(self, lat, lon, k=1, max_km=2000.0):
+        # Rayon de recherche doublé jusqu'à trouver k points dans le cercle : le cercle étant
+        # entièrement couvert par les cellules lues, les k plus proches y sont forcément
+        km = self.cell_deg * KM_PER_DEGREE
+        while True:
+            found, distances = self.radius(lat, lon, km)
+            if len(found) >= k or km >= max_km:
+                best = np.argsort(distances, kind="stable")[:k]
+                return found[best], distances[best]
+            km *= 2
+
+    def count(self, lat, lon, km):
+        return len(self.radius(lat, lon, km)[0])
+
+    def density(self, lat, lon, km):
+        # Points par km² dans le disque de rayon `km`
+        return self.count(lat, lon, km) / (np.pi * km ** 2)
+
+
+def feature_rings(geometry):
+    if geometry["type"] == "Polygon":
+        return geometry["coordinates"]
+    if geometry["type"] == "MultiPolygon":
+        return [ring for polygon in geometry["coordinates"] for ring in polygon]
+    return []
+
+
+class PolygonIndex:
+    # Règle pair / impair sur tous les anneaux d'une entité : trous et multipolygones compris
+    def __init__(self, geojson, key="nom", bands=POLYGON_BANDS):
+        self.names = []
+        edges = []
+        for feature in geojson["features"]:
+            rings = feature_rings(feature.get("geometry") or {"type": None})
+            if not rings:
+                continue
+            owner = len(self.names)
+            self.names.append(feature["properties"].get(key))
+            for ring in rings:
+                ring = np.asarray(ring, dtype="float64")[:, :2]
+                if len(ring) < 3:
+                    continue
+                if not np.array_equal(ring[0], ring[-1]):
+                    ring = np.vstack([ring, ring[:1]])
+                edges.append(np.column_stack([ring[:-1], ring[1:], np.full(len(ring) - 1, owner)]))
+
+        edges = np.vstack(edges) if edges else np.empty((0, 5))
+        edges = edges[edges[:, 1] != edges[:, 3]]       # arêtes horizontales : jamais traversées
+        self.x0, self.y0, self.x1, self.y1 = (edges[:, i] for i in range(4))
+        self.owner = edges[:, 4].astype("int64")
+
+        # Bande(s) de latitude couvertes par chaque arête -> liste d'arêtes triée par bande
+        self.bands = bands
+        self.ymin = float(np.minimum(self.y0, self.y1).min()) if len(edges) else 0.0
+        ymax = float(np.maximum(self.y0, self.y1).max()) if len(edges) else 1.0
+        self.band_height = (ymax - self.ymin) / bands or 1.0
+        first = self.band_of(np.minimum(self.y0, self.y1))
+        last = self.band_of(np.maximum(self.y0, self.y1))
+        counts = last - first + 1
+        edge_ids = np.repeat(np.arange(len(edges)), counts)
+        band_ids = np.repeat(first, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        order = np.argsort(band_ids, kind="stable")
+        self.band_edges = edge_ids[order]
+        self.band_starts = np.searchsorted(band_ids[order], np.arange(bands + 1))
+
+    def band_of(self, lat):
+        return np.clip(np.floor((lat - self.ymin) / self.band_height).astype("int64"), 0, self.bands - 1)
+
+    def locate(self, lat, lon):
+        # Indice de l'entité contenant chaque point, -1 en dehors de toutes
+        lat = np.asarray(lat, dtype="float64")
+        lon = np.asarray(lon, dtype="float64")
+        result = np.full(len(lat), -1, dtype="int64")
+        inside_range = np.isfinite(lat) & np.isfinite(lon) & (lat >= self.ymin)
+        inside_range &= lat <= self.ymin + self.bands * self.band_height
+        positions = np.flatnonzero(inside_range)
+        band = self.band_of(lat[positions])
+        order = np.argsort(band, kind="stable")
+        positions, band = positions[order], band[order]
+        bounds = np.searchsorted(band, np.arange(self.bands + 1))
+
+        for b in np.unique(band):
+            edges = self.band_edges[self.band_starts[b]:self.band_starts[b + 1]]
+            if not len(edges):
+                continue
+            x0, y0, x1, y1 = self.x0[edges], self.y0[edges], self.x1[edges], self.y1[edges]
+            onehot = np.zeros((len(edges), len(self.names)), dtype="float32")
+            onehot[np.arange(len(edges)), self.owner[edges]] = 1
+            points = positions[bounds[b]:bounds[b + 1]]
+            step = max(1, MAX_TEST_CELLS // len(edges))
+            for start in range(0, len(points), step):
+                chunk = points[start:start + step]
+                py, px = lat[chunk, None], lon[chunk, None]
+                crosses = ((y0 > py) != (y1 > py)) & (px < x0 + (py - y0) * (x1 - x0) / (y1 - y0))
+                inside = (crosses.astype("float32") @ onehot) % 2 == 1
+                result[chunk] = np.where(inside.any(axis=1), inside.argmax(axis=1), -1)
+        return result
+
+    def assign(self, lat, lon):
+        # Nom (propriété `key`) de l'entité contenant chaque point, None en dehors
+        names = np.array(self.names + [None], dtype=object)
+        return names[self.locate(lat, lon)]
+
+
+def assign_regions(df, geojson=None, column="region"):
+    # Région déduite des coordonnées ; le libellé de l'API n'est gardé que hors des contours
+    # (outre-mer, coordonnées en mer) ou si les contours sont indisponibles
+    if df is None or df.empty or "lat" not in df.columns:
+        return df
+    if geojson is None:
+        import requests
+
+        from scripts import geo
+
+        try:
+            geojson = geo.regions_geojson(zoom=ASSIGN_ZOOM)
+        except (requests.RequestException, OSError) as e:
+            print(f"Régions : contours indisponibles ({e}), libellés de l'API conservés")
+            return df
+
+    names = PolygonIndex(geojson).assign(df["lat"].to_numpy(dtype="float64"), df["lon"].to_numpy(dtype="float64"))
+    found = pd.notna(names)
+    current = df[column].astype("object").to_numpy() if column in df.columns else np.full(len(df), None, dtype=object)
+    changed = found & (names != current)
+    print(f"Régions : {changed.sum()} bornes réaffectées d'après leurs coordonnées, {(~found).sum()} hors contours")
+    regions = pd.Series(np.where(found, names, current), index=df.index, dtype="object")
+    return df.assign(**{column: regions.astype("category")})
@@ -0,0 +1,189 @@
+import argparse
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from scripts import metrics, preprocess
+
+# Stockage optionnel des jeux nettoyés en Parquet partitionné (region / year), interrogé en SQL
+# par DuckDB : l'application ne garde en mémoire que les lignes filtrées et agrégées qu'elle affiche.
+BACKEND = os.environ.get("ODRE_STORAGE", "memory")    # "memory" (frames pandas) ou "duckdb"
+STORE_DIR = Path(os.environ.get("ODRE_STORE_DIR", "data/store"))
+
+# Table -> colonne de date dont l'année sert de second niveau de partition
+PARTITION_DATES = {
+    "monthly_production": "mois",
+    "facilities": "date_mise_en_service",
+    "ev_charging": "date_maj",
+    "annual_consumption": "année",
+}
+
+_connection = None
+_lock = threading.Lock()
+
+
+def enabled():
+    return BACKEND == "duckdb"
+
+
+def import_duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise ImportError("Le stockage ODRE_STORAGE=duckdb nécessite le paquet duckdb (pip install duckdb)") from e
+    return duckdb
+
+
+def table_dir(name):
+    return Path(STORE_DIR) / name
+
+
+def table_glob(name):
+    return (table_dir(name) / "**" / "*.parquet").as_posix()
+
+
+def create_view(con, name):
+    path = table_glob(name).replace("'", "''")
+    con.execute(
+        f"CREATE OR REPLACE VIEW \"{name}\" AS SELECT * FROM read_parquet('{path}', hive_partitioning = true, "
+        "hive_types = {'region': VARCHAR, 'year': INTEGER})"
+    )
+
+
+def get_connection():
+    # Connexion en mémoire unique, une vue par table déjà écrite sur disque ;
+    # chaque requête passe par un curseur (un par thread Streamlit)
+    global _connection
+    with _lock:
+        if _connection is None:
+            _connection = import_duckdb().connect()
+            for name in PARTITION_DATES:
+                if has_table(name):
+                    create_view(_connection, name)
+        return _connection
+
+
+def write_table(name, df):
+    # Réécrit la table entière dans un répertoire temporaire, puis remplace l'ancienne version
+    target = table_dir(name)
+    tmp = target.with_name(target.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    date_column = PARTITION_DATES.get(name)
+    dates = df[date_column] if date_column in df.columns else pd.Series(None, index=df.index, dtype=object)
+    frame = df.assign(year=pd.to_datetime(dates, errors="coerce").dt.year.astype("Int32"))
+    con = get_connection().cursor()
+    try:
+        con.register("frame", frame)
+        con.execute(
+            f"COPY frame TO '{tmp.as_posix()}' (FORMAT PARQUET, PARTITION_BY (region, year))"
+        )
+        con.unregister("frame")
+    finally:
+        con.close()
+
+    old = target.with_name(target.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if target.exists():
+        target.replace(old)
+    tmp.replace(target)
+    shutil.rmtree(old, ignore_errors=True)
+
+    con = get_connection().cursor()
+    try:
+        create_view(con, name)
+    finally:
+        con.close()
+    print(f"Store {name} : {len(df)} lignes -> {target}")
+
+
+def write_all(clean_data):
+    for name, df in clean_data.items():
+        if df is not None and not df.empty and "region" in df.columns:
+            write_table(name, df)
+
+
+def has_table(name):
+    return any(table_dir(name).glob("**/*.parquet"))
+
+
+def query(sql, params=None):
+    con = get_connection().cursor()
+    try:
+        return con.execute(sql, params or []).df()
+    finally:
+        con.close()
+
+
+def read(name, region=None, columns=None):
+    # Lignes d'une table (colonnes d'origine), éventuellement limitées à une région : seule la
+    # partition correspondante est lue
+    if not has_table(name):
+        return None
+    select = ", ".join(f'"{col}"' for col in columns) if columns else "* EXCLUDE (year)"
+    if region is None:
+        df = query(f'SELECT {select} FROM "{name}"')
+    else:
+        df = query(f'SELECT {select} FROM "{name}" WHERE region = ?', [region])
+    return preprocess.compact_dtypes(df)
+
+
+def regions(name):
+    if not has_table(name):
+        return []
+    return query(f'SELECT DISTINCT region FROM "{name}" WHERE region IS NOT NULL ORDER BY region')["region"].tolist()
+
+
+@metrics.instrument("aggregate_duckdb")
+def build_cube():
+    # Même structure que aggregates.build_cube, calculée par DuckDB sur les fichiers Parquet
+    cube = {
+        "production": pd.DataFrame(columns=["production_GWh"]),
+        "consumption": pd.DataFrame(columns=["conso_elec_GWh", "conso_gaz_GWh", "conso_totale_GWh"]),
+        "bornes": pd.DataFrame(columns=["n_bornes"]),
+    }
+    if has_table("monthly_production"):
+        cube["production"] = query(
+            'SELECT region, year, CAST(month(mois) AS INTEGER) AS month, filiere, '
+            'sum(CAST("production_GWh" AS DOUBLE)) AS "production_GWh" '
+            'FROM "monthly_production" WHERE region IS NOT NULL AND mois IS NOT NULL GROUP BY ALL ORDER BY ALL'
+        ).set_index(["region", "year", "month", "filiere"])
+    if has_table("annual_consumption"):
+        cube["consumption"] = query(
+            'SELECT region, year, sum(CAST("conso_elec_GWh" AS DOUBLE)) AS "conso_elec_GWh", '
+            'sum(CAST("conso_gaz_GWh" AS DOUBLE)) AS "conso_gaz_GWh", '
+            'sum(CAST("conso_totale_GWh" AS DOUBLE)) AS "conso_totale_GWh" '
+            'FROM "annual_consumption" WHERE region IS NOT NULL AND year IS NOT NULL GROUP BY ALL ORDER BY ALL'
+        ).set_index(["region", "year"])
+    if has_table("ev_charging"):
+        cube["bornes"] = query(
+            'SELECT region, year, count(*) AS n_bornes FROM "ev_charging" '
+            "WHERE region IS NOT NULL AND year IS NOT NULL GROUP BY ALL ORDER BY ALL"
+        ).set_index(["region", "year"])
+    return cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stockage Parquet partitionné + DuckDB des jeux nettoyés")
+    sub = parser.add_subparsers(dest="command", required=True)
+    write = sub.add_parser("write", help="charge, nettoie et écrit les 4 jeux de données")
+    write.add_argument("--mode", default="records", choices=["records", "csv", "parquet"])
+    write.add_argument("--refresh", action="store_true")
+    sql = sub.add_parser("sql", help="exécute une requête SQL sur les tables du stockage")
+    sql.add_argument("query")
+    args = parser.parse_args(argv)
+
+    if args.command == "write":
+        from scripts import load_data
+
+        write_all(load_data.load_all_clean(mode=args.mode, refresh=args.refresh))
+    elif args.command == "sql":
+        print(query(args.query).to_string())
+
+
+if __name__ == "__main__":
+    main()
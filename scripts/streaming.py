@@ -0,0 +1,177 @@
+import argparse
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from scripts import aggregates, load_data, metrics
+
+# Mode flux : les pages (ou blocs d'export) traversent le nettoyage par morceaux de CHUNK_ROWS
+# lignes et sont aussitôt écrits dans des puits (fichier Parquet, cube d'agrégats). Le pic mémoire
+# dépend de la taille des morceaux, plus de celle du jeu de données.
+CHUNK_ROWS = int(os.environ.get("ODRE_STREAM_CHUNK_ROWS", 50_000))
+STREAM_DIR = Path(os.environ.get("ODRE_STREAM_DIR", "data/stream"))
+
+# Table du cube -> (jeu nettoyé source, constructeur) ; chaque table est une somme, donc
+# décomposable : somme des cubes partiels = cube du jeu complet
+CUBE_SOURCES = aggregates.CUBE_SOURCES
+
+
+def iter_raw_chunks(endpoint, mode="records", params=None, chunk_rows=CHUNK_ROWS):
+    # mode "records" : pages /records regroupées ; "csv" / "parquet" : export lu par blocs depuis le disque
+    if mode == "records":
+        buffer = []
+        for results in load_data.iter_api_pages(endpoint, params=params):
+            buffer.extend(results)
+            if len(buffer) >= chunk_rows:
+                yield pd.DataFrame.from_records(buffer)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame.from_records(buffer)
+    else:
+        path = load_data.download_export(endpoint, fmt=mode, params=params)
+        yield from load_data.iter_export_chunks(path, fmt=mode, chunksize=chunk_rows)
+
+
+def iter_clean_chunks(name, mode="records", chunk_rows=CHUNK_ROWS, query=None):
+    query = query or load_data.DEFAULT_QUERIES.get(name)
+    mode = load_data.dataset_mode(name, mode)
+    clean = load_data.CLEANERS[name]
+    for raw in iter_raw_chunks(load_data.DATASETS[name], mode, query.to_params() if query else None, chunk_rows):
+        df = clean(raw)
+        if df is not None and not df.empty:
+            yield df
+
+
+def stable_schema(schema):
+    # Les catégories d'un morceau à l'autre n'ont ni les mêmes valeurs ni la même largeur d'index :
+    # on fixe des index int32 pour que tous les morceaux partagent le schéma du fichier
+    import pyarrow as pa
+
+    fields = [
+        field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        if pa.types.is_dictionary(field.type) else field
+        for field in schema
+    ]
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class ParquetSink:
+    # Un groupe de lignes Parquet par morceau, écrit dans <path>.part puis renommé à la fermeture
+    def __init__(self, path):
+        self.path = Path(path)
+        self.part_path = self.path.with_name(self.path.name + ".part")
+        self.writer = None
+        self.schema = None
+        self.rows = 0
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.schema = stable_schema(table.schema)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(self.part_path, self.schema)
+        self.writer.write_table(table.cast(self.schema))
+        self.rows += len(df)
+
+    def close(self):
+        if self.writer is None:
+            return None
+        self.writer.close()
+        self.writer = None
+        self.part_path.replace(self.path)
+        return self.path
+
+    def abort(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.part_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class CubeSink:
+    # Accumule les cubes partiels de chaque morceau ; fusion régulière pour borner leur nombre
+    def __init__(self, builder, merge_every=16):
+        self.builder = builder
+        self.merge_every = merge_every
+        self.partials = []
+
+    def write(self, df):
+        partial = self.builder(df)
+        if not partial.empty:
+            self.partials.append(partial)
+        if len(self.partials) >= self.merge_every:
+            self.partials = [self.merge()]
+
+    def merge(self):
+        if len(self.partials) == 1:
+            return self.partials[0]
+        merged = pd.concat(self.partials)
+        levels = list(range(merged.index.nlevels))
+        return merged.groupby(level=levels, observed=True).sum(min_count=1)
+
+    def result(self):
+        if not self.partials:
+            return self.builder(None)
+        return self.merge().sort_index()
+
+
+def stream_dataset(name, sinks, mode="records", chunk_rows=CHUNK_ROWS, query=None):
+    with metrics.stage("stream", http=load_data.DATASETS[name], dataset=name, mode=mode, chunk_rows=chunk_rows) as record:
+        rows = chunks = 0
+        for df in iter_clean_chunks(name, mode, chunk_rows, query):
+            for sink in sinks:
+                sink.write(df)
+            rows += len(df)
+            chunks += 1
+        record.rows(rows_out=rows)
+        record["chunks"] = chunks
+    print(f"Flux {name} : {rows} lignes nettoyées en {chunks} morceaux")
+    return rows
+
+
+def stream_all(out_dir=None, mode="records", chunk_rows=CHUNK_ROWS, names=None):
+    # <out_dir>/<jeu>.parquet pour chaque jeu nettoyé, <out_dir>/cube/<table>.parquet pour le cube
+    out_dir = Path(out_dir or STREAM_DIR)
+    cube_sinks = {table: CubeSink(builder) for table, (_, builder) in CUBE_SOURCES.items()}
+    for name in names or load_data.DATASETS:
+        with ParquetSink(out_dir / f"{name}.parquet") as parquet_sink:
+            sinks = [parquet_sink]
+            sinks += [cube_sinks[table] for table, (source, _) in CUBE_SOURCES.items() if source == name]
+            stream_dataset(name, sinks, mode=mode, chunk_rows=chunk_rows)
+
+    cube = {table: sink.result() for table, sink in cube_sinks.items()}
+    (out_dir / "cube").mkdir(parents=True, exist_ok=True)
+    for table, df in cube.items():
+        df.to_parquet(out_dir / "cube" / f"{table}.parquet")
+    return cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chargement et nettoyage en flux, mémoire bornée par la taille des morceaux")
+    parser.add_argument("--datasets", nargs="+", choices=list(load_data.DATASETS), default=None,
+                        help="jeux à traiter (défaut : tous)")
+    parser.add_argument("--mode", default="records", choices=["records", "csv", "parquet"])
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--out", default=None, help=f"répertoire de sortie (défaut : {STREAM_DIR})")
+    args = parser.parse_args(argv)
+
+    cube = stream_all(args.out, mode=args.mode, chunk_rows=args.chunk_rows, names=args.datasets)
+    for table, df in cube.items():
+        print(f"cube {table} : {len(df)} lignes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import pytest
+
+from scripts import cache, metrics
+
+
+@pytest.fixture(autouse=True)
+def quiet_metrics():
+    metrics.logger.disabled = True
+    yield
+    metrics.logger.disabled = False
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    # Cache disque vide, propre à chaque test
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    return cache.CACHE_DIR
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    # Serveur ODRE local ; renvoie la classe de handler (jeux servis et date "modified" modifiables)
+    from benchmarks import odre_stub
+    from scripts import load_data
+
+    server, base_url = odre_stub.serve(datasets={})
+    monkeypatch.setattr(load_data, "BASE_URL", base_url)
+    yield server.RequestHandlerClass
+    server.shutdown()
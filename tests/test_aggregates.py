@@ -0,0 +1,132 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub
+from scripts import aggregates, load_data
+
+REGIONS = len(odre_stub.REGIONS)
+
+# Références : regroupements que faisait l'application avant le cube, sur les jeux nettoyés
+
+
+@pytest.fixture(scope="module")
+def clean():
+    records = {
+        "monthly_production": odre_stub.monthly_production_records(36 * REGIONS),
+        "annual_consumption": odre_stub.annual_consumption_records(6 * REGIONS),
+        "ev_charging": odre_stub.ev_charging_records(3000),
+    }
+    return {name: load_data.CLEANERS[name](pd.DataFrame.from_records(rows)) for name, rows in records.items()}
+
+
+@pytest.fixture(scope="module")
+def cube(clean):
+    return aggregates.build_cube(clean)
+
+
+@pytest.fixture(scope="module")
+def prod(clean):
+    df = clean["monthly_production"].astype({"region": str, "filiere": str, "production_GWh": "float64"})
+    return df.assign(year=df["mois"].dt.year)
+
+
+@pytest.fixture(scope="module")
+def annual(clean):
+    df = clean["annual_consumption"].astype({"region": str})
+    return df.assign(year=df["année"].dt.year)
+
+
+def test_build_cube_matches_builders(clean, cube):
+    assert set(cube) == set(aggregates.CUBE_SOURCES)
+    for table, (source, builder) in aggregates.CUBE_SOURCES.items():
+        tm.assert_frame_equal(cube[table], builder(clean[source]))
+    empty = aggregates.build_cube({})
+    assert all(df.empty for df in empty.values())
+
+
+def test_lazy_cube_loads_each_table_once_on_access(cube):
+    calls = []
+
+    def loader(table):
+        calls.append(table)
+        return cube[table]
+
+    lazy = aggregates.LazyCube(loader)
+    assert calls == []
+    assert lazy["production"] is cube["production"]
+    assert lazy["production"] is cube["production"]
+    assert aggregates.regions(lazy, "consumption") == sorted(odre_stub.REGIONS)
+    assert calls == ["production", "consumption"]
+
+
+def test_monthly_mix_matches_groupby(prod, cube):
+    region = odre_stub.REGIONS[3]
+    year = int(prod["year"].max())
+    pct, filiere_total = aggregates.monthly_mix(cube, region, year)
+
+    year_data = prod[(prod["region"] == region) & (prod["year"] == year)]
+    year_data = year_data.assign(month=year_data["mois"].dt.strftime("%Y-%m"))
+    monthly_total = year_data.groupby("month")["production_GWh"].sum().reset_index(name="total")
+    merged = pd.merge(year_data, monthly_total, on="month")
+    merged["production_pct"] = (merged["production_GWh"] / merged["total"] * 100).round(2)
+    expected = (merged.groupby(["month", "filiere"])["production_pct"].mean().reset_index()
+                .pivot(index="month", columns="filiere", values="production_pct").fillna(0))
+    result = pct.rename(columns=str)
+    result.columns.name = "filiere"
+    tm.assert_frame_equal(result[expected.columns], expected, atol=0.01)
+
+    expected_total = year_data.groupby("filiere")["production_GWh"].sum()
+    result_total = filiere_total.assign(filiere=filiere_total["filiere"].astype(str)).set_index("filiere")
+    tm.assert_series_equal(result_total["production_GWh"].sort_index(), expected_total.sort_index(), rtol=1e-9)
+    assert result_total["%"].sum() == pytest.approx(100, abs=0.05)
+    assert aggregates.production_years(cube, region) == sorted(prod.loc[prod["region"] == region, "year"].unique(), reverse=True)
+
+
+def test_annual_production_matches_groupby(prod, cube):
+    selected = list(odre_stub.REGIONS[:3])
+    expected = (prod[prod["region"].isin(selected)].groupby(["year", "region"])["production_GWh"].sum()
+                .rename("prod_GWh").reset_index())
+    result = aggregates.annual_production(cube, selected)
+    result = result.assign(region=result["region"].astype(str)).reset_index(drop=True)
+    tm.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_production_gap_matches_merge(prod, annual, cube):
+    selected = list(odre_stub.REGIONS[2:6])
+    df_conso = annual[annual["region"].isin(selected)]
+    df_prod_grouped = (prod[prod["region"].isin(selected)].groupby(["year", "region"])["production_GWh"].sum()
+                       .reset_index().rename(columns={"production_GWh": "prod_GWh"}))
+    expected = pd.merge(
+        df_conso.groupby(["year", "region"])["conso_elec_GWh"].sum().reset_index(),
+        df_prod_grouped, on=["year", "region"], how="inner",
+    )
+    expected["écart_GWh"] = expected["prod_GWh"] - expected["conso_elec_GWh"]
+    assert len(expected) > len(selected)
+
+    result = aggregates.production_gap(cube, selected)
+    result = result.assign(region=result["region"].astype(str))
+    key = ["year", "region"]
+    tm.assert_frame_equal(result.sort_values(key).reset_index(drop=True),
+                          expected.sort_values(key).reset_index(drop=True), check_dtype=False)
+
+
+def test_regional_means_match_groupby(prod, annual, cube):
+    conso, production = aggregates.regional_means(cube)
+    expected_conso = annual.groupby("region")["conso_elec_GWh"].mean()
+    expected_prod = prod.groupby(["region", "year"])["production_GWh"].sum().groupby("region").mean()
+    assert conso == pytest.approx(expected_conso.to_dict())
+    assert production == pytest.approx(expected_prod.to_dict())
+
+
+def test_bornes_per_year_matches_groupby(clean, cube):
+    ev = clean["ev_charging"].astype({"region": str})
+    ev = ev.assign(annee_installation=pd.to_datetime(ev["date_maj"], errors="coerce").dt.year)
+    expected = ev.groupby(["region", "annee_installation"]).size().reset_index(name="n_bornes")
+    expected = expected.dropna(subset=["annee_installation"])
+    expected = expected[expected["annee_installation"] >= 2010].reset_index(drop=True)
+    assert not expected.empty
+
+    result = aggregates.bornes_per_year(cube).rename(columns={"year": "annee_installation"})
+    result = result.assign(region=result["region"].astype(str)).reset_index(drop=True)
+    tm.assert_frame_equal(result, expected, check_dtype=False)
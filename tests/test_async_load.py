@@ -0,0 +1,116 @@
+import threading
+
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub
+from scripts import async_load, cache, load_data
+
+NAME = "annual_consumption"
+REGIONS = len(odre_stub.REGIONS)
+
+
+def test_missing_clean_entry_recleaned_from_fresh_raw(cache_dir, stub):
+    stub.datasets[load_data.DATASETS[NAME]] = odre_stub.annual_consumption_records(120)
+    first, timings = async_load.run_sync(async_load.load_all_async(names=[NAME]))
+    assert timings[NAME]["source"] == "api"
+
+    # Le nettoyé disparaît (éviction, version du nettoyage…), le brut reste frais
+    endpoint, raw_params = load_data.DATASETS[NAME], load_data.dataset_params(NAME)
+    raw_meta = cache.read_meta(endpoint, raw_params, "raw")
+    cache.remove(endpoint, {**raw_params, "raw_fetched_at": raw_meta["fetched_at"]}, "clean")
+
+    second, timings = async_load.run_sync(async_load.load_all_async(names=[NAME]))
+    assert timings[NAME]["source"] == "raw_cache"
+    assert timings[NAME]["requests"] == 0
+    tm.assert_frame_equal(second[NAME], first[NAME])
+
+
+def normalized(df):
+    df = df.astype({col: str for col in df.select_dtypes("category").columns})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("rejected", [False, True])
+def test_sync_pages_go_through_the_fetcher(cache_dir, stub, monkeypatch, rejected):
+    endpoint = load_data.DATASETS[NAME]
+    records = odre_stub.annual_consumption_records(11 * REGIONS, seed=1)
+    stub.datasets[endpoint] = records[:8 * REGIONS]
+    load_data.load_clean(NAME)
+
+    # Nouvelle version publiée, brut périmé : synchronisation incrémentale
+    stub.datasets[endpoint], stub.modified = records, "v2"
+    odre_stub._filtered.clear()
+    params = load_data.dataset_params(NAME)
+    meta = cache.read_meta(endpoint, params, "raw")
+    meta["checked_at"] = 0
+    cache.write_json(cache.entry_paths(endpoint, params, "raw")[1], meta)
+
+    # Aucune page ne doit passer par le pool de threads de load_data (hors limites du Fetcher),
+    # y compris le repli local quand le serveur refuse le "where" de la synchronisation
+    def outside_fetcher(*args, **kwargs):
+        raise AssertionError("pages chargées hors du Fetcher")
+
+    monkeypatch.setattr(load_data, "fetch_api_data", outside_fetcher)
+    if rejected:
+        def reject(where):
+            raise ValueError("where non supporté")
+
+        monkeypatch.setattr(odre_stub, "parse_where", reject)
+
+    data, timings = async_load.run_sync(async_load.load_all_async(names=[NAME]))
+    assert timings[NAME]["source"] == "sync"
+    # Page récente (ou requête refusée puis deux pages du jeu complet) et date "modified"
+    assert timings[NAME]["requests"] == (4 if rejected else 2)
+    expected = load_data.CLEANERS[NAME](pd.DataFrame.from_records(records))
+    tm.assert_frame_equal(normalized(data[NAME]), normalized(expected), check_dtype=False)
+
+
+class BlockingLoad:
+    # load(names) enregistrant chaque lot ; le premier lot attend `release` pour simuler un
+    # chargement long pendant lequel l'application demande un autre jeu
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+
+    def __call__(self, names):
+        self.batches.append(list(names))
+        if len(self.batches) == 1:
+            self.release.wait(5)
+        return {name: name.upper() for name in names}
+
+
+def test_loader_prefetches_remaining_datasets_in_one_batch():
+    load = BlockingLoad()
+    loader = async_load.DatasetLoader(load)
+    loader.prefetch(["a"])
+    loader.prefetch(["a", "b", "c"])
+
+    # "c" est demandé pendant le chargement de "a" : il quitte le lot et se charge tout de suite
+    assert loader.get("c") == "C"
+    load.release.set()
+    assert loader.get("a") == "A"
+    assert loader.get("b") == "B"
+    loader.close()
+    assert load.batches == [["a"], ["c"], ["b"]]
+    assert len({loader.version(name) for name in "abc"}) == 3
+
+
+def test_loader_retries_failed_batch_inline():
+    calls = []
+
+    def load(names):
+        calls.append(list(names))
+        if len(calls) == 1:
+            raise OSError("hôte injoignable")
+        return {name: len(calls) for name in names}
+
+    loader = async_load.DatasetLoader(load)
+    loader.prefetch(["a", "b"])
+    loader.executor.submit(lambda: None).result()
+    assert not loader.ready("a")
+    assert loader.get("a") == 2
+    assert loader.get("b") == 3
+    loader.close()
+    assert calls == [["a", "b"], ["a"], ["b"]]
@@ -0,0 +1,163 @@
+import os
+
+import pandas as pd
+import pandas.testing as tm
+
+from scripts import cache
+
+PARAMS = {"mode": "records"}
+
+
+class Source:
+    # Jeu distant simulé : nombre de téléchargements et date "modified" du catalogue
+    def __init__(self, modified="v1"):
+        self.modified = modified
+        self.fetches = 0
+        self.checks = 0
+
+    def fetch(self):
+        self.fetches += 1
+        return pd.DataFrame({"region": ["Bretagne", "Normandie"], "value": [self.fetches, 2.5]})
+
+    def modified_fn(self):
+        self.checks += 1
+        return self.modified
+
+
+def get(source, ttl=3600, **kwargs):
+    return cache.get_or_fetch("ds", PARAMS, "raw", source.fetch, ttl=ttl, modified_fn=source.modified_fn, **kwargs)
+
+
+def age_entry(seconds, kind="raw", dataset="ds", params=PARAMS):
+    # Recule checked_at et last_access comme si l'entrée avait été vérifiée il y a `seconds`
+    meta = cache.read_meta(dataset, params, kind)
+    meta["checked_at"] -= seconds
+    meta["last_access"] -= seconds
+    cache.write_json(cache.entry_paths(dataset, params, kind)[1], meta)
+
+
+def test_roundtrip_and_metadata(cache_dir):
+    df = pd.DataFrame({"a": [1, 2, 3], "b": ["x", "y", None]})
+    meta = cache.save("ds", PARAMS, "raw", df, modified="v1", extra={"high_water_mark": "2024-01-01"})
+    assert meta["rows"] == 3 and meta["format"] == "parquet"
+    tm.assert_frame_equal(cache.load("ds", PARAMS, "raw"), df)
+    assert cache.read_meta("ds", PARAMS, "raw")["high_water_mark"] == "2024-01-01"
+    assert cache.load("ds", {"mode": "csv"}, "raw") is None
+
+
+def test_missing_data_file_invalidates_entry(cache_dir):
+    cache.save("ds", PARAMS, "raw", pd.DataFrame({"a": [1]}))
+    cache.entry_paths("ds", PARAMS, "raw")[0].unlink()
+    assert cache.read_meta("ds", PARAMS, "raw") is None
+
+
+def test_fresh_entry_served_without_revalidation(cache_dir):
+    source = Source()
+    first = get(source)
+    second = get(source)
+    tm.assert_frame_equal(first, second)
+    assert source.fetches == 1
+    # Seul le téléchargement a lu "modified" (pour l'enregistrer) : pas de revalidation sous le TTL
+    assert source.checks == 1
+
+
+def test_expired_entry_revalidated_when_unmodified(cache_dir):
+    source = Source()
+    get(source)
+    age_entry(7200)
+    before = cache.read_meta("ds", PARAMS, "raw")["checked_at"]
+
+    get(source)
+    assert source.fetches == 1
+    assert source.checks == 2
+    assert cache.read_meta("ds", PARAMS, "raw")["checked_at"] > before
+
+    # checked_at remis à jour : pas de nouvelle vérification avant l'expiration suivante
+    get(source)
+    assert source.checks == 2
+
+
+def test_expired_entry_refetched_when_modified(cache_dir):
+    source = Source()
+    get(source)
+    age_entry(7200)
+    source.modified = "v2"
+
+    df = get(source)
+    assert source.fetches == 2
+    assert df["value"].iloc[0] == 2
+    assert cache.read_meta("ds", PARAMS, "raw")["modified"] == "v2"
+
+
+def test_expired_entry_refetched_without_validator(cache_dir):
+    source = Source(modified=None)
+    get(source)
+    age_entry(7200)
+    get(source)
+    assert source.fetches == 2
+
+
+def test_unreachable_api_serves_local_copy(cache_dir):
+    source = Source()
+    get(source)
+    age_entry(7200)
+
+    def unreachable():
+        raise ConnectionError("hors ligne")
+
+    df = cache.get_or_fetch("ds", PARAMS, "raw", source.fetch, ttl=3600, modified_fn=unreachable)
+    assert source.fetches == 1
+    assert df["value"].iloc[0] == 1
+
+
+def test_refresh_bypasses_fresh_entry(cache_dir):
+    source = Source()
+    get(source)
+    get(source, refresh=True)
+    assert source.fetches == 2
+
+
+def test_pickle_fallback_for_mixed_columns(cache_dir):
+    df = pd.DataFrame({"geo": [{"lat": 1.0}, "48.1, 2.3"]})
+    meta = cache.save("ds", PARAMS, "raw", df)
+    assert meta["format"] == "pickle"
+    assert cache.load("ds", PARAMS, "raw")["geo"].tolist() == df["geo"].tolist()
+
+
+def entry_size(dataset, kind="raw"):
+    data_path, meta_path = cache.entry_paths(dataset, PARAMS, kind)
+    return data_path.stat().st_size + meta_path.stat().st_size
+
+
+def test_eviction_removes_least_recently_used(cache_dir):
+    frame = pd.DataFrame({"value": range(1000)})
+    for dataset in ("old", "used", "new"):
+        cache.save(dataset, PARAMS, "raw", frame)
+    age_entry(300, dataset="old")
+    age_entry(200, dataset="used")
+    age_entry(100, dataset="new")
+    cache.load("used", PARAMS, "raw")          # lecture : "used" devient la plus récente
+
+    sizes = {dataset: entry_size(dataset) for dataset in ("old", "used", "new")}
+    removed = cache.evict(max_bytes=sizes["used"] + sizes["new"])
+    assert removed == 1
+    assert cache.read_meta("old", PARAMS, "raw") is None
+    assert cache.read_meta("used", PARAMS, "raw") is not None
+    assert cache.read_meta("new", PARAMS, "raw") is not None
+
+    removed = cache.evict(max_bytes=sizes["used"])
+    assert removed == 1
+    assert cache.read_meta("new", PARAMS, "raw") is None
+    assert cache.read_meta("used", PARAMS, "raw") is not None
+
+
+def test_eviction_noop_under_budget(cache_dir):
+    cache.save("ds", PARAMS, "raw", pd.DataFrame({"value": range(10)}))
+    assert cache.evict(max_bytes=10 ** 9) == 0
+    assert cache.read_meta("ds", PARAMS, "raw") is not None
+
+
+def test_writes_are_atomic(cache_dir):
+    cache.save("ds", PARAMS, "raw", pd.DataFrame({"value": range(10)}))
+    leftovers = [name for _, _, files in os.walk(cache_dir) for name in files if name.endswith(".tmp")]
+    assert leftovers == []
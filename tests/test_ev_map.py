@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub
+from scripts import ev_map, load_data, spatial
+
+
+@pytest.fixture(scope="module")
+def bornes():
+    records = odre_stub.ev_charging_records(5000)
+    return load_data.CLEANERS["ev_charging"](pd.DataFrame.from_records(records))
+
+
+@pytest.mark.parametrize("zoom", [5, 8, 11, 13])
+def test_grid_clusters_conserve_counts_and_means(bornes, zoom):
+    clusters = ev_map.grid_clusters(bornes, zoom)
+    assert clusters["n_bornes"].sum() == len(bornes)
+    weights = clusters["n_bornes"]
+    assert (clusters["lat"] * weights).sum() / weights.sum() == pytest.approx(bornes["lat"].astype("float64").mean())
+    assert (clusters["lon"] * weights).sum() / weights.sum() == pytest.approx(bornes["lon"].astype("float64").mean())
+    # Un cluster par cellule occupée, son centroïde dans la cellule
+    size = ev_map.cell_size(zoom)
+    cells = np.floor(bornes[["lon", "lat"]].astype("float64").to_numpy() / size)
+    centroid_cells = np.floor(clusters[["lon", "lat"]].to_numpy() / size)
+    assert len(clusters) == len(np.unique(cells, axis=0)) == len(np.unique(centroid_cells, axis=0))
+    assert clusters["n_bornes"].min() >= 1
+
+
+def test_cluster_levels_nest(bornes):
+    levels = ev_map.cluster_levels(bornes)
+    assert sorted(levels) == list(range(5, ev_map.DETAIL_ZOOM))
+    counts = [len(levels[zoom]) for zoom in sorted(levels)]
+    # Les cellules d'un niveau sont l'union de celles du niveau suivant (taille divisée par 2)
+    assert counts == sorted(counts)
+    assert all(levels[zoom]["n_bornes"].sum() == len(bornes) for zoom in levels)
+
+
+def test_grid_clusters_empty():
+    empty = pd.DataFrame(columns=["lat", "lon", "puissance_kW"])
+    assert ev_map.grid_clusters(empty, 8).empty
+
+
+BOXES = [
+    ((45.0, 0.0), (47.0, 3.0)),
+    ((48.5, -4.5), (48.9, -3.9)),
+    ((10.0, 10.0), (11.0, 11.0)),        # hors du territoire : vide
+]
+
+
+@pytest.mark.parametrize("bounds", BOXES)
+@pytest.mark.parametrize("margin", [0.0, 0.1])
+def test_in_viewport_matches_brute_force(bornes, bounds, margin):
+    (south, west), (north, east) = bounds
+    dlat, dlon = (north - south) * margin, (east - west) * margin
+    lat, lon = bornes["lat"].astype("float64"), bornes["lon"].astype("float64")
+    expected = bornes[(lat >= south - dlat) & (lat <= north + dlat) & (lon >= west - dlon) & (lon <= east + dlon)]
+
+    tm.assert_frame_equal(ev_map.in_viewport(bornes, bounds, margin=margin), expected)
+    index = spatial.GridIndex.from_frame(bornes)
+    tm.assert_frame_equal(ev_map.in_viewport(bornes, bounds, margin=margin, index=index), expected)
+
+
+def test_in_viewport_without_bounds_keeps_everything(bornes):
+    assert ev_map.in_viewport(bornes, None) is bornes
+
+
+def test_viewport_from_map_state():
+    state = {"bounds": {"_southWest": {"lat": 45.0, "lng": 1.0}, "_northEast": {"lat": 46.0, "lng": 2.5}}, "zoom": 9}
+    assert ev_map.viewport(state) == (((45.0, 1.0), (46.0, 2.5)), 9)
+    assert ev_map.viewport({"bounds": {"_southWest": {}, "_northEast": {}}, "zoom": 4}) == (None, 4)
+    assert ev_map.viewport(None) == (None, None)
+
+
+def test_grid_map_draws_only_visible_clusters(bornes):
+    bounds = BOXES[0]
+    levels = ev_map.cluster_levels(bornes)
+    fmap = ev_map.build_map(bornes, mode="grid", zoom=8, bounds=bounds, levels=levels)
+    html = fmap.get_root().render()
+    expected = ev_map.in_viewport(levels[8], bounds)
+    assert 0 < len(expected) < len(levels[8])
+    assert html.count("L.circleMarker(") == len(expected)
+
+    with pytest.raises(ValueError):
+        ev_map.build_map(bornes, mode="heatmap")
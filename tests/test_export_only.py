@@ -0,0 +1,49 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub
+from scripts import async_load, load_data
+
+ROWS = 25_000       # au-delà du plafond de 10 000 enregistrements de /records
+RECORDS = {"facilities": odre_stub.facilities_records, "ev_charging": odre_stub.ev_charging_records}
+
+
+@pytest.fixture
+def exports(stub, cache_dir, tmp_path, monkeypatch):
+    monkeypatch.setattr(load_data, "EXPORT_DIR", tmp_path / "exports")
+    for name, records in RECORDS.items():
+        stub.datasets[load_data.DATASETS[name]] = records(ROWS)
+    return stub
+
+
+@pytest.mark.parametrize("name", list(RECORDS))
+def test_large_dataset_loaded_in_full_in_records_mode(exports, name):
+    df = load_data.load_clean(name, mode="records")
+    # Même résultat que le nettoyage de tous les enregistrements servis
+    expected = load_data.CLEANERS[name](pd.DataFrame.from_records(exports.datasets[load_data.DATASETS[name]]))
+    assert len(df) == len(expected) > 10_000
+    column = "puissance_MW" if name == "facilities" else "puissance_kW"
+    assert df[column].astype("float64").sum() == pytest.approx(expected[column].astype("float64").sum(), rel=1e-6)
+
+
+def test_async_loader_uses_the_same_export(exports):
+    data, timings = async_load.run_sync(async_load.load_all_async(names=list(RECORDS)))
+    for name in RECORDS:
+        # Même entrée de cache que le chargeur séquentiel (le cache ne garde pas l'index)
+        cached, source = load_data.fetch_clean(name)
+        assert source == "cache"
+        tm.assert_frame_equal(cached, data[name].reset_index(drop=True))
+
+
+def test_truncated_page_walk_warns(stub, capsys):
+    endpoint = load_data.DATASETS["annual_consumption"]
+    stub.datasets[endpoint] = odre_stub.annual_consumption_records(120)
+
+    pages = list(load_data.iter_api_pages(endpoint, limit=20, max_records=50))
+    assert sum(len(page) for page in pages) == 50
+    assert "tronqué à 50 enregistrements sur 120" in capsys.readouterr().out
+
+    pages = list(load_data.iter_api_pages(endpoint, limit=20, max_records=200))
+    assert sum(len(page) for page in pages) == 120
+    assert "tronqué" not in capsys.readouterr().out
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import facilities, preprocess
+
+# Registre brut (puissances en kW, comme l'API) : cumuls attendus calculés à la main ci-dessous
+RAW = pd.DataFrame.from_records([
+    ("Bretagne", "Solaire", 1500, 3, "2019-06-01"),
+    ("Bretagne", "Solaire", 2500, 1, "2021-01-15"),
+    ("Bretagne", "Eolien", 12000, 2, None),                     # sans date : compté dès 2019
+    ("Bretagne", "Stockage non hydraulique", 200, 1, "2021-09-30"),
+    ("Normandie", "Nucléaire", 1300000, 1, "2020-03-01"),
+    ("Normandie", "Solaire", 500, None, "2020-07-01"),          # nombre absent : 1 installation
+    (None, "Solaire", 1000, 1, "2020-01-01"),                   # sans région : hors des cumuls
+], columns=["region", "filiere", "puismaxinstallee", "nbinstallations", "datemiseenservice"]).assign(
+    departement="Département 1", commune="Commune 1")
+
+
+@pytest.fixture(scope="module")
+def registry():
+    return facilities.build_registry(preprocess.clean_energy_facilities(RAW))
+
+
+def test_clean_converts_kw_to_mw():
+    clean = preprocess.clean_energy_facilities(RAW)
+    np.testing.assert_allclose(clean["puissance_MW"], [1.5, 2.5, 12, 0.2, 1300, 0.5, 1], rtol=1e-6)
+    assert clean["nb_installations"].tolist() == [3, 1, 2, 1, 1, 1, 1]
+
+
+def test_registry_rollups(registry):
+    assert len(registry) == 6 and registry.dropped == 1
+    assert registry.years.tolist() == [2019, 2020, 2021]
+
+    bretagne = registry.capacity_by_year("Bretagne")
+    assert bretagne["Solaire"].tolist() == pytest.approx([1.5, 1.5, 4.0])
+    assert bretagne["Eolien"].tolist() == pytest.approx([12, 12, 12])
+    assert bretagne["Stockage non hydraulique"].tolist() == pytest.approx([0, 0, 0.2])
+    assert bretagne["Nucléaire"].tolist() == [0, 0, 0]
+    assert registry.additions_by_year("Normandie")["Nucléaire"].tolist() == pytest.approx([0, 1300, 0])
+
+    france_2020 = registry.by_filiere(year=2020)
+    assert france_2020["puissance_MW"].to_dict() == pytest.approx(
+        {"Eolien": 12, "Nucléaire": 1300, "Solaire": 2.0, "Stockage non hydraulique": 0})
+    assert france_2020["nb_installations"].to_dict() == {
+        "Eolien": 2, "Nucléaire": 1, "Solaire": 4, "Stockage non hydraulique": 0}
+    assert registry.by_filiere("Bretagne")["nb_installations"]["Solaire"] == 4
+    assert registry.by_region(2019).loc["Normandie"].sum() == 0
+    assert registry.total_capacity() == pytest.approx(1316.7)
+    assert registry.total_capacity("Bretagne", "Solaire", year=2020) == pytest.approx(1.5)
+
+    top = registry.installations("Bretagne", top=2)
+    assert top["puissance_MW"].tolist() == pytest.approx([12, 2.5])
+    assert top["annee_mise_en_service"].isna().tolist() == [True, False]
+
+
+def test_load_factors(registry):
+    production = pd.DataFrame.from_records([
+        ("Normandie", 2020, 1, "nucleaire", 500.0),
+        ("Normandie", 2020, 2, "nucleaire", 500.0),
+        ("Normandie", 2020, 2, "hydraulique", 10.0),            # aucune puissance recensée
+        ("Bretagne", 2021, 6, "solaire", 1.0),
+        ("Bretagne", 2021, 6, "eolienne", 3.0),
+    ], columns=["region", "year", "month", "filiere", "production_GWh"]).set_index(
+        ["region", "year", "month", "filiere"])
+
+    normandie = facilities.load_factors(registry, production, "Normandie")
+    assert normandie[["year", "filiere"]].values.tolist() == [[2020, "nucleaire"]]
+    row = normandie.iloc[0]
+    assert row["heures"] == (31 + 29) * 24
+    assert row["facteur_charge_pct"] == round(1000 * 1000 / (1300 * 1440) * 100, 2)
+
+    bretagne = facilities.load_factors(registry, production, "Bretagne").set_index("filiere")
+    assert bretagne.loc["solaire", "facteur_charge_pct"] == round(1000 / (4 * 720) * 100, 2)
+    assert bretagne.loc["eolienne", "facteur_charge_pct"] == round(3000 / (12 * 720) * 100, 2)
+    assert facilities.load_factors(registry, production, "Corse").empty
@@ -0,0 +1,100 @@
+import copy
+import json
+
+import numpy as np
+import pytest
+
+from benchmarks.bench_geo import synthetic_regions
+from scripts import geo
+
+VERTICES = 500
+
+
+@pytest.fixture
+def regions():
+    return synthetic_regions(VERTICES)
+
+
+@pytest.fixture
+def geo_dir(tmp_path, monkeypatch, regions):
+    monkeypatch.setattr(geo, "GEO_DIR", tmp_path)
+    geo.regions_path().write_text(json.dumps(regions), encoding="utf-8")
+    geo.regions_geojson.cache_clear()
+    yield tmp_path
+    geo.regions_geojson.cache_clear()
+
+
+def rings(geojson):
+    for feature in geojson["features"]:
+        geometry = feature["geometry"]
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        for polygon in polygons:
+            yield from polygon
+
+
+def distance_to_polyline(points, line):
+    # Distance de chaque point au segment le plus proche de la polyligne
+    start, end = line[:-1], line[1:]
+    segment = end - start
+    length2 = np.maximum((segment ** 2).sum(axis=1), 1e-18)
+    t = np.clip(((points[:, None, :] - start) * segment).sum(axis=2) / length2, 0, 1)
+    closest = start + t[..., None] * segment
+    return np.hypot(*(points[:, None, :] - closest).transpose(2, 0, 1)).min(axis=1)
+
+
+@pytest.mark.parametrize("zoom", [5, 7, 9])
+def test_simplified_rings_stay_closed_and_close_to_original(regions, zoom):
+    original = copy.deepcopy(regions)
+    simplified = geo.simplify_geojson(regions, zoom)
+    assert regions == original                     # GeoJSON source non modifié
+
+    tolerance = geo.TOLERANCE_PX * geo.pixel_degrees(zoom)
+    decimals = max(0, int(np.ceil(-np.log10(tolerance))))
+    for before, after in zip(rings(regions), rings(simplified)):
+        after = np.asarray(after)
+        assert after[0].tolist() == after[-1].tolist()
+        assert 4 <= len(after) < len(before)
+        assert not (np.diff(after, axis=0) == 0).all(axis=1).any()      # pas de doublons consécutifs
+        # Écart au contour d'origine : tolérance plus l'arrondi de la quantification
+        assert distance_to_polyline(np.asarray(before), after).max() <= tolerance + 10 ** -decimals
+    for feature in simplified["features"]:
+        assert set(feature["properties"]) == {"nom", "code"}
+
+
+def test_vertex_count_grows_with_zoom(regions):
+    counts = [sum(len(ring) for ring in rings(geo.simplify_geojson(regions, zoom))) for zoom in (4, 6, 8, 10)]
+    assert counts == sorted(counts)
+    assert counts[-1] < VERTICES * len(regions["features"])
+
+
+def test_multipolygon_and_tiny_rings():
+    square = [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]
+    speck = [[5, 5], [5.0000001, 5], [5, 5.0000001], [5, 5]]
+    geometry = {"type": "MultiPolygon", "coordinates": [[square], [speck]]}
+    simplified = geo.simplify_geometry(geometry, tolerance=0.01, decimals=3)
+    # Le carré est gardé tel quel, l'îlot plus petit que la quantification disparaît
+    assert simplified == {"type": "MultiPolygon", "coordinates": [[square]]}
+    point = {"type": "Point", "coordinates": [1, 2]}
+    assert geo.simplify_geometry(point, 0.01, 3) is point
+
+
+def test_regions_geojson_cached_on_disk(geo_dir, regions):
+    first = geo.regions_geojson(6)
+    cached = geo_dir / "regions-z6.geojson"
+    assert json.loads(cached.read_text(encoding="utf-8")) == first
+    assert geo.regions_geojson(6) is first
+
+    # Nouveau processus : relu depuis le disque, sans resimplifier
+    geo.regions_geojson.cache_clear()
+    geo.regions_path().write_text(json.dumps(regions), encoding="utf-8")
+    cached.touch()
+    assert geo.regions_geojson(6) == first
+
+
+def test_choropleth_leaves_shared_geojson_untouched(geo_dir):
+    shared = geo.regions_geojson(5)
+    original = copy.deepcopy(shared)
+    values = {feature["properties"]["nom"]: float(i) for i, feature in enumerate(shared["features"])}
+    html = geo.create_choropleth(values, "Consommation (GWh)", "Reds").get_root().render()
+    assert "Consommation (GWh)" in html
+    assert shared == original
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks import live_replay
+from scripts import live
+
+COLUMNS = ["a", "b"]
+
+
+class Model:
+    # Référence : dict horodatage -> valeurs, dont on garde les `capacity` plus récents
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.points = {}
+
+    def extend(self, times, values):
+        oldest = min(self.points) if self.points else None
+        latest = max(self.points) if self.points else None
+        added = 0
+        for t, v in zip(times, values):
+            if latest is not None and t <= latest:
+                if t in self.points:
+                    self.points[t] = v
+                continue
+            self.points[t] = v
+            added += 1
+        for t in sorted(self.points)[:-self.capacity]:
+            del self.points[t]
+        return added
+
+    def frame(self):
+        times = sorted(self.points)
+        index = pd.DatetimeIndex(np.array(times, dtype="int64"), tz="UTC", name=live.TIME_FIELD)
+        return pd.DataFrame([self.points[t] for t in times], index=index, columns=COLUMNS, dtype="float64")
+
+
+@pytest.mark.parametrize("capacity", [1, 5, 96])
+def test_ring_buffer_matches_model(capacity):
+    rng = np.random.default_rng(capacity)
+    buffer, model = live.RingBuffer(capacity, COLUMNS), Model(capacity)
+    now = 0
+    for _ in range(200):
+        # Lot : révisions de points récents (ou déjà écrasés), puis nouveaux points croissants
+        revised = [now - step for step in rng.integers(0, 3 * capacity + 2, rng.integers(0, 4))]
+        fresh = list(now + np.cumsum(rng.integers(1, 4, rng.integers(0, 2 * capacity + 3))))
+        times = np.array(sorted(set(revised) - {0}) + fresh, dtype="int64") if (revised or fresh) else np.empty(0, "int64")
+        values = rng.normal(size=(len(times), len(COLUMNS)))
+        assert buffer.extend(times, values) == model.extend(times.tolist(), values.tolist())
+        if fresh:
+            now = int(fresh[-1])
+        assert len(buffer) == len(model.points)
+        pd.testing.assert_frame_equal(buffer.frame(), model.frame())
+        assert buffer.last_time == (max(model.points) if model.points else None)
+
+
+def test_ring_buffer_batch_larger_than_capacity():
+    buffer = live.RingBuffer(3, COLUMNS)
+    assert buffer.extend(np.arange(1, 11), np.arange(20, dtype="float64").reshape(10, 2)) == 10
+    assert buffer.frame().index.asi8.tolist() == [8, 9, 10]
+    assert buffer.frame()["a"].tolist() == [14.0, 16.0, 18.0]
+
+
+@pytest.fixture
+def replay():
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+    records = live_replay.eco2mix_records(start, days=1)
+    server, url, clock = live_replay.serve_replay(records, start=start + timedelta(hours=12))
+    clock.speed = 0             # horloge arrêtée, avancée à la main
+    yield records, url, clock
+    server.shutdown()
+
+
+def published(records, region, until, since):
+    rows = [r for r in records if r[live.REGION_FIELD] == region
+            and since <= pd.Timestamp(r[live.TIME_FIELD]) <= until]
+    return pd.Series([float(r["consommation"]) for r in rows],
+                     index=pd.DatetimeIndex([r[live.TIME_FIELD] for r in rows]).tz_convert("UTC"))
+
+
+def test_feed_follows_replay_with_revisions(replay):
+    records, url, clock = replay
+    feed = live.LiveFeed(base_url=url, capacity=30, poll_seconds=0, lookback_hours=6)
+    region = records[0][live.REGION_FIELD]
+    noon = pd.Timestamp(clock.start)
+
+    assert feed.poll() == 25 * len(feed.regions())
+    expected = published(records, region, noon, noon - pd.Timedelta(hours=6))
+    pd.testing.assert_series_equal(feed.frame(region)["consommation"], expected,
+                                   check_names=False, check_index_type=False, check_freq=False)
+
+    # Révision du dernier point publié, puis 3 h de plus  : 30 derniers points (tampon plein), révision comprise
+    last = next(r for r in records if r[live.REGION_FIELD] == region and pd.Timestamp(r[live.TIME_FIELD]) == noon)
+    last["consommation"] = 1.0
+    clock.start += timedelta(hours=3)
+    assert feed.poll() == 12 * len(feed.regions())
+    frame = feed.frame(region)
+    later = noon + pd.Timedelta(hours=3)
+    expected = published(records, region, later, later - pd.Timedelta(minutes=15 * 29))
+    pd.testing.assert_series_equal(frame["consommation"], expected,
+                                   check_names=False, check_index_type=False, check_freq=False)
+    assert frame.loc[noon, "consommation"] == 1.0
+
+    # Rien de neuf : aucun point ajouté, tampons inchangés
+    assert feed.poll() == 0
+    pd.testing.assert_frame_equal(feed.frame(region), frame)
+
+
+def test_feed_catches_up_on_late_region(replay):
+    records, url, clock = replay
+    feed = live.LiveFeed(base_url=url, capacity=96, poll_seconds=0, lookback_hours=6)
+    noon = pd.Timestamp(clock.start)
+    late = records[0][live.REGION_FIELD]
+
+    # La région `late` n'a pas encore publié ses deux derniers quarts d'heure, les autres si
+    pending = [r for r in records if r[live.REGION_FIELD] == late
+               and noon - pd.Timedelta(minutes=15) <= pd.Timestamp(r[live.TIME_FIELD]) <= noon]
+    values = [r["consommation"] for r in pending]
+    for r in pending:
+        r["consommation"] = None
+    feed.poll()
+    assert feed.frame(late).index.max() == noon - pd.Timedelta(minutes=30)
+
+    # Publication tardive, puis 15 minutes de plus : aucun point perdu
+    for r, value in zip(pending, values):
+        r["consommation"] = value
+    clock.start += timedelta(minutes=15)
+    feed.poll()
+    later = noon + pd.Timedelta(minutes=15)
+    for region in feed.regions():
+        expected = published(records, region, later, noon - pd.Timedelta(hours=6))
+        pd.testing.assert_series_equal(feed.frame(region)["consommation"], expected,
+                                       check_names=False, check_index_type=False, check_freq=False)
@@ -0,0 +1,17 @@
+import numpy as np
+import pytest
+
+from scripts import metrics
+
+
+@pytest.mark.skipif(metrics.rss_mb() is None, reason="mémoire résidente lue dans /proc (Linux)")
+def test_stage_memory_fields():
+    # Un premier pic de 200 Mo, puis une étape qui garde 80 Mo : elle ne relève pas le pic du
+    # processus, mais sa mémoire résidente augmente bien
+    peak = np.ones(200 * 2 ** 20 // 8)
+    del peak
+    with metrics.stage("alloc") as record:
+        kept = np.ones(80 * 2 ** 20 // 8)
+    assert record["process_peak_growth_mb"] == 0
+    assert record["rss_delta_mb"] >= 70
+    assert record["rss_mb"] >= kept.nbytes / 2 ** 20
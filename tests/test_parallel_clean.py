@@ -0,0 +1,68 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas.testing as tm
+import pytest
+
+from benchmarks import synthetic
+from scripts import load_data, metrics, parallel_clean, preprocess
+
+ROWS = 4000
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return synthetic.build_frames(ROWS)
+
+
+@pytest.fixture(scope="module")
+def serial(frames):
+    return {name: load_data.CLEANERS[name](df.copy()) for name, df in frames.items()}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Pool de 2 processus, partitions dès 1 000 lignes
+    monkeypatch.setattr(parallel_clean, "WORKERS", 2)
+    monkeypatch.setattr(parallel_clean, "PARTITION_MIN_ROWS", 1000)
+    parallel_clean.shutdown()
+    yield
+    parallel_clean.shutdown()
+
+
+def test_clean_and_merge_matches_serial(frames, serial, pool):
+    result = preprocess.clean_and_merge({name: df.copy() for name, df in frames.items()})
+    for name, expected in serial.items():
+        tm.assert_frame_equal(result[name], expected, check_exact=True)
+
+
+def test_concurrent_dataset_cleaning_matches_serial(frames, serial, pool):
+    # Comme le chargeur asynchrone : un thread par jeu, toutes les tâches sur le même pool
+    def clean(name):
+        return parallel_clean.clean(name, frames[name].copy(), load_data.CLEANERS[name])
+
+    with ThreadPoolExecutor(max_workers=len(frames)) as executor:
+        result = dict(zip(frames, executor.map(clean, frames)))
+    for name, expected in serial.items():
+        tm.assert_frame_equal(result[name], expected, check_exact=True)
+
+
+def test_worker_metrics_reach_parent(frames, pool):
+    # Étapes clean_* mesurées dans les processus du pool : une par partition (ou par jeu entier),
+    # rejouées dans l'historique du processus parent
+    metrics.reset()
+    preprocess.clean_and_merge({name: df.copy() for name, df in frames.items()})
+    worker = [record for record in metrics.recent() if record.get("worker")]
+    stages = Counter(record["stage"] for record in worker)
+    for name, df in frames.items():
+        stage = load_data.CLEANERS[name].__name__
+        expected = len(parallel_clean.partition_positions(df)) if parallel_clean.partitionable(name, df) else 1
+        assert stages[stage] == expected
+        assert sum(record["rows_in"] for record in worker if record["stage"] == stage) == len(df)
+
+
+def test_small_dataset_cleaned_in_place(frames, monkeypatch):
+    monkeypatch.setattr(parallel_clean, "WORKERS", 2)
+    monkeypatch.setattr(parallel_clean, "get_pool", lambda: pytest.fail("pool démarré pour un petit jeu"))
+    df = frames["annual_consumption"].copy()
+    parallel_clean.clean("annual_consumption", df, load_data.CLEANERS["annual_consumption"])
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from scripts import preprocess
+
+
+def test_compact_dtypes_downcasts_large_measures_only():
+    df = pd.DataFrame({
+        "region": ["Bretagne", "Normandie"],
+        "production_GWh": [1.5, 2.25],
+        "lat": [48.1, 49.2],
+        "conso_elec_GWh": [12458.4, 9876.1],
+        "n": np.array([1, 2], dtype="int64"),
+        "big": np.array([1, 2**40], dtype="int64"),
+    })
+    out = preprocess.compact_dtypes(df)
+    assert isinstance(out["region"].dtype, pd.CategoricalDtype)
+    assert out["production_GWh"].dtype == "float32"
+    assert out["lat"].dtype == "float32"
+    assert out["conso_elec_GWh"].dtype == "float64"
+    assert out["n"].dtype == "int32"
+    assert out["big"].dtype == "int64"
+
+
+def test_annual_consumption_keeps_exact_values():
+    raw = pd.DataFrame({
+        "annee": ["2020", "2021"],
+        "region": ["Bretagne", "Bretagne"],
+        "consommation_brute_electricite_rte": [12458.4, 12501.7],
+        "consommation_brute_gaz_totale": [8000.3, 7999.9],
+        "consommation_brute_totale": [20458.7, 20501.6],
+    })
+    df = preprocess.clean_annual_consumption(raw)
+    assert df["conso_elec_GWh"].tolist() == [12458.4, 12501.7]
+    assert str(df["conso_elec_GWh"].iloc[0]) == "12458.4"
+
+
+def test_production_stays_float32():
+    raw = pd.DataFrame({"mois": ["2021-01", "2021-02"], "region": ["Bretagne", "Bretagne"],
+                        **{col: [1.0, 2.0] for col in preprocess.PRODUCTION_COLUMNS}})
+    assert preprocess.clean_monthly_production(raw)["production_GWh"].dtype == "float32"
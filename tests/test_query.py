@@ -0,0 +1,74 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub
+from scripts import load_data
+from scripts.query import Query, odsql_literal
+
+NAME = "monthly_production"
+
+
+def test_literals_are_quoted_and_escaped():
+    assert odsql_literal(12) == "12"
+    assert odsql_literal(2.5) == "2.5"
+    assert odsql_literal(True) == '"True"'
+    assert odsql_literal('Provence "Alpes"') == '"Provence \\"Alpes\\""'
+    assert odsql_literal("a\\b") == '"a\\\\b"'
+
+
+def test_where_combines_filters_and_date_bounds():
+    query = Query(filters={"region": ["Normandie", "Bretagne"], "filiere": "eolien", "n": 3},
+                  date_field="mois", start="2020-01", end="2021-01")
+    assert query.where() == (
+        'region in ("Bretagne", "Normandie") and filiere = "eolien" and n = 3'
+        " and mois >= date'2020-01' and mois < date'2021-01'"
+    )
+    assert Query(select=["region"]).where() is None
+
+
+def test_to_params_select_and_group_by():
+    assert Query(select=["region", "mois"]).to_params() == {"select": "region, mois"}
+    query = Query(filters={"region": "Bretagne"}, group_by=["region"],
+                  aggregates={"n": ("count", "*"), "total": ("sum", "production_eolienne")})
+    assert query.to_params() == {
+        "select": "region, count(*) as n, sum(production_eolienne) as total",
+        "where": 'region = "Bretagne"',
+        "group_by": "region",
+    }
+    with pytest.raises(ValueError):
+        Query(aggregates={"x": ("median", "v")})
+
+
+def test_apply_compares_dates_in_utc():
+    df = pd.DataFrame({
+        "date": ["2024-05-01T10:15:00+00:00", "2024-04-30T23:00:00+02:00", "2024-05-02T00:00:00+00:00"],
+        "value": [1, 2, 3],
+    })
+    result = Query(date_field="date", start="2024-05-01", end="2024-05-02").apply(df)
+    assert result["value"].tolist() == [1]
+    result = Query(date_field="date", start="2024-04-30T22:00:00+02:00").apply(df)
+    assert result["value"].tolist() == [1, 2, 3]
+
+
+def test_rejected_query_falls_back_to_local_filtering(stub, cache_dir, monkeypatch):
+    endpoint = load_data.DATASETS[NAME]
+    stub.datasets[endpoint] = odre_stub.monthly_production_records(600)
+    query = Query(select=["mois", "region", "production_eolienne"],
+                  filters={"region": ["Bretagne", "Normandie"]}, date_field="mois", start="2015-03", end="2017-01")
+    server_side = load_data.fetch_query(endpoint, query)
+
+    # Le serveur refuse désormais tout "where" : 400, puis filtrage local du jeu complet
+    def reject(where):
+        raise ValueError("where non supporté")
+
+    monkeypatch.setattr(odre_stub, "parse_where", reject)
+    odre_stub._filtered.clear()
+    local = load_data.fetch_query(endpoint, query)
+
+    assert 0 < len(local) < 600
+    key = ["mois", "region"]
+    tm.assert_frame_equal(
+        local.sort_values(key).reset_index(drop=True),
+        server_side[query.select].sort_values(key).reset_index(drop=True),
+    )
@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from scripts import spatial
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    lat = rng.uniform(42.5, 51.0, 20000)
+    lon = rng.uniform(-4.7, 8.2, 20000)
+    # Grappe dense (plusieurs points par cellule) et coordonnées manquantes
+    lat[:2000] = rng.normal(48.85, 0.01, 2000)
+    lon[:2000] = rng.normal(2.35, 0.01, 2000)
+    lat[::97] = np.nan
+    lon[::89] = np.nan
+    return lat, lon
+
+
+@pytest.fixture(scope="module")
+def index(points):
+    return spatial.GridIndex(*points)
+
+
+def test_ignores_missing_coordinates(points, index):
+    lat, lon = points
+    assert len(index) == int((np.isfinite(lat) & np.isfinite(lon)).sum())
+
+
+@pytest.mark.parametrize("box", [
+    (48.8, 2.3, 48.9, 2.4),             # dans la grappe
+    (43.0, -1.0, 45.5, 3.0),            # plusieurs centaines de cellules
+    (30.0, -20.0, 60.0, 20.0),          # déborde de la grille
+    (55.0, 10.0, 56.0, 11.0),           # hors de la grille
+    (48.85, 2.35, 48.85, 2.35),         # emprise dégénérée
+])
+def test_bbox_matches_brute_force(points, index, box):
+    lat, lon = points
+    south, west, north, east = box
+    expected = np.flatnonzero((lat >= south) & (lat <= north) & (lon >= west) & (lon <= east))
+    np.testing.assert_array_equal(index.bbox(*box), expected)
+
+
+def test_viewport_adds_margin(points, index):
+    bounds = ((48.0, 2.0), (49.0, 3.0))
+    np.testing.assert_array_equal(index.viewport(bounds, margin=0.1), index.bbox(47.9, 1.9, 49.1, 3.1))
+
+
+@pytest.mark.parametrize("center, km", [((48.85, 2.35), 1.0), ((45.0, 1.0), 35.0), ((50.9, 8.1), 120.0)])
+def test_radius_matches_brute_force(points, index, center, km):
+    lat, lon = points
+    distances = spatial.haversine_km(*center, lat, lon)
+    expected = np.flatnonzero(distances <= km)
+    found, found_km = index.radius(*center, km)
+    np.testing.assert_array_equal(found, expected)
+    np.testing.assert_allclose(found_km, distances[expected])
+    assert index.count(*center, km) == len(expected)
+
+
+@pytest.mark.parametrize("center, k", [((48.85, 2.35), 10), ((46.0, 0.5), 1), ((42.0, -5.0), 25)])
+def test_nearest_matches_brute_force(points, index, center, k):
+    lat, lon = points
+    distances = spatial.haversine_km(*center, lat, lon)
+    distances[np.isnan(distances)] = np.inf
+    _, found_km = index.nearest(*center, k=k)
+    np.testing.assert_allclose(found_km, np.sort(distances)[:k])
+
+
+def test_empty_index():
+    index = spatial.GridIndex(np.array([np.nan]), np.array([1.0]))
+    assert len(index) == 0
+    assert len(index.bbox(40, -5, 52, 9)) == 0
+    found, _ = index.nearest(48.0, 2.0, k=3)
+    assert len(found) == 0
+
+
+def square(west, south, east, north):
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
+
+
+def test_polygon_index_with_hole_and_multipolygon():
+    geojson = {"type": "FeatureCollection", "features": [
+        {"properties": {"nom": "A"}, "geometry": {"type": "Polygon", "coordinates": [
+            square(0, 0, 10, 10), square(4, 4, 6, 6)]}},
+        {"properties": {"nom": "B"}, "geometry": {"type": "MultiPolygon", "coordinates": [
+            [square(20, 0, 30, 10)], [square(4.5, 4.5, 5.5, 5.5)]]}},
+    ]}
+    lat = np.array([1.0, 5.0, 4.2, 5.0, 15.0, np.nan])
+    lon = np.array([1.0, 25.0, 5.0, 5.0, 5.0, 5.0])
+    names = spatial.PolygonIndex(geojson, bands=8).assign(lat, lon)
+    assert names.tolist() == ["A", "B", None, "B", None, None]
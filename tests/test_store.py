@@ -0,0 +1,83 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub
+from scripts import aggregates, load_data, store
+
+pytest.importorskip("duckdb")
+
+REGIONS = len(odre_stub.REGIONS)
+
+
+@pytest.fixture(scope="module")
+def clean():
+    records = {
+        "monthly_production": odre_stub.monthly_production_records(24 * REGIONS),
+        "annual_consumption": odre_stub.annual_consumption_records(6 * REGIONS),
+        "ev_charging": odre_stub.ev_charging_records(2000),
+        "facilities": odre_stub.facilities_records(1000),
+    }
+    return {name: load_data.CLEANERS[name](pd.DataFrame.from_records(rows)) for name, rows in records.items()}
+
+
+@pytest.fixture
+def written(clean, tmp_path, monkeypatch):
+    # Stockage et connexion DuckDB propres au test
+    monkeypatch.setattr(store, "STORE_DIR", tmp_path / "store")
+    monkeypatch.setattr(store, "_connection", None)
+    store.write_all(clean)
+    yield clean
+    store.get_connection().close()
+
+
+def normalized(df):
+    df = df.astype({col: str for col in df.select_dtypes("category").columns})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def index_as_values(df):
+    # Niveaux d'index comparés par valeur (category / str, int32 / int64)
+    df = df.copy()
+    df.index = pd.MultiIndex.from_arrays(
+        [level.astype(str) if level.name in ("region", "filiere") else level.astype("int64")
+         for level in (df.index.get_level_values(i) for i in range(df.index.nlevels))],
+        names=df.index.names,
+    )
+    return df.sort_index()
+
+
+@pytest.mark.parametrize("name", ["monthly_production", "annual_consumption", "ev_charging", "facilities"])
+def test_read_returns_the_written_rows(written, name):
+    expected = written[name]
+    tm.assert_frame_equal(normalized(store.read(name)[list(expected.columns)]), normalized(expected),
+                          check_dtype=False)
+
+    region = odre_stub.REGIONS[4]
+    tm.assert_frame_equal(normalized(store.read(name, region=region)[list(expected.columns)]),
+                          normalized(expected[expected["region"] == region]), check_dtype=False)
+    assert store.regions(name) == sorted(expected["region"].dropna().astype(str).unique())
+
+
+def test_read_keeps_compact_dtypes(written):
+    df = store.read("ev_charging", columns=["region", "puissance_kW"])
+    assert list(df.columns) == ["region", "puissance_kW"]
+    assert isinstance(df["region"].dtype, pd.CategoricalDtype)
+    assert df["puissance_kW"].dtype == "float32"
+
+
+def test_build_cube_matches_in_memory_cube(written):
+    expected = aggregates.build_cube(written)
+    result = store.build_cube()
+    for table in aggregates.CUBE_SOURCES:
+        assert not expected[table].empty
+        tm.assert_frame_equal(index_as_values(result[table]), index_as_values(expected[table]),
+                              check_dtype=False, check_index_type=False)
+
+
+def test_missing_table(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "STORE_DIR", tmp_path / "empty")
+    monkeypatch.setattr(store, "_connection", None)
+    assert store.read("ev_charging") is None
+    assert store.regions("ev_charging") == []
+    assert all(df.empty for df in store.build_cube().values())
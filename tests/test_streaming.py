@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub, synthetic
+from scripts import aggregates, load_data, streaming
+
+ROWS = 6000
+
+
+def normalized(cube):
+    # Index à plat, catégories en texte : les cubes fusionnés et le cube direct sont comparables
+    flat = cube.reset_index()
+    flat = flat.astype({col: str for col in flat.select_dtypes("category").columns})
+    return flat.sort_values(list(flat.columns[:cube.index.nlevels])).reset_index(drop=True)
+
+
+def raw_chunks(frame, sizes):
+    bounds = np.cumsum([0, *sizes])
+    return [frame.iloc[start:end].reset_index(drop=True) for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+@pytest.mark.parametrize("table", aggregates.CUBE_SOURCES)
+@pytest.mark.parametrize("merge_every", [1, 3, 16])
+def test_cube_sink_matches_full_cube(table, merge_every):
+    source, builder = aggregates.CUBE_SOURCES[table]
+    raw = synthetic.build_frames(ROWS)[source]
+    clean = load_data.CLEANERS[source]
+
+    # Morceaux de tailles inégales, chacun nettoyé séparément (catégories propres à chaque morceau)
+    sink = streaming.CubeSink(builder, merge_every=merge_every)
+    for chunk in raw_chunks(raw, [1, 999, 2500, 17, len(raw) - 3517]):
+        sink.write(clean(chunk.copy()))
+
+    expected = builder(clean(raw.copy()))
+    tm.assert_frame_equal(normalized(sink.result()), normalized(expected), check_dtype=False, rtol=1e-9)
+
+
+def test_cube_sink_keeps_missing_sums_missing():
+    # Gaz manquant dans tous les morceaux d'une région × année : NaN, pas 0
+    annual = pd.DataFrame({
+        "année": pd.to_datetime(["2020-01-01"] * 4),
+        "region": ["Bretagne", "Bretagne", "Normandie", "Normandie"],
+        "conso_elec_GWh": [1.0, 2.0, 3.0, 4.0],
+        "conso_gaz_GWh": [np.nan, np.nan, 5.0, np.nan],
+        "conso_totale_GWh": [1.0, 2.0, 8.0, 4.0],
+    })
+    sink = streaming.CubeSink(aggregates.consumption_cube, merge_every=1)
+    for position in range(len(annual)):
+        sink.write(annual.iloc[[position]])
+    result = sink.result()
+    assert np.isnan(result.loc[("Bretagne", 2020), "conso_gaz_GWh"])
+    assert result.loc[("Normandie", 2020), "conso_gaz_GWh"] == 5.0
+    assert result.loc[("Bretagne", 2020), "conso_elec_GWh"] == 3.0
+
+
+def test_cube_sink_without_rows_returns_empty_cube():
+    sink = streaming.CubeSink(aggregates.production_cube)
+    sink.write(pd.DataFrame(columns=["mois", "region", "filiere", "production_GWh"]))
+    assert sink.result().empty
+
+
+def test_parquet_sink_concatenates_chunks(tmp_path):
+    clean = load_data.CLEANERS["ev_charging"]
+    raw = synthetic.ev_charging_frame(3000)
+    chunks = [clean(chunk.copy()) for chunk in raw_chunks(raw, [1000, 1000, 1000])]
+
+    with streaming.ParquetSink(tmp_path / "ev.parquet") as sink:
+        for chunk in chunks:
+            sink.write(chunk)
+    written = pd.read_parquet(tmp_path / "ev.parquet")
+    expected = pd.concat(chunks, ignore_index=True)
+    assert sink.rows == len(expected)
+    tm.assert_frame_equal(written, expected, check_dtype=False, check_categorical=False)
+
+
+def test_parquet_sink_abort_leaves_no_file(tmp_path):
+    with pytest.raises(RuntimeError):
+        with streaming.ParquetSink(tmp_path / "ev.parquet") as sink:
+            sink.write(pd.DataFrame({"a": [1]}))
+            raise RuntimeError("interrompu")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_stream_all_matches_in_memory_cube(tmp_path, stub):
+    stub.datasets.update(odre_stub.build_datasets({
+        load_data.DATASETS["monthly_production"]: 1200,
+        load_data.DATASETS["annual_consumption"]: 168,
+    }))
+    names = ["monthly_production", "annual_consumption"]
+    cube = streaming.stream_all(tmp_path, chunk_rows=250, names=names)
+
+    for table, (source, builder) in aggregates.CUBE_SOURCES.items():
+        if source not in names:
+            continue
+        query = load_data.DEFAULT_QUERIES[source]
+        full = load_data.CLEANERS[source](load_data.fetch_api_data(load_data.DATASETS[source], params=query.to_params()))
+        tm.assert_frame_equal(normalized(cube[table]), normalized(builder(full)), check_dtype=False, rtol=1e-9)
+        assert len(pd.read_parquet(tmp_path / f"{source}.parquet")) == len(full)
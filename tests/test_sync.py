@@ -0,0 +1,84 @@
+import pandas.testing as tm
+import pytest
+
+from benchmarks import odre_stub
+from scripts import cache, load_data
+
+REGIONS = len(odre_stub.REGIONS)
+
+# Jeu -> (générateur du stub, nombre de périodes au premier chargement, puis après mise à jour)
+SERIES = {
+    "monthly_production": (odre_stub.monthly_production_records, 18, 24),
+    "annual_consumption": (odre_stub.annual_consumption_records, 8, 11),
+}
+
+
+def normalized(df):
+    df = df.astype({col: str for col in df.select_dtypes("category").columns})
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def expire_raw(name):
+    # Le brut n'est plus frais : la prochaine lecture revalide contre "modified"
+    params = load_data.dataset_params(name)
+    endpoint = load_data.DATASETS[name]
+    meta = cache.read_meta(endpoint, params, "raw")
+    meta["checked_at"] = 0
+    cache.write_json(cache.entry_paths(endpoint, params, "raw")[1], meta)
+
+
+def publish(stub, name, records, modified):
+    stub.datasets[load_data.DATASETS[name]] = records
+    stub.modified = modified
+    odre_stub._filtered.clear()
+
+
+@pytest.mark.parametrize("name", SERIES)
+def test_sync_matches_full_reload(name, cache_dir, stub):
+    generate, before, after = SERIES[name]
+    records = generate(after * REGIONS, seed=1)
+    publish(stub, name, records[:before * REGIONS], "v1")
+    assert load_data.load_clean(name) is not None
+    assert not load_data.needs_sync(name)
+
+    # Nouvelle version : périodes ajoutées et correction tardive de la dernière période connue
+    updated = [dict(record) for record in records]
+    revised_field = next(field for field, value in updated[0].items()
+                         if isinstance(value, float) and field not in ("annee", "mois"))
+    for record in updated[(before - 1) * REGIONS:before * REGIONS]:
+        record[revised_field] = 1.0
+    publish(stub, name, updated, "v2")
+    expire_raw(name)
+
+    assert load_data.needs_sync(name)
+    synced, source = load_data.fetch_clean(name)
+    assert source == "sync"
+
+    full = load_data.CLEANERS[name](load_data.fetch_api_data(
+        load_data.DATASETS[name], params=load_data.DEFAULT_QUERIES[name].to_params()))
+    tm.assert_frame_equal(normalized(synced), normalized(full), check_dtype=False)
+
+    # Le cache sert ensuite la version synchronisée, sans nouvelle requête
+    assert not load_data.needs_sync(name)
+    cached, source = load_data.fetch_clean(name)
+    assert source == "cache"
+    tm.assert_frame_equal(normalized(cached), normalized(full), check_dtype=False)
+
+
+def test_sync_unmodified_dataset_served_from_cache(cache_dir, stub):
+    generate, before, _ = SERIES["monthly_production"]
+    publish(stub, "monthly_production", generate(before * REGIONS), "v1")
+    first = load_data.load_clean("monthly_production")
+    expire_raw("monthly_production")
+
+    assert not load_data.needs_sync("monthly_production")
+    df, source = load_data.fetch_clean("monthly_production")
+    assert source == "cache"
+    tm.assert_frame_equal(normalized(df), normalized(first))
+
+
+def test_sync_without_local_copy_loads_everything(cache_dir, stub):
+    generate, before, _ = SERIES["annual_consumption"]
+    publish(stub, "annual_consumption", generate(before * REGIONS), "v1")
+    df = load_data.sync_incremental("annual_consumption")
+    assert len(df) == before * REGIONS